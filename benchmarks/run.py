@@ -0,0 +1,338 @@
+"""
+Benchmarks of the model hot paths, with a stored baseline and regression thresholds.
+
+Five groups are timed:
+- import: import of the model core in a fresh interpreter, which must not load matplotlib or sympy, and of the lumped
+  models, which must not load the pouch equilibria either
+- rhs: single right-hand side evaluations, timed with timeit, best per-call time of several repeats
+- diagnostics: derived signals of 10^6 samples of a trajectory
+- scenario: full headless runs of the example scripts, with the Agg backend and their output discarded
+- sweep: pouch equilibrium sweeps on a reduced grid, solved in-process
+
+Run from the repository root, e.g.
+
+    python -m benchmarks.run --output results.json --baseline benchmarks/baseline.json --threshold 0.25
+
+The results are written as JSON with the layout of the baseline, such that a run can be stored as the new baseline.
+A benchmark regresses if its time exceeds the baseline by more than the threshold, a relative slowdown; entries of the
+baseline may carry their own "threshold". The exit code is 1 if any benchmark regressed.
+
+Times are compared as they are, against a baseline stored on the same machine. Every run also includes a fixed
+calibration workload of scalar Python and small numpy operations, the mix of the right-hand sides, timed as the median
+of many repeats; --calibrated compares the times relative to it instead, e.g. against a baseline of another machine.
+The calibration tracks the speed of the interpreter rather than that of the benchmarks, so calibrated comparisons are
+a rough guide only. A warning is printed if the Python or numpy version differs from the one of the baseline.
+"""
+
+import io
+import os
+import sys
+import json
+import time
+import runpy
+import timeit
+import argparse
+import platform
+import contextlib
+import subprocess
+from math import sin, cos
+from itertools import count
+
+import numpy as np
+import scipy
+
+import matplotlib
+matplotlib.use('Agg')
+from matplotlib import pyplot as plt
+
+from hemodynamics import VAV, TransmissionLine
+from tahs import LIMO, PouchArrayTAH
+from pumps import CentrifugalPump, MotorPumpLoadAssembly
+from motors import DCMotor
+from circuits import RLCCircuit, DiodeValve
+from netlist import Netlist
+from normalized_pouch import CylindricalPouchArray, PouchEquilibriumSolver
+from pouch_sweeps import PouchSweep
+from utils import TDP, Sigmoid
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def run_script(path: str):
+    """
+    Run an example script headless, i.e. with plt.show() a no-op and its printed output discarded.
+
+    :return: globals of the script
+    """
+    with contextlib.redirect_stdout(io.StringIO()):
+        namespace = runpy.run_path(path, run_name='__main__')
+    plt.close('all')
+    return namespace
+
+class Benchmark:
+    """
+    Timed callable, created by setup such that the setup cost is excluded from the timing.
+    """
+    def __init__(self, name: str, group: str, setup, repeat: int = 5, number: int | None = None,
+                 threshold: float | None = None, statistic=min):
+        """
+        :param name: unique name of the benchmark
+        :param group: 'import', 'rhs', 'diagnostics', 'scenario' or 'sweep'
+        :param setup: returns the callable to be timed
+        :param repeat: number of repeats, of which the statistic is reported
+        :param number: number of calls per repeat, by default chosen by timeit such that a repeat takes 0.2 s
+        :param threshold: maximum relative slowdown, stored with the results, by default the one of compare
+        :param statistic: of the times of the repeats, the best by default
+        """
+        self.name = name
+        self.group = group
+        self.setup = setup
+        self.repeat = repeat
+        self.number = number
+        self.threshold = threshold
+        self.statistic = statistic
+
+    def __call__(self):
+        """
+        :return: time per call in seconds, the number of calls per repeat and the number of repeats
+        """
+        timer = timeit.Timer(self.setup())
+        number = timer.autorange()[0] if self.number is None else self.number
+        return float(self.statistic(timer.repeat(self.repeat, number))) / number, number, self.repeat
+
+CORE = ('hemodynamics', 'pumps', 'motors', 'circuits', 'tahs', 'utils', 'normalized_pouch', 'pouch_sweeps',
+        'pouch_continuation', 'pouch_database', 'pouch_surrogates')
+
+HEADLESS = ('matplotlib', 'sympy')
+
+# the lumped models, which load the pouch equilibria only when a pouch array TAH is built
+MODEL = ('hemodynamics', 'pumps', 'motors', 'circuits', 'tahs', 'utils')
+
+class ImportBenchmark(Benchmark):
+    """
+    Import time of modules in a fresh interpreter, as seen by e.g. a worker process of a sweep.
+
+    Raises RuntimeError if the import loads any of the forbidden modules.
+    """
+    def __init__(self, name: str, modules, forbidden=HEADLESS, repeat: int = 5, threshold: float | None = 0.5):
+        super().__init__(name, 'import', None, repeat=repeat, number=1, threshold=threshold)
+        self.modules = modules
+        self.forbidden = forbidden
+
+    def __call__(self):
+        code = (f'import sys, time; t = time.perf_counter(); import {", ".join(self.modules)}; '
+                f't = time.perf_counter() - t; print(t, *[m for m in {self.forbidden!r} if m in sys.modules])')
+        times = []
+        for _ in range(self.repeat):
+            output = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, check=True,
+                                    cwd=ROOT, env={**os.environ, 'PYTHONPATH': os.pathsep.join(
+                                        filter(None, [ROOT, os.environ.get('PYTHONPATH')]))}).stdout.split()
+            if output[1:]:
+                raise RuntimeError(f'importing {", ".join(self.modules)} loads {", ".join(output[1:])}')
+            times.append(float(output[0]))
+        return min(times), 1, self.repeat
+
+def calibration():
+    x = np.linspace(0.0, 1.0, 8)
+    def workload():
+        s = 0.0
+        for i in range(100):
+            s += sin(0.01 * i) * cos(0.02 * i)
+            s += float(np.dot(x, x))
+        return s
+    return workload
+
+def rhs(system, t, y):
+    return lambda: system.solve(t, y)
+
+def rhs_stepping(system, t, y, dt: float = 1e-5):
+    # advances t on every call, for models that cache their equilibria
+    steps = count()
+    return lambda: system.solve(t + dt * next(steps), y)
+
+def pump_lrc():
+    # setup of examples/pump/pump_lrc.py
+    motor = DCMotor(R=0.2, L=0.11/10)
+    motor.set_voltage(lambda t: Sigmoid(1.5, 1.0)(t))
+    circuit = RLCCircuit(lambda t, h: 0.5 + Sigmoid(2, 3.0)(t) + Sigmoid(1.5, 5.0)(t) * np.sin(2 * 2 * np.pi * t),
+                         lambda t: 0.0001 + Sigmoid(1, 8)(t))
+    return MotorPumpLoadAssembly(motor, CentrifugalPump(), circuit)
+
+def diagnostics(system, y, n: int = 10**6):
+    # samples scattered around a state, the cost does not depend on their being a trajectory
+    Y = np.asarray(y, dtype=float)[:, None] * (1 + 0.01 * np.random.default_rng(0).random((len(y), n)))
+    t = np.linspace(0.0, 10.0, n)
+    return lambda: system.diagnostics(t, Y)
+
+def bivensystem():
+    # the script defines the system at module level, its full run is part of the setup
+    system = run_script('events_lab/biventricular_pressure_source.py')['system']
+    return rhs(system, 0.1, np.array([1.0, 1.0, 0.15, 0.15, 0.1, 0.1, 0.1, 0.1]))
+
+def univentricular(frozen: bool = False):
+    # the script defines the system and its frozen functions at module level
+    system = run_script('events_lab/univentricular.py')['frozen' if frozen else 'system']
+    return rhs(system, 0.5, np.array([0.1, 100.0, 0.1, 1.0, 1.0, 0.1, 1.0, 1.0]))
+
+def ladder(n: int = 1000):
+    # pump into a line of n segments, each a resistor to a node without capacitor and a resistor to a capacitor, with
+    # a diode valve to ground at every 100th
+    netlist = Netlist().pump('flow', '0', 'h0', L=0.01, R=0.1)
+    for k in range(n):
+        netlist.resistor(f'R{k}', f'h{k}', f'm{k}', 0.05).resistor(f'S{k}', f'm{k}', f'h{k + 1}', 0.05)
+        netlist.capacitor(f'h{k}', C=0.01)
+        if k % 100 == 0:
+            netlist.diode(f'D{k}', f'h{k}', '0', DiodeValve(Ropen=1, Rclosed=1e4))
+    netlist.capacitor(f'h{n}', C=0.01).resistor('out', f'h{n}', '0', 1.0)
+    y = np.linspace(1.0, 0.0, len(netlist.states))
+    netlist.solve(0.0, 1.0, y)
+    return lambda: netlist.solve(0.0, 1.0, y)
+
+def transmission_line(n: int = 400, jacobian: bool = False):
+    # line of n segments, with a pressure wave halfway
+    system = TransmissionLine(N=n)
+    y = np.full(2 * n + 2, 60.0)
+    y[0] = 120.0
+    y[2::2] = np.exp(-np.linspace(-5.0, 5.0, n) ** 2)
+    return (lambda: system.jacobian(0.1, y)) if jacobian else rhs(system, 0.1, y)
+
+def pouch_sweep(shape=(8, 4)):
+    sweep = PouchSweep(PouchEquilibriumSolver(CylindricalPouchArray(Lsh=0.1, N=8)), processes=1)
+    Pc = np.geomspace(0.0001, 2.5, 100)[60::40 // shape[0]][:shape[0]]
+    P = np.geomspace(0.0001, 2.5, 20)[5:-1:14 // shape[1]][:shape[1]]
+    return lambda: sweep(Pc, P, chain=0)
+
+def pouch_newton(shape=(8, 4)):
+    solver = PouchEquilibriumSolver(CylindricalPouchArray(Lsh=0.1, N=8))
+    Pc = np.geomspace(0.0001, 2.5, 100)[60::40 // shape[0]][:shape[0]]
+    P = np.geomspace(0.0001, 2.5, 20)[5:-1:14 // shape[1]][:shape[1]]
+    return lambda: solver.newton(Pc[:, None], P[None, :])
+
+def scenario(path: str):
+    return Benchmark(path, 'scenario', lambda: lambda: run_script(path), repeat=1, number=1, threshold=0.5)
+
+CALIBRATION = Benchmark('calibration', 'calibration', calibration, repeat=25, statistic=np.median)
+
+BENCHMARKS = [
+    ImportBenchmark('import[core]', CORE),
+    ImportBenchmark('import[model]', MODEL, forbidden=HEADLESS + ('normalized_pouch',)),
+    Benchmark('VAV.solve[TimeVaryingElastance]', 'rhs', lambda: rhs(VAV(), 0.3, [80, 60, 60])),
+    Benchmark('VAV.solve[LIMO]', 'rhs', lambda: rhs(VAV(LIMO(TDP(min=0, max=70)), Pv=5), 0.3, [80, 60, 60])),
+    Benchmark('VAV.solve[PouchArrayTAH]', 'rhs',
+              lambda: rhs_stepping(VAV(PouchArrayTAH(TDP(min=0, max=70)), Pv=5), 0.3, [80, 60, 60])),
+    Benchmark('LIMO.pressure', 'rhs', lambda: (lambda heart: lambda: heart.pressure(80, 0.3))(LIMO())),
+    Benchmark('LIMO.pressure_diff', 'rhs', lambda: (lambda heart: lambda: heart.pressure_diff(80, 10, 0.3))(LIMO())),
+    Benchmark('MotorPumpLoadAssembly.solve', 'rhs', lambda: rhs(pump_lrc(), 2.0, np.array([1.0, 200.0, 1.0, 1.0]))),
+    Benchmark('BiVenSystem.solve', 'rhs', bivensystem),
+    Benchmark('System.solve[univentricular]', 'rhs', univentricular),
+    Benchmark('System.solve[univentricular, frozen]', 'rhs', lambda: univentricular(frozen=True)),
+    Benchmark('Netlist.solve[ladder 1000]', 'rhs', ladder),
+    Benchmark('TransmissionLine.solve[400]', 'rhs', transmission_line),
+    Benchmark('TransmissionLine.jacobian[400]', 'rhs', lambda: transmission_line(jacobian=True)),
+    Benchmark('VAV.diagnostics[1e6]', 'diagnostics',
+              lambda: diagnostics(VAV(LIMO(TDP(min=0, max=70)), Pv=5), [80, 60, 60]), repeat=3),
+    Benchmark('MotorPumpLoadAssembly.diagnostics[1e6]', 'diagnostics',
+              lambda: diagnostics(pump_lrc(), [1.0, 200.0, 1.0, 1.0]), repeat=3),
+    *[scenario(path) for path in (
+        'examples/pump/pump_lr.py',
+        'examples/pump/pump_lrc.py',
+        'examples/pump/pump_lrc_oscillator.py',
+        'examples/pump/pump_lrc_oscillator_ac.py',
+        'examples/pump/pump_lrc_oscillator_ac_cl.py',
+        'examples/tah/limo_hemo.py',
+        'examples/tah/linearmem_hemo.py',
+        'examples/tah/nonlinearmem_hemo.py',
+        'examples/tah/tve_hemo.py',
+        'examples/tah/pouch_array_hemo.py',
+        'events_lab/biventricular_pressure_source.py',
+        'events_lab/biventricular_nonlinear_membrane.py',
+        'events_lab/univentricular.py',
+        'events_lab/univentricular_netlist.py',
+        'events_lab/univentricular_smooth.py',
+        'events_lab/univentricular_picontrol.py',
+        'events_lab/crc.py',
+        'events_lab/hemo.py')],
+    Benchmark('PouchSweep[8x4]', 'sweep', pouch_sweep, repeat=1, number=1, threshold=0.5),
+    Benchmark('PouchEquilibriumSolver.newton[8x4]', 'sweep', pouch_newton, repeat=1, number=1, threshold=0.5),
+]
+
+def run(benchmarks=BENCHMARKS, verbose: bool = True):
+    """
+    :return: results in the layout of the baseline
+    """
+    results = {}
+    for benchmark in [CALIBRATION] + [b for b in benchmarks if b is not CALIBRATION]:
+        seconds, number, repeat = benchmark()
+        results[benchmark.name] = {'group': benchmark.group, 'seconds': seconds, 'number': number, 'repeat': repeat}
+        if benchmark.threshold is not None:
+            results[benchmark.name]['threshold'] = benchmark.threshold
+        if verbose:
+            print(f'{benchmark.name:<55} {seconds:12.6g} s', flush=True)
+    return {'meta': {'date': time.strftime('%Y-%m-%d %H:%M:%S'),
+                     'python': platform.python_version(),
+                     'numpy': np.__version__,
+                     'scipy': scipy.__version__,
+                     'machine': platform.machine(),
+                     'processor': platform.processor()},
+            'results': results}
+
+def compare(results, baseline, threshold: float = 0.25, calibrated: bool = False):
+    """
+    :param results: results of run
+    :param baseline: stored results of run, entries may override the threshold
+    :param threshold: default maximum relative slowdown
+    :param calibrated: compare times relative to the calibration workload of either run
+    :return: list of (name, baseline seconds, seconds, ratio, regressed) of the benchmarks in both
+    """
+    speed = 1.0
+    if calibrated and 'calibration' in baseline['results']:
+        speed = results['results']['calibration']['seconds'] / baseline['results']['calibration']['seconds']
+    comparison = []
+    for name, result in results['results'].items():
+        reference = baseline['results'].get(name)
+        if reference is None or name == 'calibration':
+            continue
+        ratio = result['seconds'] / reference['seconds'] / speed
+        comparison.append((name, reference['seconds'], result['seconds'], ratio,
+                           ratio > 1 + reference.get('threshold', threshold)))
+    return comparison
+
+def mismatches(results, baseline, keys=('python', 'numpy')) -> list:
+    """
+    :return: (key, baseline version, version) of the versions that differ from the ones of the baseline
+    """
+    return [(key, baseline['meta'].get(key), results['meta'][key]) for key in keys
+            if baseline.get('meta', {}).get(key) != results['meta'][key]]
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--output', help='JSON file the results are written to')
+    parser.add_argument('--baseline', help='JSON file of a previous run to compare against')
+    parser.add_argument('--threshold', type=float, default=0.25, help='default maximum relative slowdown')
+    parser.add_argument('--group', action='append', choices=('import', 'rhs', 'diagnostics', 'scenario', 'sweep'),
+                        help='only run this group, may be repeated')
+    parser.add_argument('--filter', default='', help='only run benchmarks whose name contains this string')
+    parser.add_argument('--calibrated', action='store_true',
+                        help='compare times relative to the calibration workload of either run')
+    args = parser.parse_args(argv)
+
+    benchmarks = [b for b in BENCHMARKS if (args.group is None or b.group in args.group) and args.filter in b.name]
+    results = run(benchmarks)
+    if args.output:
+        with open(args.output, 'w') as file:
+            json.dump(results, file, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as file:
+            baseline = json.load(file)
+        for key, reference, version in mismatches(results, baseline):
+            print(f'warning: {key} {version} differs from {reference} of the baseline', file=sys.stderr)
+        comparison = compare(results, baseline, args.threshold, calibrated=args.calibrated)
+        print(f'\n{"benchmark":<55} {"baseline":>12} {"current":>12} {"ratio":>7}')
+        for name, reference, seconds, ratio, regressed in comparison:
+            print(f'{name:<55} {reference:12.6g} {seconds:12.6g} {ratio:7.2f}' + ('  REGRESSION' if regressed else ''))
+        if any(c[-1] for c in comparison):
+            return 1
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
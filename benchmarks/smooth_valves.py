@@ -0,0 +1,107 @@
+"""
+Accuracy against wall time of smooth valves, compared to the exact event-driven simulation.
+
+The setup of events_lab/univentricular.py is simulated with its valves switched at events by hybrid.simulate, and with
+the valves regularized by SmoothValve, in a single solve_ivp call, for a sweep of the width of the sigmoid and the
+time constant tau of the opening. The smaller these are, the closer the smooth simulation follows the exact one: the
+regularized valves switch before their thresholds, by a few widths, and lag by about tau, such that the errors of the
+waveforms accumulate into a drift of the phase of the oscillation.
+
+Run from the repository root, e.g.
+
+    python -m benchmarks.smooth_valves --output smooth_valves.json
+
+For each width and tau the wall time, the relative RMS and maximum errors of the heads h1, ha and hart and of the
+ventricular volume vv, and the error of the first opening of the hysteretic valve are reported.
+"""
+
+import json
+import time
+import argparse
+
+import numpy as np
+from scipy.integrate import solve_ivp
+
+from hybrid import simulate
+from circuits import SmoothValve
+from benchmarks.run import run_script
+
+SWEEP = ((1e-2, 1e-3), (1e-3, 1e-4), (1e-4, 1e-4), (1e-4, 1e-5), (1e-5, 1e-5))
+
+COMPARED = {'h1': 3, 'ha': 4, 'vv': 5, 'hart': 6}
+
+def exact(namespace, t_end: float = 10.0, rtol: float = 1e-9, atol: float = 1e-9):
+    """
+    :param namespace: globals of events_lab/univentricular.py
+    :return: wall time and trajectory of the event-driven simulation
+    """
+    system = namespace['system']
+    system.modes.values[:] = 0
+    start = time.perf_counter()
+    trajectory = simulate(system.solve, [0.0, t_end], namespace['initial_state'], namespace['events'],
+                          namespace['transitions'], rtol=rtol, atol=atol)
+    return time.perf_counter() - start, trajectory
+
+def smooth(namespace, exact_namespace, width: float, tau: float, t_end: float = 10.0, method: str = 'LSODA',
+           rtol: float = 1e-9, atol: float = 1e-9):
+    """
+    :param namespace: globals of events_lab/univentricular_smooth.py
+    :param exact_namespace: globals of events_lab/univentricular.py, of which the valves are regularized
+    :return: wall time and result of solve_ivp of the smooth simulation
+    """
+    oscillator = SmoothValve.regularize(exact_namespace['oscillator'], width, tau)
+    heart_valve = SmoothValve.regularize(exact_namespace['heart_valve'], width, tau)
+    circuit = exact_namespace['circuit']
+    hemo = exact_namespace['hemo']
+    system = namespace['System'](namespace['motor'], namespace['pump'],
+                                 namespace['Circuit'](oscillator, circuit.C1, circuit.C2, circuit.R, circuit.L),
+                                 namespace['tah'], namespace['TCM'](heart_valve, heart_valve, hemo.C1, hemo.C2, hemo.R))
+    start = time.perf_counter()
+    sol = solve_ivp(system.solve, [0.0, t_end], namespace['initial_state'], method=method, rtol=rtol, atol=atol,
+                    dense_output=True)
+    return time.perf_counter() - start, sol
+
+def errors(reference, sol, t):
+    """
+    :return: relative RMS and maximum errors of the compared states on the samples t, and the error of the time of
+        the first opening of the hysteretic valve
+    """
+    Y = reference(t)
+    S = sol.sol(t)
+    result = {}
+    for name, i in COMPARED.items():
+        scale = np.abs(Y[i]).max()
+        result[name] = {'rms': float(np.sqrt(np.mean((S[i] - Y[i]) ** 2)) / scale),
+                        'max': float(np.abs(S[i] - Y[i]).max() / scale)}
+    opening = reference.occurrences('hvalve', 'open')['t'][0]
+    crossing = np.flatnonzero((S[8][:-1] < 0.5) & (S[8][1:] >= 0.5))[0]
+    result['hvalve_open'] = float(t[crossing + 1] - opening)
+    return result
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--output', help='JSON file the results are written to')
+    parser.add_argument('--method', default='LSODA', help='method of solve_ivp of the smooth simulations')
+    args = parser.parse_args(argv)
+
+    exact_namespace = run_script('events_lab/univentricular.py')
+    namespace = run_script('events_lab/univentricular_smooth.py')
+    seconds, reference = exact(exact_namespace)
+    t = np.linspace(0.0, 10.0, 100001)
+
+    results = {'exact': {'seconds': seconds, 'events': len(reference.log)}, 'smooth': []}
+    print(f'{"exact (events)":<24} {seconds:8.3f} s {len(reference.log):6d} events')
+    for width, tau in SWEEP:
+        seconds, sol = smooth(namespace, exact_namespace, width, tau, method=args.method)
+        result = errors(reference, sol, t)
+        results['smooth'].append({'width': width, 'tau': tau, 'seconds': seconds, 'nfev': int(sol.nfev), **result})
+        print(f'{f"width {width:g}, tau {tau:g}":<24} {seconds:8.3f} s  rms ' +
+              ' '.join(f'{name} {result[name]["rms"]:.1e}' for name in COMPARED) +
+              f'  opening {result["hvalve_open"]:+.1e} s')
+
+    if args.output:
+        with open(args.output, 'w') as file:
+            json.dump(results, file, indent=2)
+
+if __name__ == '__main__':
+    main()
@@ -1,5 +1,8 @@
 import numpy as np
 
+from parameters import Parameters
+from utils import Sigmoid, event
+
 """"
 Lumped-parameter models of dynamic flow circuits that inverter DC flow to AC flow, typically using hysteretic components.
 """
@@ -7,7 +10,13 @@ Lumped-parameter models of dynamic flow circuits that inverter DC flow to AC flo
 class Oscillator:
     """
     Resistance with pressure-dependent hysteresis.
+
+    The state is switched by its owner at the events event_open and event_close, e.g. by MotorPumpLoadAssembly, such
+    that evaluating the resistance, also at trial points of the solver, does not change it. closed is True or False;
+    the states of the samples of a trajectory are passed to the resistance instead, e.g. to evaluate its diagnostics.
     """
+    __slots__ = ('Ropen', 'Rclosed', 'closed', 'dhopen', 'dhclose')
+
     def __init__(self,
                  Ropen: float = 1,
                  Rclosed: float = 100,
@@ -19,21 +28,39 @@ class Oscillator:
         self.dhopen = dhopen
         self.dhclose = dhclose
 
-    def __call__(self, t, dh):
+    def __call__(self, t, dh, closed=None):
+        """
+        :param closed: state, or array of the states of samples, by default the current state
+        """
+        return Valve._select(self.closed if closed is None else closed, 1.0 * self.Rclosed, 1.0 * self.Ropen)
 
-        if dh > self.dhopen:
-            self.closed = False
-            return self.Ropen
-        elif dh < self.dhclose:
-            self.closed = True
-            return self.Rclosed
-        else:
-            return self.Rclosed if self.closed else self.Ropen
+    def event_open(self, dh):
+        """
+        :return: event function of the opening, monitored while the oscillator is closed
+        """
+        return dh - self.dhopen
+
+    def event_close(self, dh):
+        """
+        :return: event function of the closing, monitored while the oscillator is open
+        """
+        return dh - self.dhclose
+
+    def open(self):
+        self.closed = False
+
+    def close(self):
+        self.closed = True
 
 class HystereticValve:
     """
     Resistance with pressure-dependent hysteresis.
+
+    Its state is switched on evaluation, so it is stateful: trajectories are evaluated sample by sample.
     """
+    __slots__ = ('Ropen', 'Rclosed', 'closed', 'dhopen', 'dhclose')
+    stateful = True
+
     def __init__(self,
                  Ropen: float = 0.1,
                  Rclosed: float = 1000,
@@ -61,14 +88,174 @@ class HystereticValve:
     def q(self, dh):
         return np.asarray([x / self(x) for x in dh])
 
+class Valve(Parameters):
+    """
+    Resistance switching between closed and open at events, with hysteresis between the head differences at which it
+    opens and closes.
+
+    The valve is a frozen record of parameters; its state, 1 if open, is kept by the system, e.g. in Modes, and passed
+    to its methods, which accept arrays of states and of stacked valves alike.
+    """
+    __slots__ = ('Ropen', 'Rclosed', 'dhopen', 'dhclose')
+
+    def __init__(self, Ropen: float = 0.1, Rclosed: float = 1e4, dhopen: float = 4, dhclose: float = 0.5):
+        self.Ropen = Ropen
+        self.Rclosed = Rclosed
+        self.dhopen = dhopen
+        self.dhclose = dhclose
+
+    def resistance(self, state):
+        return self._select(state, self.Ropen, self.Rclosed)
+
+    def event_open(self, dh):
+        """
+        :return: event function of the opening, monitored while the valve is closed
+        """
+        return dh - self.dhopen
+
+    def event_close(self, dh):
+        """
+        :return: event function of the closing, monitored while the valve is open
+        """
+        return dh - self.dhclose
+
+    @staticmethod
+    def _select(state, open, closed):
+        if isinstance(state, np.ndarray):
+            return np.where(state, open, closed)
+        return open if state else closed
+
+class DiodeValve(Parameters):
+    """
+    Resistance that is open for positive head differences and closed otherwise, without hysteresis or discrete state.
+    """
+    __slots__ = ('Ropen', 'Rclosed')
+
+    def __init__(self, Ropen: float = 0.1, Rclosed: float = 1e4):
+        self.Ropen = Ropen
+        self.Rclosed = Rclosed
+
+    def resistance(self, dh):
+        return Valve._select(dh > 0, self.Ropen, self.Rclosed)
+
+    def flow(self, dh):
+        return dh / self.resistance(dh)
+
+class SmoothValve(Parameters):
+    """
+    Valve regularized for integration without events: the discrete state of Valve becomes a continuous state variable,
+    the opening s between 0 (closed) and 1 (open), which the system integrates along with its other states.
+
+    The opening relaxes with time constant tau towards a sigmoid of the head difference, whose threshold moves from
+    dhopen for a closed valve to dhclose for an open one, such that the valve keeps the hysteresis of Valve; the
+    conductance blends the closed and the open one.
+
+    width, the head difference over which the sigmoid rises, and tau set the accuracy against the smoothness: the
+    smaller they are, the closer the valve switches like Valve, and the smaller the steps around the switches. The
+    valve switches a few widths before its thresholds and lags by about tau; errors in the switching times accumulate
+    in oscillating systems, e.g. events_lab/univentricular_smooth.py needs a width and tau of 1e-4 to follow the
+    event-driven waveforms within a few percent over ten seconds. See benchmarks/smooth_valves.py for a sweep of the
+    error and the wall time.
+    """
+    __slots__ = ('Ropen', 'Rclosed', 'dhopen', 'dhclose', 'width', 'tau')
+
+    def __init__(self, Ropen: float = 0.1, Rclosed: float = 1e4, dhopen: float = 4, dhclose: float = 0.5,
+                 width: float = 0.01, tau: float = 1e-3):
+        self.Ropen = Ropen
+        self.Rclosed = Rclosed
+        self.dhopen = dhopen
+        self.dhclose = dhclose
+        self.width = width
+        self.tau = tau
+
+    @classmethod
+    def regularize(cls, valve: Valve, width: float = 0.01, tau: float = 1e-3) -> 'SmoothValve':
+        """
+        :return: smooth valve with the resistances and thresholds of the valve
+        """
+        return cls(valve.Ropen, valve.Rclosed, valve.dhopen, valve.dhclose, width, tau)
+
+    def resistance(self, opening):
+        return 1 / (opening / self.Ropen + (1 - opening) / self.Rclosed)
+
+    def threshold(self, opening):
+        return self.dhopen + (self.dhclose - self.dhopen) * opening
+
+    def diff(self, dh, opening):
+        """
+        :param dh: head difference over the valve
+        :param opening: state of the valve, 0 if closed and 1 if open
+        :return: rate of change of the opening
+        """
+        # the sigmoid saturates far before exp overflows
+        x = np.clip((dh - self.threshold(opening)) / self.width, -50, 50)
+        return (_step(x) - opening) / self.tau
+
+_step = Sigmoid(L=1.0, x0=0.0, k=1.0)
+
 class Circuit:
-    def solve(self, t, h_pump, param):
+    states = () # names of the circuit states, in the order of y
+    stateful = False # whether a component changes its state on evaluation, see utils.samplewise
+
+    def solve(self, t, h_pump, param, closed: dict | None = None):
         pass
 
+    def diagnostics(self, t, h_pump, y, closed: dict | None = None):
+        """
+        Derived heads and flows of the circuit, vectorized over the samples if its components are.
+
+        :param closed: states of the hysteretic elements by name, e.g. arrays of the states of the samples, by default
+            their current states
+        :return: dict of named signals
+        """
+        return {}
+
+    def elements(self) -> dict:
+        """
+        :return: hysteretic elements of the circuit by name, e.g. an Oscillator, of which the states are switched at
+            the events of the circuit
+        """
+        return {}
+
+    def heads(self, t, y) -> dict:
+        """
+        :return: head differences over the hysteretic elements by name
+        """
+        return {}
+
+    def events(self, offset: int = 0) -> list:
+        """
+        :param offset: index of the first state of the circuit in the states of the system
+        :return: event functions (t, y) of the opening and closing of every hysteretic element, in the order of
+            transitions
+        """
+        functions = []
+        for name, element in self.elements().items():
+            @event(direction=1)
+            def opening(t, y, name=name, element=element):
+                return element.event_open(self.heads(t, y[offset:])[name])
+
+            @event(direction=-1)
+            def closing(t, y, name=name, element=element):
+                return element.event_close(self.heads(t, y[offset:])[name])
+
+            functions += [opening, closing]
+        return functions
+
+    def transitions(self) -> list:
+        """
+        :return: transitions of hybrid.simulate of the events
+        """
+        return [transition for name, element in self.elements().items() for transition in (
+            (name, 'open', element.open, lambda element=element: element.closed),
+            (name, 'close', element.close, lambda element=element: not element.closed))]
+
 class NLRLCircuit(Circuit):
     """
     Pump --> Impedance --> Nonlinear resistor.
     """
+    states = ('flow',)
+
     def __init__(self, resistance, impedance: float = 0.01):
         self.resistance = resistance
         self.impedance = impedance
@@ -77,9 +264,13 @@ class NLRLCircuit(Circuit):
     def h(self, t, y):
         return self.resistance(t) * np.power(y, self.resistance_power)
 
-    def solve(self, t, h_pump, y):
+    def solve(self, t, h_pump, y, closed: dict | None = None):
         return [(h_pump - self.h(t, y[0])) / self.impedance]
 
+    def diagnostics(self, t, h_pump, y, closed: dict | None = None):
+        head_resistance = self.h(t, y[0])
+        return {'head_resistance': head_resistance, 'head_impedance': h_pump - head_resistance}
+
 class RLCCircuit(Circuit):
     """
     Parallel RC, series L circuit with resistance in parallel with capacitor, known as low-pass filter.
@@ -90,6 +281,8 @@ class RLCCircuit(Circuit):
 
     All components (R, L, C) are assumed a function of time, resistance assumed also a function of pressure difference.
     """
+    states = ('flow', 'head')
+
     def __init__(self,
                  resistance = lambda t, h: 1.0,
                  capacitance = lambda t: 1.0,
@@ -98,8 +291,25 @@ class RLCCircuit(Circuit):
         self.capacitance = capacitance
         self.impedance = impedance
 
+    @property
+    def stateful(self) -> bool:
+        return getattr(self.resistance, 'stateful', False)
+
+    def elements(self) -> dict:
+        return {'resistance': self.resistance} if isinstance(self.resistance, Oscillator) else {}
 
-    def solve(self, t, h_pump, y):
+    def heads(self, t, y) -> dict:
+        return {'resistance': y[1]}
+
+    def _resistance(self, t, dh, closed: dict | None = None):
+        """
+        :return: resistance at the head difference dh, of which an Oscillator takes its state from closed if given
+        """
+        if closed is not None and 'resistance' in closed:
+            return self.resistance(t, dh, closed['resistance'])
+        return self.resistance(t, dh)
+
+    def solve(self, t, h_pump, y, closed: dict | None = None):
         """
         h_pump: pump head
         y = [q, h]
@@ -108,11 +318,15 @@ class RLCCircuit(Circuit):
         """
         impedance_head = h_pump - y[1]
         dq = impedance_head / self.impedance
-        qr = y[1] / self.resistance(t, y[1])
+        qr = y[1] / self._resistance(t, y[1], closed)
         qc = y[0] - qr
         dh = qc / self.capacitance(t)
         return [dq, dh]
 
+    def diagnostics(self, t, h_pump, y, closed: dict | None = None):
+        qr = y[1] / self._resistance(t, y[1], closed)
+        return {'head_impedance': h_pump - y[1], 'flow_resistance': qr, 'flow_capacitance': y[0] - qr}
+
 class RLCRCCircuit(RLCCircuit):
     """
     Parallel RC, series L circuit with resistance in parallel with capacitor, known as low-pass filter.
@@ -124,6 +338,8 @@ class RLCRCCircuit(RLCCircuit):
 
     All components (R, L, C, R, C) are assumed a function of time, resistance assumed also a function of pressure difference.
     """
+    states = ('flow', 'head', 'head_ac')
+
     def __init__(self,
                  resistance = lambda t, h: 1.0,
                  capacitance = lambda t: 1.0,
@@ -134,7 +350,10 @@ class RLCRCCircuit(RLCCircuit):
         self.Rout = Rout
         self.Cac = Cac
 
-    def solve(self, t, h_pump, y):
+    def heads(self, t, y) -> dict:
+        return {'resistance': y[1] - y[2]}
+
+    def solve(self, t, h_pump, y, closed: dict | None = None):
         """
         h_pump: pump head
         y = [q, h, hac]
@@ -146,7 +365,7 @@ class RLCRCCircuit(RLCCircuit):
         dq = impedance_head / self.impedance
 
         hv_head = y[1] - y[2]
-        qhv = hv_head / self.resistance(t, hv_head)
+        qhv = hv_head / self._resistance(t, hv_head, closed)
         qc = y[0] - qhv
         dh = qc / self.capacitance(t)
 
@@ -155,8 +374,15 @@ class RLCRCCircuit(RLCCircuit):
         dhac = qac / self.Cac(t)
         return [dq, dh, dhac]
 
+    def diagnostics(self, t, h_pump, y, closed: dict | None = None):
+        hv_head = y[1] - y[2]
+        qhv = hv_head / self._resistance(t, hv_head, closed)
+        qr = y[2] / self.Rout(t)
+        return {'head_impedance': h_pump - y[1], 'flow_valve': qhv, 'flow_capacitance': y[0] - qhv,
+                'flow_resistance_out': qr, 'flow_ac': qhv - qr}
+
 class RLCRCCircuitCL(RLCRCCircuit):
-    def solve(self, t, h_pump, y):
+    def solve(self, t, h_pump, y, closed: dict | None = None):
         """
         h_pump: pump head
         y = [q, h, hac]
@@ -168,7 +394,7 @@ class RLCRCCircuitCL(RLCRCCircuit):
         dq = impedance_head / self.impedance
 
         hv_head = y[1] - y[2]
-        qhv = hv_head / self.resistance(t, hv_head)
+        qhv = hv_head / self._resistance(t, hv_head, closed)
         qc = y[0] - qhv
         dh = qc / self.capacitance(t)
 
@@ -177,10 +403,16 @@ class RLCRCCircuitCL(RLCRCCircuit):
         dhac = qac / self.Cac(t)
         return [dq, dh, dhac]
 
+    def diagnostics(self, t, h_pump, y, closed: dict | None = None):
+        hv_head = y[1] - y[2]
+        qhv = hv_head / self._resistance(t, hv_head, closed)
+        return {'head_impedance': h_pump - y[1] + y[2] - self.Rout(t) * y[0], 'head_resistance_out': self.Rout(t) * y[0],
+                'flow_valve': qhv, 'flow_capacitance': y[0] - qhv, 'flow_ac': qhv - y[0]}
+
 class LVL:
-    def __init__(self, oscillator: HystereticValve = HystereticValve(), C1: float = 1.0, C2: float = 0.01,
+    def __init__(self, oscillator: HystereticValve | None = None, C1: float = 1.0, C2: float = 0.01,
                  R: float = 100, L: float = 0.01):
-        self.oscillator = oscillator
+        self.oscillator = HystereticValve() if oscillator is None else oscillator
         self.L = L
         self.C1 = C1
         self.C2 = C2
@@ -1,47 +1,25 @@
 from math import pi
 import numpy as np
-from sympy.physics.units import impedance
 
 from tahs import TAH, LinearMembrane, NonlinearMembrane
 from utils import Sigmoid
-from scipy.integrate import solve_ivp
+from hybrid import simulate
+from freezing import freeze
 from matplotlib import pyplot as plt
+import matplotlib.pylab as pylab
 from motors import DCM
 from pumps import CP
 from utils import event
-from copy import deepcopy
+from circuits import Valve
+from parameters import Parameters, Modes
 
-class Valve:
-    def __init__(self, Ropen:float=0.1, Rclosed:float=1e4, dhopen:float=4, dhclose:float=0.5, initial_state: int=0):
-        self.Ropen = Ropen
-        self.Rclosed = Rclosed
-        self.dhopenref = dhopen
-        self.dhcloseref = dhclose
-        self.dhopen = 1.0 * dhopen
-        self.dhclose = 1.0 *dhclose
-        self.state: int = initial_state
+params = {'legend.fontsize': 'xx-large',
+         'axes.labelsize': 'xx-large'}
+pylab.rcParams.update(params)
 
-    def open(self):
-        self.state = 1
-        self.dhopen = 1000
-        self.dhclose = 1.0 * self.dhcloseref
+class Circuit(Parameters):
+    __slots__ = ('hvalve', 'C', 'CL', 'CR', 'R', 'L', 'RinL', 'RinR', 'RoutL', 'RoutR')
 
-    def close(self):
-        self.state = 0
-        self.dhopen = 1.0 * self.dhopenref
-        self.dhclose = 1000
-
-    def event_open(self, dh):
-        return dh - self.dhopen
-
-    def event_close(self, dh):
-        return dh - self.dhclose
-
-    def __call__(self) -> float:
-        return self.Rclosed if self.state == 0 else self.Ropen
-
-
-class Circuit:
     def __init__(self, hvalve: Valve = Valve(),
                  C: float = 1.0,
                  CL: float = 0.01,
@@ -63,7 +41,8 @@ class Circuit:
         self.RoutL = RoutL
         self.RoutR = RoutR
 
-class TCM:
+class TCM(Parameters):
+    __slots__ = ('valve_in', 'valve_out', 'C1', 'C2', 'R')
 
     def __init__(self, valve_in: Valve = Valve(),
                  valve_out: Valve = Valve(),
@@ -76,24 +55,27 @@ class TCM:
         self.valve_in = valve_in
         self.valve_out = valve_out
 
-class SCM:
+class SCM(Parameters):
+    __slots__ = ('pc', 'sc')
+
     def __init__(self, pc: TCM = TCM(), sc: TCM = TCM()):
         self.pc = pc
         self.sc = sc
 
 class BiVenSystem:
-    def __init__(self, motor: DCM = DCM(),
-                 pump: CP = CP(),
+    def __init__(self, motor: DCM | None = None,
+                 pump: CP | None = None,
                  circuit: Circuit = Circuit(),
-                 tahL: TAH = LinearMembrane(),
-                 tahR: TAH = LinearMembrane(),
+                 tahL: TAH | None = None,
+                 tahR: TAH | None = None,
                  hemo: SCM = SCM()):
-        self.motor = motor
-        self.pump = pump
+        self.motor = DCM() if motor is None else motor
+        self.pump = CP() if pump is None else pump
         self.circuit = circuit
-        self.tahL = tahL
-        self.tahR = tahR
+        self.tahL = LinearMembrane() if tahL is None else tahL
+        self.tahR = LinearMembrane() if tahR is None else tahR
         self.hemo = hemo
+        self.modes = Modes('hvalve', 'valve_scin', 'valve_scout', 'valve_pcin', 'valve_pcout')
 
     def solve(self, t, y):
         current, speed, pump_capacity, h1, haL, haR, vvL, vvR, hp1, hp2, hs1, hs2 = y
@@ -121,7 +103,7 @@ class BiVenSystem:
         dq_pump = impedance_head / self.circuit.L
 
         # dh1(q, h1, ha)
-        Rhv = self.circuit.hvalve()
+        Rhv = self.circuit.hvalve.resistance(self.modes['hvalve'])
         ha = (h1 / Rhv + haL / self.circuit.RinL + haR / self.circuit.RinR) / (1 / Rhv + 1 / self.circuit.RinR + 1/self.circuit.RinL)
 
         qinL = (ha - haL) / self.circuit.RinL
@@ -134,11 +116,11 @@ class BiVenSystem:
         hvL = self.tahL.pressure(haL, vvL)
         hvR = self.tahR.pressure(haR, vvR)
 
-        qso = (hs2 - hvR) / self.hemo.sc.valve_out()
-        qpi = (hvR - hp1) / self.hemo.pc.valve_in()
+        qso = (hs2 - hvR) / self.hemo.sc.valve_out.resistance(self.modes['valve_scout'])
+        qpi = (hvR - hp1) / self.hemo.pc.valve_in.resistance(self.modes['valve_pcin'])
         qp = (hp1 - hp2) / self.hemo.pc.R
-        qpo = (hp2 - hvL) / self.hemo.pc.valve_out()
-        qsi = (hvL - hs1) / self.hemo.sc.valve_in()
+        qpo = (hp2 - hvL) / self.hemo.pc.valve_out.resistance(self.modes['valve_pcout'])
+        qsi = (hvL - hs1) / self.hemo.sc.valve_in.resistance(self.modes['valve_scin'])
         qs = (hs1 - hs2) / self.hemo.sc.R
 
         dhs1 = (qsi - qs) / self.hemo.sc.C1
@@ -163,14 +145,14 @@ class BiVenSystem:
     @event(direction=1)
     def event_valve_opening(self, t, y):
         current, speed, pump_capacity, h1, haL, haR, vvL, vvR, hp1, hp2, hs1, hs2 = y
-        Rhv = self.circuit.hvalve()
+        Rhv = self.circuit.hvalve.resistance(self.modes['hvalve'])
         ha = (h1 / Rhv + haL / self.circuit.RinL + haR / self.circuit.RinR) / (1 / Rhv + 1 / self.circuit.RinR + 1/self.circuit.RinL)
         return self.circuit.hvalve.event_open(h1 - ha)
 
     @event(direction=-1)
     def event_valve_closing(self, t, y):
         current, speed, pump_capacity, h1, haL, haR, vvL, vvR, hp1, hp2, hs1, hs2 = y
-        Rhv = self.circuit.hvalve()
+        Rhv = self.circuit.hvalve.resistance(self.modes['hvalve'])
         ha = (h1 / Rhv + haL / self.circuit.RinL + haR / self.circuit.RinR) / (1 / Rhv + 1 / self.circuit.RinR + 1/self.circuit.RinL)
         return self.circuit.hvalve.event_close(h1 - ha)
 
@@ -224,8 +206,8 @@ circuit = Circuit(oscillator, C=0.5, CL=0.01, CR=0.01, R=10, L=1.0, RinL=0.5, Ri
 tahL = NonlinearMembrane(a=0.1, b=100, Vv0=1, Vp0=0.9)
 tahR = NonlinearMembrane(a=0.5, b=10, Vv0=0.8, Vp0=0.7)
 heart_valve = Valve(Ropen=1, Rclosed=1e4, dhopen=0.1, dhclose=0.0)
-hemo_pc = TCM(heart_valve, deepcopy(heart_valve), C1=0.1, C2=0.5, R=5)
-hemo_sc = TCM(deepcopy(heart_valve), deepcopy(heart_valve), C1=0.2, C2=1.0, R=20)
+hemo_pc = TCM(heart_valve, heart_valve, C1=0.1, C2=0.5, R=5)
+hemo_sc = TCM(heart_valve, heart_valve, C1=0.2, C2=1.0, R=20)
 hemo = SCM(hemo_pc, hemo_sc)
 system = BiVenSystem(motor=motor, pump=pump, circuit=circuit, tahL=tahL, tahR=tahR, hemo=hemo)
 
@@ -239,81 +221,32 @@ events = [system.event_valve_opening, system.event_valve_closing,
 # current, speed, pump_capacity, circuit_head, haL, haR, vvL, vvR, hp1, hp2, hs1, hs2
 initial_state = (0.0, 1e-6, 1e-6, 3.0, 3.0, 3.0, tahL.Vv0, tahR.Vv0, 0.0, 0.0, 0.0, 0.0)
 
-t_start = 0.0
-t_end = 20
-
-t_full = []
-y_full = []
-hvalve_state = []
-valve_pcin_state = []
-valve_pcout_state = []
-valve_scin_state = []
-valve_scout_state = []
-derivatives = []
-
-event_times = []
-
-while t_start < t_end:
-    sol = solve_ivp(system.solve, [t_start, t_end], initial_state, events=events, rtol=1e-9, atol=1e-9)
-    derivatives.append(system.solve(sol.t, sol.y))
-
-    t_full.append(sol.t)
-    y_full.append(sol.y)
-    hvalve_state.append(system.circuit.hvalve.state * np.ones_like(sol.t))
-    valve_pcin_state.append(system.hemo.pc.valve_in.state * np.ones_like(sol.t))
-    valve_pcout_state.append(system.hemo.pc.valve_out.state * np.ones_like(sol.t))
-    valve_scin_state.append(system.hemo.sc.valve_in.state * np.ones_like(sol.t))
-    valve_scout_state.append(system.hemo.sc.valve_out.state * np.ones_like(sol.t))
-
-    if any([i.size > 0 for i in sol.t_events]):
-
-        event = next(i for i, j in enumerate(sol.t_events) if len(j))
-        if event == 0:
-            system.circuit.hvalve.open()
-        elif event == 1:
-            system.circuit.hvalve.close()
-        elif event == 2:
-            system.hemo.sc.valve_in.open()
-        elif event == 3:
-            system.hemo.sc.valve_in.close()
-        elif event == 4:
-            system.hemo.sc.valve_out.open()
-        elif event == 5:
-            system.hemo.sc.valve_out.close()
-        elif event == 6:
-            system.hemo.pc.valve_in.open()
-        elif event == 7:
-            system.hemo.pc.valve_in.close()
-        elif event == 8:
-            system.hemo.pc.valve_out.open()
-        elif event == 9:
-            system.hemo.pc.valve_out.close()
-        else:
-            print("no valid event")
-
-        event_time = sol.t_events[event][0]
-        event_times.append(event_time)
-        print(event_time)
-        print(event)
-        t_start = event_time
-        initial_state = sol.y_events[event][0]
-    else:
-        t_start = t_end
-
-
-length = 24
-offset = 5
-m = np.s_[-length-offset:-offset-1]
-
-t_full = np.concatenate(t_full)
-y_full = np.concatenate(y_full, axis=1)
-hvalve_state = np.concatenate(hvalve_state)
-valve_pcin_state = np.concatenate(valve_pcin_state)
-valve_pcout_state = np.concatenate(valve_pcout_state)
-valve_scin_state = np.concatenate(valve_scin_state)
-valve_scout_state = np.concatenate(valve_scout_state)
-
-derivatives = np.concatenate(derivatives, axis=1)
+transitions = [*system.modes.transitions('hvalve'),
+               *system.modes.transitions('valve_scin'),
+               *system.modes.transitions('valve_scout'),
+               *system.modes.transitions('valve_pcin'),
+               *system.modes.transitions('valve_pcout')]
+
+frozen = freeze(system, 'solve', *(event.__name__ for event in events))
+frozen_events = [getattr(frozen, event.__name__) for event in events]
+
+trajectory = simulate(frozen.solve, [0.0, 20], initial_state, frozen_events, transitions, rtol=1e-9, atol=1e-9,
+                      signals={'derivatives': system.solve,
+                               'hvalve_state': lambda t, y: system.modes['hvalve'] * np.ones_like(t),
+                               'valve_pcin_state': lambda t, y: system.modes['valve_pcin'] * np.ones_like(t),
+                               'valve_pcout_state': lambda t, y: system.modes['valve_pcout'] * np.ones_like(t),
+                               'valve_scin_state': lambda t, y: system.modes['valve_scin'] * np.ones_like(t),
+                               'valve_scout_state': lambda t, y: system.modes['valve_scout'] * np.ones_like(t)})
+
+t_full = trajectory.t
+y_full = trajectory.y
+hvalve_state = trajectory['hvalve_state']
+valve_pcin_state = trajectory['valve_pcin_state']
+valve_pcout_state = trajectory['valve_pcout_state']
+valve_scin_state = trajectory['valve_scin_state']
+valve_scout_state = trajectory['valve_scout_state']
+event_times = trajectory.log['t']
+derivatives = trajectory['derivatives']
 
 i, w, qp, h1, haL, haR, vvL, vvR, hp1, hp2, hs1, hs2 = y_full
 di, dw, dqp, dh1, dhaL, dhaR, dvvL, dvvR, dhp1, dhp2, dhs1, dhs2 = derivatives
@@ -378,8 +311,8 @@ plt.plot(t_full, hr, 'y-', label="pressure loss resistance")
 plt.plot(t_full, h1-ha, 'ro-', label='pressure drop hysteretic valve')
 
 plt.plot(t_full, hvalve_state, 'k--', label="hysteretic valve state")
-plt.axhline(oscillator.dhopenref, linestyle='--', color='black')
-plt.axhline(oscillator.dhcloseref, linestyle='--', color='black')
+plt.axhline(oscillator.dhopen, linestyle='--', color='black')
+plt.axhline(oscillator.dhclose, linestyle='--', color='black')
 plt.legend()
 
 
@@ -394,8 +327,8 @@ plt.plot(t_full, hvR, 'y-', label='hvR')
 plt.legend()
 
 plt.figure()
-plt.axhline(oscillator.dhopenref, linestyle='--', color='black')
-plt.axhline(oscillator.dhcloseref, linestyle='--', color='black')
+plt.axhline(oscillator.dhopen, linestyle='--', color='black')
+plt.axhline(oscillator.dhclose, linestyle='--', color='black')
 plt.axhline(0.1, linestyle='--', color='black')
 plt.axhline(0.0, linestyle='--', color='black')
 
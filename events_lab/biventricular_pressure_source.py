@@ -1,45 +1,22 @@
 from math import pi
 import numpy as np
-from sympy.physics.units import impedance
 
 from tahs import TAH, LinearMembrane, NonlinearMembrane
 from utils import Sigmoid
 from scipy.signal import square
-from scipy.integrate import solve_ivp
+from hybrid import simulate
+from freezing import freeze
 from matplotlib import pyplot as plt
+import matplotlib.pylab as pylab
 from motors import DCM
 from pumps import CP
 from utils import event
-from copy import deepcopy
+from circuits import Valve
+from parameters import Parameters, Modes
 
-class Valve:
-    def __init__(self, Ropen:float=0.1, Rclosed:float=1e4, dhopen:float=4, dhclose:float=0.5, initial_state: int=0):
-        self.Ropen = Ropen
-        self.Rclosed = Rclosed
-        self.dhopenref = dhopen
-        self.dhcloseref = dhclose
-        self.dhopen = 1.0 * dhopen
-        self.dhclose = 1.0 *dhclose
-        self.state: int = initial_state
-
-    def open(self):
-        self.state = 1
-        self.dhopen = 1000
-        self.dhclose = 1.0 * self.dhcloseref
-
-    def close(self):
-        self.state = 0
-        self.dhopen = 1.0 * self.dhopenref
-        self.dhclose = 1000
-
-    def event_open(self, dh):
-        return dh - self.dhopen
-
-    def event_close(self, dh):
-        return dh - self.dhclose
-
-    def __call__(self) -> float:
-        return self.Rclosed if self.state == 0 else self.Ropen
+params = {'legend.fontsize': 'xx-large',
+         'axes.labelsize': 'xx-large'}
+pylab.rcParams.update(params)
 
 class Source:
     def __init__(self, magnitude: float = 1.0, freq: float = 1, phase: float = pi, duty: float = 0.5):
@@ -51,7 +28,9 @@ class Source:
     def __call__(self, t):
         return self.magnitude * (0.5 * square(2 * pi * self.freq * t - self.phase, duty=self.duty) + 0.5)
 
-class Circuit:
+class Circuit(Parameters):
+    __slots__ = ('SL', 'SR', 'CL', 'CR', 'RL', 'RR')
+
     def __init__(self,
                  SL: Source = Source(3.0, pi/2, 0.5),
                  SR: Source = Source(5.0, pi, 0.5),
@@ -66,7 +45,8 @@ class Circuit:
         self.RL = RL
         self.RR = RR
 
-class TCM:
+class TCM(Parameters):
+    __slots__ = ('valve_in', 'valve_out', 'C1', 'C2', 'R')
 
     def __init__(self, valve_in: Valve = Valve(),
                  valve_out: Valve = Valve(),
@@ -79,20 +59,23 @@ class TCM:
         self.valve_in = valve_in
         self.valve_out = valve_out
 
-class SCM:
+class SCM(Parameters):
+    __slots__ = ('pc', 'sc')
+
     def __init__(self, pc: TCM = TCM(), sc: TCM = TCM()):
         self.pc = pc
         self.sc = sc
 
 class BiVenSystem:
     def __init__(self, circuit: Circuit = Circuit(),
-                 tahL: TAH = LinearMembrane(),
-                 tahR: TAH = LinearMembrane(),
+                 tahL: TAH | None = None,
+                 tahR: TAH | None = None,
                  hemo: SCM = SCM()):
         self.circuit = circuit
-        self.tahL = tahL
-        self.tahR = tahR
+        self.tahL = LinearMembrane() if tahL is None else tahL
+        self.tahR = LinearMembrane() if tahR is None else tahR
         self.hemo = hemo
+        self.modes = Modes('valve_scin', 'valve_scout', 'valve_pcin', 'valve_pcout')
 
     def solve(self, t, y):
         haL, haR, vvL, vvR, hp1, hp2, hs1, hs2 = y
@@ -101,11 +84,11 @@ class BiVenSystem:
         hvL = self.tahL.pressure(haL, vvL)
         hvR = self.tahR.pressure(haR, vvR)
 
-        qso = (hs2 - hvR) / self.hemo.sc.valve_out()
-        qpi = (hvR - hp1) / self.hemo.pc.valve_in()
+        qso = (hs2 - hvR) / self.hemo.sc.valve_out.resistance(self.modes['valve_scout'])
+        qpi = (hvR - hp1) / self.hemo.pc.valve_in.resistance(self.modes['valve_pcin'])
         qp = (hp1 - hp2) / self.hemo.pc.R
-        qpo = (hp2 - hvL) / self.hemo.pc.valve_out()
-        qsi = (hvL - hs1) / self.hemo.sc.valve_in()
+        qpo = (hp2 - hvL) / self.hemo.pc.valve_out.resistance(self.modes['valve_pcout'])
+        qsi = (hvL - hs1) / self.hemo.sc.valve_in.resistance(self.modes['valve_scin'])
         qs = (hs1 - hs2) / self.hemo.sc.R
 
         dhs1 = (qsi - qs) / self.hemo.sc.C1
@@ -187,9 +170,9 @@ circuit = Circuit(SL=pressure_source_left, SR=pressure_source_right,
                   RL=inlet_resistance_left, RR=inlet_resistance_right)
 
 mitral_valve = Valve(Ropen=1, Rclosed=1e4, dhopen=0.0, dhclose=0.0)
-aortic_valve = deepcopy(mitral_valve)
-tricuspid_valve = deepcopy(mitral_valve)
-pulmonary_valve = deepcopy(mitral_valve)
+aortic_valve = mitral_valve
+tricuspid_valve = mitral_valve
+pulmonary_valve = mitral_valve
 
 # systemic circulation
 # TPR = (aortic pressure - RAP) / CO approx 120 - 2 mmHg / 5 L/min
@@ -230,70 +213,29 @@ events = [system.event_valve_systemic_in_opening, system.event_valve_systemic_in
 # haL, haR, vvL, vvR, hp1, hp2, hs1, hs2
 initial_state = (0.0, 0.0, tahL.Vv0, tahR.Vv0, 0.0, 0.0, 0.0, 0.0)
 
-t_start = 0.0
-t_end = 4
-
-t_full = []
-y_full = []
-valve_pcin_state = []
-valve_pcout_state = []
-valve_scin_state = []
-valve_scout_state = []
-derivatives = []
-
-event_times = []
-
-while t_start < t_end:
-    sol = solve_ivp(system.solve, [t_start, t_end], initial_state, events=events, rtol=1e-9, atol=1e-9)
-    derivatives.append(system.solve(sol.t, sol.y))
-
-    t_full.append(sol.t)
-    y_full.append(sol.y)
-    valve_pcin_state.append(system.hemo.pc.valve_in.state * np.ones_like(sol.t))
-    valve_pcout_state.append(system.hemo.pc.valve_out.state * np.ones_like(sol.t))
-    valve_scin_state.append(system.hemo.sc.valve_in.state * np.ones_like(sol.t))
-    valve_scout_state.append(system.hemo.sc.valve_out.state * np.ones_like(sol.t))
-
-    if any([i.size > 0 for i in sol.t_events]):
-
-        event = next(i for i, j in enumerate(sol.t_events) if len(j))
-        if event == 0:
-            system.hemo.sc.valve_in.open()
-        elif event == 1:
-            system.hemo.sc.valve_in.close()
-        elif event == 2:
-            system.hemo.sc.valve_out.open()
-        elif event == 3:
-            system.hemo.sc.valve_out.close()
-        elif event == 4:
-            system.hemo.pc.valve_in.open()
-        elif event == 5:
-            system.hemo.pc.valve_in.close()
-        elif event == 6:
-            system.hemo.pc.valve_out.open()
-        elif event == 7:
-            system.hemo.pc.valve_out.close()
-        else:
-            print("no valid event")
-
-        event_time = sol.t_events[event][0]
-        event_times.append(event_time)
-        print(event_time)
-        print(event)
-        t_start = event_time
-        initial_state = sol.y_events[event][0]
-    else:
-        t_start = t_end
-
-
-t_full = np.concatenate(t_full)
-y_full = np.concatenate(y_full, axis=1)
-valve_pcin_state = np.concatenate(valve_pcin_state)
-valve_pcout_state = np.concatenate(valve_pcout_state)
-valve_scin_state = np.concatenate(valve_scin_state)
-valve_scout_state = np.concatenate(valve_scout_state)
-
-derivatives = np.concatenate(derivatives, axis=1)
+transitions = [*system.modes.transitions('valve_scin'),
+               *system.modes.transitions('valve_scout'),
+               *system.modes.transitions('valve_pcin'),
+               *system.modes.transitions('valve_pcout')]
+
+frozen = freeze(system, 'solve', *(event.__name__ for event in events))
+frozen_events = [getattr(frozen, event.__name__) for event in events]
+
+trajectory = simulate(frozen.solve, [0.0, 4], initial_state, frozen_events, transitions, rtol=1e-9, atol=1e-9,
+                      signals={'derivatives': system.solve,
+                               'valve_pcin_state': lambda t, y: system.modes['valve_pcin'] * np.ones_like(t),
+                               'valve_pcout_state': lambda t, y: system.modes['valve_pcout'] * np.ones_like(t),
+                               'valve_scin_state': lambda t, y: system.modes['valve_scin'] * np.ones_like(t),
+                               'valve_scout_state': lambda t, y: system.modes['valve_scout'] * np.ones_like(t)})
+
+t_full = trajectory.t
+y_full = trajectory.y
+valve_pcin_state = trajectory['valve_pcin_state']
+valve_pcout_state = trajectory['valve_pcout_state']
+valve_scin_state = trajectory['valve_scin_state']
+valve_scout_state = trajectory['valve_scout_state']
+event_times = trajectory.log['t']
+derivatives = trajectory['derivatives']
 
 haL, haR, vvL, vvR, hp1, hp2, hs1, hs2 = y_full
 dhaL, dhaR, dvvL, dvvR, dhp1, dhp2, dhs1, dhs2 = derivatives
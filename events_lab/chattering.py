@@ -0,0 +1,56 @@
+import numpy as np
+from hybrid import simulate, Chattering
+from circuits import Valve
+from parameters import Modes
+from utils import event
+from freezing import freeze
+from matplotlib import pyplot as plt
+
+"""
+A reservoir drained through a valve with equal thresholds to open and close, filled by a sinusoidal flow. Once the
+flow reverses the head settles on the threshold, where the valve chatters: every switch immediately triggers the next
+one. Without chattering handling the simulation stalls, with it the valve slides until the flow drives the head away
+from the threshold.
+"""
+
+class Reservoir:
+    def __init__(self, valve: Valve | None = None, C: float = 0.1):
+        self.valve = Valve(Ropen=0.1, Rclosed=1e4, dhopen=1.0, dhclose=1.0) if valve is None else valve
+        self.C = C
+        self.modes = Modes('valve')
+
+    def flow(self, t):
+        return np.sin(np.pi * t)
+
+    def solve(self, t, y):
+        return [(self.flow(t) - y[0] / self.valve.resistance(self.modes['valve'])) / self.C]
+
+    @event(direction=1)
+    def opening(self, t, y):
+        return self.valve.event_open(y[0])
+
+    @event(direction=-1)
+    def closing(self, t, y):
+        return self.valve.event_close(y[0])
+
+system = Reservoir()
+
+# the frozen functions take the modes in which the sliding valve is evaluated
+frozen = freeze(system, 'solve', 'opening', 'closing')
+
+trajectory = simulate(frozen.solve, [0.0, 4.0], [0.0], [frozen.opening, frozen.closing],
+                      system.modes.transitions('valve'), states=('head',), rtol=1e-9, atol=1e-9,
+                      chattering=Chattering(), modes=system.modes,
+                      signals={'valve_state': lambda t, y: system.modes['valve'] * np.ones_like(t)})
+
+slides = trajectory.occurrences('valve', 'slide')
+print(f'{len(trajectory.log)} events, {len(slides)} slides at t = {slides["t"]}')
+
+plt.figure()
+plt.plot(trajectory.t, trajectory['head'], 'bo-', label='head')
+plt.plot(trajectory.t, trajectory['valve_state'], 'm-', label='valve state')
+plt.axhline(system.valve.dhopen, linestyle='--', color='black')
+[plt.axvline(t, color='red', linestyle='--') for t in slides['t']]
+plt.legend()
+
+plt.show()
@@ -1,4 +1,4 @@
-from scipy.integrate import solve_ivp
+from hybrid import simulate
 from matplotlib import pyplot as plt
 import numpy as np
 from typing import Protocol, Any
@@ -30,11 +30,11 @@ class HystereticValve:
         return self.rmax if self.state == 0 else self.rmin
 
 class System:
-    def __init__(self, q_pump:float = 1, C1:float=1, C2:float=1, valve:HystereticValve=HystereticValve()):
+    def __init__(self, q_pump:float = 1, C1:float=1, C2:float=1, valve:HystereticValve | None = None):
         self.q_pump = q_pump
         self.C1 = C1
         self.C2 = C2
-        self.valve = valve
+        self.valve = HystereticValve() if valve is None else valve
 
     def __call__(self, t, y):
         p1, p2 = y
@@ -55,43 +55,21 @@ class System:
 
 system = System()
 
-t_start = 0.0
-t_end = 10
 initial_state = [1.0, 1.0]
 
-t_full = []
-y_full = []
-valve_state = []
-event_times = []
-
 events = [system.event_valve_opening, system.event_valve_closing]
 
-while t_start < t_end:
-    sol = solve_ivp(system, [t_start, t_end], initial_state, events=events, rtol=1e-9, atol=1e-9, max_step=0.1)
-    t_full.append(sol.t)
-    y_full.append(sol.y)
-    valve_state.append(system.valve.state * np.ones_like(sol.t))
-
-    if any([i.size > 0 for i in sol.t_events]):
-
-        event = next(i for i, j in enumerate(sol.t_events) if len(j))
-        if event == 0:
-            system.valve.state = 1
-        elif event == 1:
-            system.valve.state = 0
-        else:
-            print("hoi")
-
-        event_time = sol.t_events[event][0]
-        event_times.append(event_time)
-        t_start = event_time
-        initial_state = sol.y_events[event][0]
-    else:
-        t_start = t_end
-
-t_full = np.concatenate(t_full)
-y_full = np.concatenate(y_full, axis=1)
-valve_state = np.concatenate(valve_state)
+# open and close, each enabled only from the other state
+transitions = [('valve', 'open', lambda: setattr(system.valve, 'state', 1), lambda: system.valve.state == 0),
+               ('valve', 'close', lambda: setattr(system.valve, 'state', 0), lambda: system.valve.state == 1)]
+
+trajectory = simulate(system, [0.0, 10], initial_state, events, transitions, rtol=1e-9, atol=1e-9,
+                      max_step=0.1, signals={'valve_state': lambda t, y: system.valve.state * np.ones_like(t)})
+
+t_full = trajectory.t
+y_full = trajectory.y
+valve_state = trajectory['valve_state']
+event_times = trajectory.log['t']
 
 p1, p2 = y_full
 
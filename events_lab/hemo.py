@@ -1,6 +1,6 @@
 from utils import TDP
 import numpy as np
-from scipy.integrate import solve_ivp
+from hybrid import simulate
 from matplotlib import pyplot as plt
 from typing import Protocol, Any
 
@@ -32,16 +32,16 @@ class HystereticValve:
 class System:
     def __init__(self, Pa: TDP = TDP(min=0.001, max=1), E:float = 1.0, V0: float = 0,
                  Cin:float = 0.5, Cout:float = 0.1, R:float = 10,
-                 valve_in = HystereticValve(dpmax=0.1, dpmin=0.05, rmax=1000, rmin=1),
-                 valve_out = HystereticValve(dpmax=0.1, dpmin=0.05, rmax=1000, rmin=1)):
+                 valve_in = None,
+                 valve_out = None):
         self.E = E
         self.Pa = Pa
         self.V0 = V0
         self.Cin = Cin
         self.R = R
         self.Cout = Cout
-        self.valve_in = valve_in
-        self.valve_out = valve_out
+        self.valve_in = HystereticValve(dpmax=0.1, dpmin=0.05, rmax=1000, rmin=1) if valve_in is None else valve_in
+        self.valve_out = HystereticValve(dpmax=0.1, dpmin=0.05, rmax=1000, rmin=1) if valve_out is None else valve_out
 
     def __call__(self, t, y):
         vv, pin, pout = y
@@ -83,52 +83,28 @@ class System:
 system = System()
 
 
-t_start = 0.0
-t_end = 5
 initial_state = [0.0, 0.0, 0.0]
 
-t_full = []
-y_full = []
-valve_in_state = []
-valve_out_state = []
-event_times = []
-
 events = [system.event_valve_in_opening, system.event_valve_in_closing,
           system.event_valve_out_opening, system.event_valve_out_closing]
 
-while t_start < t_end:
-    sol = solve_ivp(system, [t_start, t_end], initial_state, events=events, rtol=1e-9, atol=1e-9, max_step=0.1)
-    t_full.append(sol.t)
-    y_full.append(sol.y)
-    valve_in_state.append(system.valve_in.state * np.ones_like(sol.t))
-    valve_out_state.append(system.valve_out.state * np.ones_like(sol.t))
-
-    if any([i.size > 0 for i in sol.t_events]):
-
-        event = next(i for i, j in enumerate(sol.t_events) if len(j))
-        if event == 0:
-            system.valve_in.state = 1
-        elif event == 1:
-            system.valve_in.state = 0
-        elif event == 2:
-            system.valve_out.state = 1
-        elif event == 3:
-            system.valve_out.state = 0
-        else:
-            print("no event")
-
-        event_time = sol.t_events[event][0]
-        print(event_time)
-        event_times.append(event_time)
-        t_start = event_time + 1e-10
-        initial_state = sol.y_events[event][0]
-    else:
-        t_start = t_end
-
-t_full = np.concatenate(t_full)
-y_full = np.concatenate(y_full, axis=1)
-valve_in_state = np.concatenate(valve_in_state)
-valve_out_state = np.concatenate(valve_out_state)
+# open and close, each enabled only from the other state
+transitions = [(name, transition, lambda valve=valve, state=state: setattr(valve, 'state', state),
+                lambda valve=valve, state=state: valve.state != state)
+               for name, valve in (('valve_in', system.valve_in), ('valve_out', system.valve_out))
+               for transition, state in (('open', 1), ('close', 0))]
+
+# restart each segment from half the last full step instead of the initial step of solve_ivp
+trajectory = simulate(system, [0.0, 5], initial_state, events, transitions, rtol=1e-9, atol=1e-9,
+                      max_step=0.1, delay=1e-10, carry=0.5,
+                      signals={'valve_in_state': lambda t, y: system.valve_in.state * np.ones_like(t),
+                               'valve_out_state': lambda t, y: system.valve_out.state * np.ones_like(t)})
+
+t_full = trajectory.t
+y_full = trajectory.y
+valve_in_state = trajectory['valve_in_state']
+valve_out_state = trajectory['valve_out_state']
+event_times = trajectory.log['t']
 
 vv, pin, pout = y_full
 pv = system.Pa(t_full) + system.E * (vv - system.V0)
@@ -0,0 +1,101 @@
+from math import pi
+import numpy as np
+from tahs import LinearMembrane
+from utils import Sigmoid
+from hybrid import simulate
+from matplotlib import pyplot as plt
+import matplotlib.pylab as pylab
+from motors import DCM
+from pumps import CP
+from circuits import Valve
+from netlist import Netlist
+
+params = {'legend.fontsize': 'xx-large',
+         'axes.labelsize': 'xx-large'}
+pylab.rcParams.update(params)
+
+"""
+Setup of univentricular.py, with the circuit defined by a netlist instead of hand-derived flow balances
+"""
+
+class System:
+    def __init__(self, motor: DCM | None = None, pump: CP | None = None, netlist: Netlist | None = None):
+        self.motor = DCM() if motor is None else motor
+        self.pump = CP() if pump is None else pump
+        self.netlist = Netlist() if netlist is None else netlist
+
+    @property
+    def states(self) -> tuple[str, ...]:
+        return ('current', 'speed') + self.netlist.states
+
+    def solve(self, t, y):
+        current, speed, pump_capacity = y[:3]
+
+        di = (self.motor.voltage(t) - self.motor.R * current - self.motor.kt * speed) / self.motor.L
+        torque = self.pump.torque(speed, pump_capacity)
+        dw = (self.motor.kt * current - self.motor.mu * speed - torque) / self.motor.M
+        pump_head = self.pump.hq(speed, pump_capacity)
+
+        return [di, dw, *self.netlist.solve(t, pump_head, y[2:])]
+
+voltage = lambda t: Sigmoid(2, 0.1)(t)
+motor = DCM(voltage, R=0.2, L=0.01, M=3.88/1e7, kt=5.9/1000, mu=12/1e7)
+pump = CP(hm0=2.4, qn0=1.6, hn0=1.8, w0=1770 * (2* pi / 60), effn=0.35)
+oscillator = Valve(Ropen=1, Rclosed=1000, dhopen=4, dhclose=1)
+tah = LinearMembrane(E=1, Vv0=-1)
+heart_valve = Valve(Ropen=1, Rclosed=1e4, dhopen=0.1, dhclose=0.0)
+
+# pump from the pouch through the capacitance and hysteretic valve back to the pouch, ventricle in a closed loop
+netlist = (Netlist()
+           .pump('pump_capacity', 'ha', 'h1', L=0.01, R=10)
+           .capacitor('h1', C=1.0)
+           .valve('hvalve', 'h1', 'ha', oscillator)
+           .capacitor('ha', C=0.01)
+           .tah('vv', 'ha', 'hv', tah)
+           .capacitor('hart', C=0.1)
+           .capacitor('hb', C=0.5)
+           .valve('valve_in', 'hb', 'hv', heart_valve)
+           .valve('valve_out', 'hv', 'hart', heart_valve)
+           .resistor('R', 'hart', 'hb', 5))
+system = System(motor, pump, netlist)
+
+# current, speed, pump_capacity, circuit_head, ha, ven_volume, hart, hb
+initial_state = (0.0, 1e-6, 1e-6, 0.0, 0.0, tah.Vv0, 0.0, 0.0) # note preloaded system
+
+trajectory = simulate(system.solve, [0.0, 10], initial_state, netlist.events(offset=2), netlist.transitions(),
+                      states=system.states, rtol=1e-9, atol=1e-9,
+                      signals={'hvalve_state': lambda t, y: netlist.modes['hvalve'] * np.ones_like(t),
+                               'valve_in_state': lambda t, y: netlist.modes['valve_in'] * np.ones_like(t),
+                               'valve_out_state': lambda t, y: netlist.modes['valve_out'] * np.ones_like(t)})
+
+# all but the last segment
+trajectory = trajectory.segments(stop=-1)
+t_full = trajectory.t
+i, w, qp, h1, ha, vv, hart, hb = trajectory.y
+hv = tah.pressure(ha, vv)
+event_times = trajectory.log['t']
+
+plt.figure()
+plt.plot(t_full, h1, 'ko-', label="capacitance pressure")
+plt.plot(t_full, ha, 'bo-', label="pouch pressure")
+plt.plot(t_full, hv, 'mo-', label="ventricular pressure")
+[plt.axvline(i, color='black', linestyle='--') for i in event_times]
+plt.legend()
+
+plt.figure()
+plt.plot(t_full, hart, 'ro-', label="pressure afterload")
+plt.plot(t_full, hb, 'go-', label="pressure preload")
+plt.plot(t_full, hv, 'bo-', label="ventricular pressure")
+plt.legend()
+
+plt.figure()
+plt.plot(t_full, trajectory['hvalve_state'], 'm-', label="hysteretic valve state")
+plt.plot(t_full, trajectory['valve_in_state'], 'b-', label="input valve state")
+plt.plot(t_full, trajectory['valve_out_state'], 'k-', label="output valve state")
+plt.legend()
+
+plt.figure()
+plt.plot(vv, hv, 'r-', label="ventricle PV")
+plt.legend()
+
+plt.show()
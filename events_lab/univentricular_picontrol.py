@@ -2,47 +2,27 @@ from math import pi
 import numpy as np
 from tahs import LinearMembrane
 from utils import Sigmoid
-from scipy.integrate import solve_ivp
+from hybrid import simulate, Chattering
+from freezing import freeze
 from matplotlib import pyplot as plt
+import matplotlib.pylab as pylab
 from motors import DCM
 from pumps import CP
 from utils import event
-from copy import deepcopy
+from circuits import Valve
+from parameters import Parameters, Modes
+
+params = {'legend.fontsize': 'xx-large',
+         'axes.labelsize': 'xx-large'}
+pylab.rcParams.update(params)
 
 """
 Setup of Luuk van Laake, closed loop with linear membrane connected to closed loop three-compartment circulation
 """
 
-class Valve:
-    def __init__(self, Ropen:float=0.1, Rclosed:float=1e4, dhopen:float=4, dhclose:float=0.5, initial_state: int=0):
-        self.Ropen = Ropen
-        self.Rclosed = Rclosed
-        self.dhopenref = dhopen
-        self.dhcloseref = dhclose
-        self.dhopen = 1.0 * dhopen
-        self.dhclose = 1.0 *dhclose
-        self.state: int = initial_state
-
-    def open(self):
-        self.state = 1
-        self.dhopen = 1000
-        self.dhclose = 1.0 * self.dhcloseref
-
-    def close(self):
-        self.state = 0
-        self.dhopen = 1.0 * self.dhopenref
-        self.dhclose = 1000
-
-    def event_open(self, dh):
-        return dh - self.dhopen
-
-    def event_close(self, dh):
-        return dh - self.dhclose
-
-    def __call__(self) -> float:
-        return self.Rclosed if self.state == 0 else self.Ropen
+class Circuit(Parameters):
+    __slots__ = ('hvalve', 'C1', 'C2', 'R', 'L')
 
-class Circuit:
     def __init__(self, hvalve: Valve = Valve(), C1: float = 1.0, C2: float = 0.01,
                  R: float = 100, L: float = 0.01):
         self.L = L
@@ -51,7 +31,8 @@ class Circuit:
         self.R = R
         self.hvalve = hvalve
 
-class TCM:
+class TCM(Parameters):
+    __slots__ = ('valve_in', 'valve_out', 'C1', 'C2', 'R')
 
     def __init__(self, valve_in: Valve = Valve(),
                  valve_out: Valve = Valve(),
@@ -65,16 +46,17 @@ class TCM:
         self.valve_out = valve_out
 
 class System:
-    def __init__(self, motor: DCM = DCM(),
-                 pump: CP = CP(),
+    def __init__(self, motor: DCM | None = None,
+                 pump: CP | None = None,
                  circuit: Circuit = Circuit(),
-                 tah: LinearMembrane = LinearMembrane(),
+                 tah: LinearMembrane | None = None,
                  hemo: TCM = TCM()):
-        self.motor = motor
-        self.pump = pump
+        self.motor = DCM() if motor is None else motor
+        self.pump = CP() if pump is None else pump
         self.circuit = circuit
-        self.tah = tah
+        self.tah = LinearMembrane() if tah is None else tah
         self.hemo = hemo
+        self.modes = Modes('hvalve', 'valve_in', 'valve_out')
         self.ki: float = 2
         self.kp: float = 10
         self.kd: float = 10
@@ -105,17 +87,17 @@ class System:
 
         # dh1(q, h1, ha)
         hv_head = h1 - ha
-        qhv = hv_head / self.circuit.hvalve()
+        qhv = hv_head / self.circuit.hvalve.resistance(self.modes['hvalve'])
         qc1 = pump_capacity - qhv
         dh1 = qc1 / self.circuit.C1
 
         hv = self.tah.pressure(ha, vv)
 
         # qav
-        qav = (hb - hv) / self.hemo.valve_in()
+        qav = (hb - hv) / self.hemo.valve_in.resistance(self.modes['valve_in'])
 
         # qart
-        qart = (hv - hart) / self.hemo.valve_out()
+        qart = (hv - hart) / self.hemo.valve_out.resistance(self.modes['valve_out'])
 
         # dvv
         dvv = qav - qart
@@ -187,7 +169,7 @@ oscillator = Valve(Ropen=1, Rclosed=1000, dhopen=4, dhclose=1)
 circuit = Circuit(oscillator, C1=1.0, C2=0.01, R=10, L=0.01)
 tah = LinearMembrane(E=1, Vv0=-1)
 heart_valve = Valve(Ropen=1, Rclosed=1e4, dhopen=0.0, dhclose=0.0)
-hemo = TCM(heart_valve, deepcopy(heart_valve), C1=0.1, C2=0.5, R=5)
+hemo = TCM(heart_valve, heart_valve, C1=0.1, C2=0.5, R=5)
 system = System(motor=motor, pump=pump, circuit=circuit, tah=tah, hemo=hemo)
 
 events = [system.event_valve_opening, system.event_valve_closing,
@@ -197,65 +179,29 @@ events = [system.event_valve_opening, system.event_valve_closing,
 # current, speed, pump_capacity, circuit_head, ha, ven_volume, hart, hb
 initial_state = (0.0, 1e-6, 1e-6, 0.0, 0.0, tah.Vv0, 0.0, 0.0, 0.0, 0.0, 0.0, 0.0) # note preloaded system
 
-t_start = 0.0
-t_end = 60
-
-t_full = []
-y_full = []
-hvalve_state = []
-valve_in_state = []
-valve_out_state = []
-derivatives = []
-
-event_times = []
-
-while t_start < t_end:
-    sol = solve_ivp(system.solve, [t_start, t_end], initial_state, events=events, rtol=1e-9, atol=1e-9)
-    t_full.append(sol.t)
-    y_full.append(sol.y)
-    derivatives.append(system.solve(sol.t, sol.y))
-    hvalve_state.append(system.circuit.hvalve.state * np.ones_like(sol.t))
-    valve_in_state.append(system.hemo.valve_in.state * np.ones_like(sol.t))
-    valve_out_state.append(system.hemo.valve_out.state * np.ones_like(sol.t))
-
-    if any([i.size > 0 for i in sol.t_events]):
-
-        event = next(i for i, j in enumerate(sol.t_events) if len(j))
-        if event == 0:
-            system.circuit.hvalve.open()
-        elif event == 1:
-            system.circuit.hvalve.close()
-        elif event == 2:
-            system.hemo.valve_in.open()
-        elif event == 3:
-            system.hemo.valve_in.close()
-        elif event == 4:
-            system.hemo.valve_out.open()
-        elif event == 5:
-            system.hemo.valve_out.close()
-        else:
-            print("no valid event")
-
-        event_time = sol.t_events[event][0]
-        event_times.append(event_time)
-        print(event_time)
-        print(event)
-        t_start = event_time
-        initial_state = sol.y_events[event][0]
-    else:
-        t_start = t_end
-
-# length = 8
-# offset = 5
-# m = np.s_[-8-offset:-offset-1]
-# m= np.s_[0:-1]
-t_full = np.concatenate(t_full)
-y_full = np.concatenate(y_full, axis=1)
-hvalve_state = np.concatenate(hvalve_state)
-valve_in_state = np.concatenate(valve_in_state)
-valve_out_state = np.concatenate(valve_out_state)
-# event_times = event_times[m]
-derivatives = np.concatenate(derivatives, axis=1)
+transitions = [*system.modes.transitions('hvalve'),
+               *system.modes.transitions('valve_in'),
+               *system.modes.transitions('valve_out')]
+
+frozen = freeze(system, 'solve', *(event.__name__ for event in events))
+frozen_events = [getattr(frozen, event.__name__) for event in events]
+
+# heart valves with equal thresholds may chatter at closure, they then slide until the head difference leaves the band
+trajectory = simulate(frozen.solve, [0.0, 60], initial_state, frozen_events, transitions, rtol=1e-9, atol=1e-9,
+                      chattering=Chattering(), modes=system.modes,
+                      signals={'derivatives': system.solve,
+                               'hvalve_state': lambda t, y: system.modes['hvalve'] * np.ones_like(t),
+                               'valve_in_state': lambda t, y: system.modes['valve_in'] * np.ones_like(t),
+                               'valve_out_state': lambda t, y: system.modes['valve_out'] * np.ones_like(t)})
+
+t_full = trajectory.t
+y_full = trajectory.y
+hvalve_state = trajectory['hvalve_state']
+valve_in_state = trajectory['valve_in_state']
+valve_out_state = trajectory['valve_out_state']
+event_times = trajectory.log['t']
+print('slides per valve:', {name: len(trajectory.occurrences(name, 'slide')) for name in system.modes.index})
+derivatives = trajectory['derivatives']
 
 i, w, qp, h1, ha, vv, hart, hb, int_error, mavg, mavg2, z = y_full
 di, dw, dqp, dh1, dha, dvv, dhart, dhb, error, dmavg_dt, dmavg2_dt, dz = derivatives
@@ -315,8 +261,8 @@ plt.plot(t_full, impedance_head, 'yo-', label="pump impedance head")
 plt.plot(t_full, hr, 'co-', label="resistance pressure loss")
 plt.plot(t_full, h1-ha, 'bo-', label='pressure drop hysteretic valve')
 plt.plot(t_full, hvalve_state, 'm-', label="hysteretic valve state")
-plt.axhline(oscillator.dhopenref, linestyle='--', color='black')
-plt.axhline(oscillator.dhcloseref, linestyle='--', color='black')
+plt.axhline(oscillator.dhopen, linestyle='--', color='black')
+plt.axhline(oscillator.dhclose, linestyle='--', color='black')
 plt.legend()
 
 plt.figure()
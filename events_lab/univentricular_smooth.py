@@ -0,0 +1,143 @@
+from math import pi
+import numpy as np
+from scipy.integrate import solve_ivp
+from tahs import LinearMembrane
+from utils import Sigmoid
+from trajectory import Trajectory
+from matplotlib import pyplot as plt
+import matplotlib.pylab as pylab
+from motors import DCM
+from pumps import CP
+from circuits import Valve, SmoothValve
+from parameters import Parameters
+
+params = {'legend.fontsize': 'xx-large',
+         'axes.labelsize': 'xx-large'}
+pylab.rcParams.update(params)
+
+"""
+Setup of univentricular.py with smooth valves, of which the openings are states, integrated in a single solve_ivp call
+without events
+"""
+
+class Circuit(Parameters):
+    __slots__ = ('hvalve', 'C1', 'C2', 'R', 'L')
+
+    def __init__(self, hvalve: SmoothValve = SmoothValve(), C1: float = 1.0, C2: float = 0.01,
+                 R: float = 100, L: float = 0.01):
+        self.L = L
+        self.C1 = C1
+        self.C2 = C2
+        self.R = R
+        self.hvalve = hvalve
+
+class TCM(Parameters):
+    __slots__ = ('valve_in', 'valve_out', 'C1', 'C2', 'R')
+
+    def __init__(self, valve_in: SmoothValve = SmoothValve(),
+                 valve_out: SmoothValve = SmoothValve(),
+                 C1: float = 0.1,
+                 C2: float = 0.1,
+                 R: float = 10):
+        self.C1 = C1 # L / m
+        self.C2 = C2
+        self.R = R # m / L/min
+        self.valve_in = valve_in
+        self.valve_out = valve_out
+
+class System:
+    states = ('current', 'speed', 'pump_capacity', 'h1', 'ha', 'vv', 'hart', 'hb', 'hvalve', 'valve_in', 'valve_out')
+
+    def __init__(self, motor: DCM | None = None,
+                 pump: CP | None = None,
+                 circuit: Circuit = Circuit(),
+                 tah: LinearMembrane | None = None,
+                 hemo: TCM = TCM()):
+        self.motor = DCM() if motor is None else motor
+        self.pump = CP() if pump is None else pump
+        self.circuit = circuit
+        self.tah = LinearMembrane() if tah is None else tah
+        self.hemo = hemo
+
+    def solve(self, t, y):
+        current, speed, pump_capacity, h1, ha, vv, hart, hb, s_hvalve, s_in, s_out = y
+
+        di = (self.motor.voltage(t) - self.motor.R * current - self.motor.kt * speed) / self.motor.L
+        torque = self.pump.torque(speed, pump_capacity)
+        dw = (self.motor.kt * current - self.motor.mu * speed - torque) / self.motor.M
+        pump_head = self.pump.hq(speed, pump_capacity)
+
+        impedance_head = pump_head - h1 + ha - self.circuit.R * pump_capacity
+        dq_pump = impedance_head / self.circuit.L
+
+        hv_head = h1 - ha
+        qhv = hv_head / self.circuit.hvalve.resistance(s_hvalve)
+        dh1 = (pump_capacity - qhv) / self.circuit.C1
+
+        hv = self.tah.pressure(ha, vv)
+        dh_in = hb - hv
+        dh_out = hv - hart
+        qav = dh_in / self.hemo.valve_in.resistance(s_in)
+        qart = dh_out / self.hemo.valve_out.resistance(s_out)
+
+        dvv = qav - qart
+        qa = -1.0 * dvv # qa = dva/dt = -dvv/dt
+        dha = (qhv - pump_capacity - qa) / self.circuit.C2
+
+        qp = (hart - hb) / self.hemo.R
+        dhart = (qart - qp) / self.hemo.C1
+        dhb = (qp - qav) / self.hemo.C2
+
+        return [di, dw, dq_pump, dh1, dha, dvv, dhart, dhb,
+                self.circuit.hvalve.diff(hv_head, s_hvalve),
+                self.hemo.valve_in.diff(dh_in, s_in),
+                self.hemo.valve_out.diff(dh_out, s_out)]
+
+voltage = lambda t: Sigmoid(2, 0.1)(t)
+motor = DCM(voltage, R=0.2, L=0.01, M=3.88/1e7, kt=5.9/1000, mu=12/1e7)
+pump = CP(hm0=2.4, qn0=1.6, hn0=1.8, w0=1770 * (2* pi / 60), effn=0.35)
+oscillator = SmoothValve.regularize(Valve(Ropen=1, Rclosed=1000, dhopen=4, dhclose=1), width=1e-4, tau=1e-4)
+circuit = Circuit(oscillator, C1=1.0, C2=0.01, R=10, L=0.01)
+tah = LinearMembrane(E=1, Vv0=-1)
+heart_valve = SmoothValve.regularize(Valve(Ropen=1, Rclosed=1e4, dhopen=0.1, dhclose=0.0), width=1e-4, tau=1e-4)
+hemo = TCM(heart_valve, heart_valve, C1=0.1, C2=0.5, R=5)
+system = System(motor=motor, pump=pump, circuit=circuit, tah=tah, hemo=hemo)
+
+# current, speed, pump_capacity, circuit_head, ha, ven_volume, hart, hb, openings of the valves (closed)
+initial_state = (0.0, 1e-6, 1e-6, 0.0, 0.0, tah.Vv0, 0.0, 0.0, 0.0, 0.0, 0.0) # note preloaded system
+
+sol = solve_ivp(system.solve, [0.0, 10], initial_state, method='LSODA', rtol=1e-9, atol=1e-9, dense_output=True)
+trajectory = Trajectory([sol], System.states)
+
+t_full = trajectory.t
+i, w, qp, h1, ha, vv, hart, hb, s_hvalve, s_in, s_out = trajectory.y
+hv = tah.pressure(ha, vv)
+
+plt.figure()
+plt.plot(t_full, h1 - ha, 'bo-', label='pressure drop hysteretic valve')
+plt.plot(t_full, s_hvalve, 'm-', label="hysteretic valve opening")
+plt.axhline(oscillator.dhopen, linestyle='--', color='black')
+plt.axhline(oscillator.dhclose, linestyle='--', color='black')
+plt.legend()
+
+plt.figure()
+plt.plot(t_full, h1, 'ko-', label="capacitance pressure")
+plt.plot(t_full, ha, 'bo-', label="pouch pressure")
+plt.plot(t_full, hv, 'mo-', label="ventricular pressure")
+plt.legend()
+
+plt.figure()
+plt.plot(t_full, hart, 'ro-', label="pressure afterload")
+plt.plot(t_full, hb, 'go-', label="pressure preload")
+plt.plot(t_full, hv, 'bo-', label="ventricular pressure")
+plt.legend()
+
+plt.figure()
+plt.plot(t_full, s_in, 'b-', label="input valve opening")
+plt.plot(t_full, s_out, 'k-', label="output valve opening")
+plt.legend()
+
+plt.figure()
+plt.plot(vv, hv, label="ventricle PV")
+
+plt.show()
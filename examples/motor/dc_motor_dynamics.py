@@ -1,10 +1,15 @@
 import numpy as np
 from matplotlib import pyplot as plt
+import matplotlib.pylab as pylab
 from math import pi
 from utils import Sigmoid, colored_line
 
 from motors import DCMotor
 
+params = {'legend.fontsize': 'xx-large',
+         'axes.labelsize': 'xx-large'}
+pylab.rcParams.update(params)
+
 # voltage: step of 6V at t=0.3 and step of sine at t=1
 voltage = lambda t: Sigmoid(6.0, 0.5, 20)(t) + Sigmoid(1.0, 1.5, 20)(t) * np.sin(2 * (2 * pi) * t) - Sigmoid(1.0, 2.5, 20)(t) * np.sin(2 * (2 * pi) * t)
 
@@ -1,9 +1,14 @@
 import numpy as np
 from matplotlib import pyplot as plt
+import matplotlib.pylab as pylab
 from utils import colored_line
 
 from pumps import CentrifugalPump
 
+params = {'legend.fontsize': 'xx-large',
+         'axes.labelsize': 'xx-large'}
+pylab.rcParams.update(params)
+
 pump = CentrifugalPump()
 
 tol=1e-3
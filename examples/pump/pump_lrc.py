@@ -2,6 +2,7 @@ import numpy as np
 from math import pi
 
 from matplotlib import pyplot as plt
+import matplotlib.pylab as pylab
 
 from utils import colored_line, Sigmoid
 
@@ -11,6 +12,10 @@ from circuits import RLCCircuit
 
 from examples.helper_functions.plot_pump_props import plot_pump_props
 
+params = {'legend.fontsize': 'xx-large',
+         'axes.labelsize': 'xx-large'}
+pylab.rcParams.update(params)
+
 pump = CentrifugalPump()
 motor = DCMotor(R=0.2, L=0.11/10)
 
@@ -1,4 +1,5 @@
 from matplotlib import pyplot as plt
+import matplotlib.pylab as pylab
 import numpy as np
 from utils import colored_line, Sigmoid
 
@@ -8,6 +9,10 @@ from circuits import RLCCircuit, Oscillator
 
 from examples.helper_functions.plot_pump_props import plot_pump_props
 
+params = {'legend.fontsize': 'xx-large',
+         'axes.labelsize': 'xx-large'}
+pylab.rcParams.update(params)
+
 pump = CentrifugalPump()
 motor = DCMotor(R=0.2, L=0.11/10)
 
@@ -25,13 +30,11 @@ system = MotorPumpLoadAssembly(motor, pump, circuit)
 
 # solve system
 y0 = (0.0, 1.0, 1e-6, 0.0) # current, speed, flow, circuit head
-time, sol = system(y0, 3)
-resistance.dhopen -= 0.01
-resistance.dhclose += 0.01
-
-derivatives = np.zeros((4, len(time)))
-for i in range(0, len(time)):
-    derivatives[:, i] = system.solve(time[i], sol[:, i])
+trajectory = system.trajectory(y0, 3) # the oscillator is switched at events
+time = trajectory.t
+sol = np.vstack((trajectory.y, pump.solve(time, trajectory.y[1:3])))
+diagnostics = system.diagnostics(time, sol, {'resistance': trajectory['resistance_closed'] == 1})
+derivatives = np.array([diagnostics.dcurrent, diagnostics.dspeed, diagnostics.dflow, diagnostics.dhead])
 
 VA = voltage(time)
 
@@ -43,7 +46,7 @@ TL = sol[4]
 HP = sol[5]
 
 
-QR = np.asarray([hr/resistance(0, hr) for hr in HR])
+QR = diagnostics.flow_resistance
 QC = QP - QR
 #
 dcurrent = derivatives[0]
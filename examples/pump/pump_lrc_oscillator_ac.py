@@ -1,4 +1,5 @@
 from matplotlib import pyplot as plt
+import matplotlib.pylab as pylab
 import numpy as np
 from utils import colored_line, Sigmoid
 
@@ -8,6 +9,10 @@ from circuits import RLCRCCircuit, Oscillator
 
 from examples.helper_functions.plot_pump_props import plot_pump_props
 
+params = {'legend.fontsize': 'xx-large',
+         'axes.labelsize': 'xx-large'}
+pylab.rcParams.update(params)
+
 pump = CentrifugalPump()
 motor = DCMotor(R=0.2, L=0.11/10)
 
@@ -26,14 +31,12 @@ system = MotorPumpLoadAssembly(motor, pump, circuit)
 
 # solve system
 y0 = (0.0, 1.0, 1e-6, 0.0, 0.0) # current, speed, flow, circuit head
-time, sol = system(y0, 5)
-resistance.dhopen -= 0.01
-resistance.dhclose += 0.01
-
-
-derivatives = np.zeros((5, len(time)))
-for i in range(0, len(time)):
-    derivatives[:, i] = system.solve(time[i], sol[:, i])
+trajectory = system.trajectory(y0, 5) # the oscillator is switched at events
+time = trajectory.t
+sol = np.vstack((trajectory.y, pump.solve(time, trajectory.y[1:3])))
+diagnostics = system.diagnostics(time, sol, {'resistance': trajectory['resistance_closed'] == 1})
+derivatives = np.array([diagnostics.dcurrent, diagnostics.dspeed, diagnostics.dflow, diagnostics.dhead,
+                        diagnostics.dhead_ac])
 
 VA = voltage(time)
 
@@ -45,12 +48,11 @@ HR = sol[4]
 TL = sol[5]
 HP = sol[6]
 
-circuit.resistance.closed = True
-QHV = np.asarray([(HC[i] - HR[i])/circuit.resistance(time[i], HC[i] - HR[i]) for i, hr in enumerate(HR)])
-QC = QP - QHV
+QHV = diagnostics.flow_valve
+QC = diagnostics.flow_capacitance
 
-QR = HR / circuit.Rout(time)
-QAC = QHV - QR
+QR = diagnostics.flow_resistance_out
+QAC = diagnostics.flow_ac
 
 dcurrent = derivatives[0]
 dspeed = derivatives[1]
@@ -1,4 +1,5 @@
 from matplotlib import pyplot as plt
+import matplotlib.pylab as pylab
 import numpy as np
 from utils import colored_line, Sigmoid
 
@@ -8,6 +9,10 @@ from circuits import RLCRCCircuitCL, Oscillator
 
 from examples.helper_functions.plot_pump_props import plot_pump_props
 
+params = {'legend.fontsize': 'xx-large',
+         'axes.labelsize': 'xx-large'}
+pylab.rcParams.update(params)
+
 pump = CentrifugalPump()
 motor = DCMotor(R=0.2, L=0.11/10)
 
@@ -26,14 +31,12 @@ system = MotorPumpLoadAssembly(motor, pump, circuit)
 
 # solve system
 y0 = (0.0, 1.0, 1e-6, 2, 2) # current, speed, pump flow, circuit head, circuit head 2
-time, sol = system(y0, 3)
-resistance.dhopen -= 0.01
-resistance.dhclose += 0.01
-
-
-derivatives = np.zeros((5, len(time)))
-for i in range(0, len(time)):
-    derivatives[:, i] = system.solve(time[i], sol[:, i])
+trajectory = system.trajectory(y0, 3) # the oscillator is switched at events
+time = trajectory.t
+sol = np.vstack((trajectory.y, pump.solve(time, trajectory.y[1:3])))
+diagnostics = system.diagnostics(time, sol, {'resistance': trajectory['resistance_closed'] == 1})
+derivatives = np.array([diagnostics.dcurrent, diagnostics.dspeed, diagnostics.dflow, diagnostics.dhead,
+                        diagnostics.dhead_ac])
 
 VA = voltage(time)
 
@@ -46,12 +49,11 @@ TL = sol[5]
 DHP = sol[6]
 
 
-circuit.resistance.closed = True
-QHV = np.asarray([(HC1[i] - HC2[i])/circuit.resistance(time[i], HC1[i] - HC2[i]) for i, hr in enumerate(HC2)])
-QC1 = QP - QHV
+QHV = diagnostics.flow_valve
+QC1 = diagnostics.flow_capacitance
 
 # QR = HR / circuit.Rout(time)
-QC2 = QHV - QP
+QC2 = diagnostics.flow_ac
 
 dcurrent = derivatives[0]
 dspeed = derivatives[1]
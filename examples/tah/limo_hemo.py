@@ -23,10 +23,12 @@ heart = LIMO(Pact)
 system = VAV(heart, Pv=5)
 
 y0 = [80,60,60] # [Vv, P1, Part]
-t, [Vventricular, Parterial, Paortic, Pventricular, Inflow, Outflow, Inflowresistance, Outflowresistance] = system \
-(y0, 0, 6)
+trajectory = system.trajectory(y0, 0, 6, period=Pact.activation_function.period)
+beat = trajectory.last(1)
+t, (Vventricular, Parterial, Paortic) = beat.t, beat.y
+Pventricular, Inflow, Outflow = beat['Pv'], beat['Qvv'], beat['Qart']
+Inflowresistance, Outflowresistance = beat['Rvv'], beat['Rva']
 
-tb = 500
 # PLOTTING
 
 fig = plt.figure(constrained_layout=True)
@@ -43,24 +45,24 @@ axact.set_ylabel(r'$V~[mL]$')
 
 # axact.plot(t, system.E(t), label="Elastance")
 # axv = axact.twinx()
-axact.plot(t[-tb:], Vventricular[-tb:], 'r-', label="Ventricular volume")
-axp.plot(t[-tb:], Parterial[-tb:], label="Arterial pressure")
-axp.plot(t[-tb:], Paortic[-tb:], label="Aortic pressure")
-axp.plot(t[-tb:], Pventricular[-tb:], label="Ventricular pressure")
-axp.plot(t[-tb:], Pact(t)[-tb:], label="Pact")
+axact.plot(t, Vventricular, 'r-', label="Ventricular volume")
+axp.plot(t, Parterial, label="Arterial pressure")
+axp.plot(t, Paortic, label="Aortic pressure")
+axp.plot(t, Pventricular, label="Ventricular pressure")
+axp.plot(t, Pact(t), label="Pact")
 
 volume = np.linspace(10, 100, 100)
 
 
-for time in np.linspace(t[-tb], t[-1], 100):
+for time in np.linspace(t[0], t[-1], 100):
     im3 = colored_line(volume, heart.pressure(volume, time), Pact(time)*np.ones_like(volume), axpv, cmap='jet')
     im3.set_clim(0, 70)
 fig.colorbar(im3)
 
-axpv.plot(Vventricular[-tb:], Pventricular[-tb:], 'k', linewidth=4)
-im = colored_line(Vventricular[-tb:], Pventricular[-tb:], t[-tb:], axpv, cmap='jet')
-# axpv.plot(Va[-tb:], Pact(t)[-tb:], 'k', linewidth=4)
-# im2 = colored_line(Va[-tb:], Pact(t)[-tb:], t[-tb:], axpv, cmap='jet')
+axpv.plot(Vventricular, Pventricular, 'k', linewidth=4)
+im = colored_line(Vventricular, Pventricular, t, axpv, cmap='jet')
+# axpv.plot(Va, Pact(t), 'k', linewidth=4)
+# im2 = colored_line(Va, Pact(t), t, axpv, cmap='jet')
 # fig.colorbar(im2)
 
 axpv.set_xlim([0, 120])
@@ -76,20 +78,20 @@ plt.axhline(system.Pv, color='k', linestyle='--')
 plt.axhline(np.max(Pact(np.linspace(0,1,100))), color='k', linestyle='--')
 
 
-axq.plot(t[-tb:], Inflow[-tb:], label="Ventricular inflow")
-axq.plot(t[-tb:], Outflow[-tb:], label="Ventricular outflow")
+axq.plot(t, Inflow, label="Ventricular inflow")
+axq.plot(t, Outflow, label="Ventricular outflow")
 
 axr = axp.twinx()
-axr.plot(t[-tb:], Inflowresistance[-tb:], alpha=0.2)
-axr.plot(t[-tb:], Outflowresistance[-tb:], alpha=0.2)
+axr.plot(t, Inflowresistance, alpha=0.2)
+axr.plot(t, Outflowresistance, alpha=0.2)
 
 axr2 = axact.twinx()
-axr2.plot(t[-tb:], Inflowresistance[-tb:], alpha=0.2)
-axr2.plot(t[-tb:], Outflowresistance[-tb:], alpha=0.2)
+axr2.plot(t, Inflowresistance, alpha=0.2)
+axr2.plot(t, Outflowresistance, alpha=0.2)
 
 axr3 = axq.twinx()
-axr3.plot(t[-tb:], Inflowresistance[-tb:], alpha=0.2)
-axr3.plot(t[-tb:], Outflowresistance[-tb:], alpha=0.2)
+axr3.plot(t, Inflowresistance, alpha=0.2)
+axr3.plot(t, Outflowresistance, alpha=0.2)
 
 axact.legend()
 axp.legend()
@@ -0,0 +1,29 @@
+from hemodynamics import VAV
+from tahs import LIMO, PouchArrayTAH
+from matplotlib import pyplot as plt
+import numpy as np
+
+from utils import TDP
+
+Pact = TDP(min=0, max=70)
+
+y0 = [80, 60, 60] # [Vv, P1, Part]
+
+fig, ax = plt.subplots(1, 2)
+
+for heart, label in ((LIMO(Pact), 'LIMO (cubic fit)'), (PouchArrayTAH(Pact), 'Pouch array (equilibrium)')):
+    system = VAV(heart, Pv=5)
+    t, [Vventricular, Parterial, Paortic, Pventricular, Inflow, Outflow, Inflowresistance, Outflowresistance] = system \
+    (y0, 0, 3)
+
+    tb = t > 2
+    ax[0].plot(t[tb], Pventricular[tb], label=label)
+    ax[1].plot(Vventricular[tb], Pventricular[tb], label=label)
+
+ax[0].set_xlabel(r'$t~[s]$')
+ax[0].set_ylabel(r'$P~[mmHg]$')
+ax[1].set_xlabel(r'$V~[mL]$')
+ax[1].set_ylabel(r'$P~[mmHg]$')
+ax[1].legend()
+
+plt.show()
@@ -23,8 +23,10 @@ TVE = TimeVaryingElastance(E, V0)
 system = VAV(TVE)
 
 y0 = [60, 60, 60] # [Vv, P1, Part]
-t, [Vventricular, Parterial, Paortic, Pventricular, Inflow, Outflow, Inflowresistance, Outflowresistance] = system \
-    (y0, 0, 6)
+trajectory = system.trajectory(y0, 0, 6)
+t, Vventricular, Parterial, Paortic = trajectory.t, *trajectory.y
+Pventricular, Inflow, Outflow = trajectory['Pv'], trajectory['Qvv'], trajectory['Qart']
+Inflowresistance, Outflowresistance = trajectory['Rvv'], trajectory['Rva']
 
 # PLOTTING
 
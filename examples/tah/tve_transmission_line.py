@@ -0,0 +1,44 @@
+from hemodynamics import TransmissionLine
+from tahs import TimeVaryingElastance
+from matplotlib import pyplot as plt
+import numpy as np
+
+from utils import TDP
+
+"""
+Time-varying elastance ejecting into an arterial line of N segments; the pressure wave travels along the line and
+reflects at the peripheral resistance. The Radau solver is given the sparse tridiagonal Jacobian of the line.
+"""
+
+E = TDP(min=0.06, max=1)
+V0 = 20
+
+TVE = TimeVaryingElastance(E, V0)
+
+N = 50
+system = TransmissionLine(TVE, N=N)
+
+y0 = np.full(2 * N + 2, 60.0) # [Vv, P0, Q1, P1, ..., QN, PN]
+y0[2::2] = 0.0
+trajectory = system.trajectory(y0, 0, 6)
+t = trajectory.t
+Vventricular, Proot, P = trajectory.y[0], trajectory.y[1], trajectory.y[3::2]
+
+fig, (axp, axq) = plt.subplots(2, 1, sharex=True, constrained_layout=True)
+
+axp.plot(t, trajectory['Pv'], 'k', label="Ventricular pressure")
+axp.plot(t, Proot, label="Aortic root pressure")
+for k in (N // 2, N - 1):
+    axp.plot(t, P[k], label=f"Pressure at segment {k + 1}")
+
+axq.plot(t, trajectory['Qart'], label="Ventricular outflow")
+axq.plot(t, trajectory['Qp'], label="Peripheral outflow")
+
+axp.legend()
+axq.legend()
+
+plt.figure()
+plt.plot(Vventricular, trajectory['Pv'], 'r-', label="ventricle PV")
+plt.legend()
+
+plt.show()
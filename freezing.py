@@ -0,0 +1,494 @@
+"""
+Freezing of composed models into flat, specialized functions.
+
+freeze reads the source of methods of a model, e.g. the right-hand side and the event functions of a system, and
+generates specialized functions from it, which are compiled once and reused:
+
+- attribute chains, e.g. self.hemo.sc.C1, are snapshot into constants of the generated function
+- methods of components, e.g. LinearMembrane.pressure or CP.torque, are inlined if their body consists of assignments
+  followed by a return statement
+- polynomials (np.poly1d), e.g. CP.hq0, are expanded into the operations of np.polyval with constant coefficients
+- calls of frozen records (Parameters) with constant arguments, e.g. Valve.resistance, and arithmetic on constants are
+  evaluated once
+- modes, e.g. self.modes['valve_in'], are constants of a variant of the function, which is generated on the first call
+  in a combination of the modes it reads
+
+The generated functions perform the same floating-point operations on the same values as the model, so their results
+are identical:
+
+    frozen = freeze(system, 'solve', 'event_valve_opening')
+    frozen.solve(t, y)
+    print(frozen.source('solve'))
+
+Parameters are snapshot when freezing, such that the model has to be frozen again after changing them, whereas changes
+of the modes are followed. The functions also take a copy of the modes of the model as keyword modes, in which they are
+evaluated instead, without changing the model, e.g. in both modes of a sliding component in hybrid.simulate:
+
+    frozen.solve(t, y, modes=modes)
+
+Inlined methods are assumed to be free of side effects: their statements are evaluated before the statement that calls
+them.
+"""
+
+import ast
+import builtins
+import copy
+import inspect
+import numbers
+import operator
+import textwrap
+import types
+
+import numpy as np
+
+from instrumentation import model
+from parameters import Parameters, Modes
+
+OPERATORS = {ast.Add: operator.add, ast.Sub: operator.sub, ast.Mult: operator.mul, ast.Div: operator.truediv,
+             ast.FloorDiv: operator.floordiv, ast.Mod: operator.mod, ast.Pow: operator.pow,
+             ast.USub: operator.neg, ast.UAdd: operator.pos, ast.Not: operator.not_}
+
+# statements whose expressions are evaluated once and unconditionally, before which inlined statements can be placed
+SIMPLE = (ast.Assign, ast.AugAssign, ast.AnnAssign, ast.Return, ast.Expr)
+
+MAX_DEPTH = 8 # of methods inlined into inlined methods
+
+def numeric(value) -> bool:
+    return isinstance(value, (numbers.Number, np.number, np.bool_))
+
+def definition(function) -> ast.FunctionDef:
+    """
+    :return: syntax tree of the definition of function, without decorators and docstring
+    """
+    node = ast.parse(textwrap.dedent(inspect.getsource(function))).body[0]
+    node.decorator_list = []
+    if (node.body and isinstance(node.body[0], ast.Expr) and isinstance(node.body[0].value, ast.Constant)
+            and isinstance(node.body[0].value.value, str)):
+        node.body = node.body[1:]
+    return node
+
+def inlinable(method) -> ast.FunctionDef | None:
+    """
+    :return: definition of a bound method of a component with positional parameters and a body of assignments to names
+        followed by a return statement, without nested scopes, None if the method cannot be inlined
+    """
+    if not isinstance(method, types.MethodType) or not model(method.__self__):
+        return None
+    try:
+        node = definition(method.__func__)
+    except (OSError, TypeError, SyntaxError, IndexError):
+        return None
+    if not isinstance(node, ast.FunctionDef):
+        return None
+    arguments = node.args
+    if arguments.vararg or arguments.kwarg or arguments.kwonlyargs or arguments.posonlyargs or not arguments.args:
+        return None
+    if not node.body or not isinstance(node.body[-1], ast.Return) or node.body[-1].value is None:
+        return None
+    if any(isinstance(n, (ast.Lambda, ast.comprehension, ast.NamedExpr, ast.Global, ast.Nonlocal))
+           for n in ast.walk(node)):
+        return None
+    for statement in node.body[:-1]:
+        if not isinstance(statement, ast.Assign) or len(statement.targets) != 1:
+            return None
+        target = statement.targets[0]
+        names = target.elts if isinstance(target, ast.Tuple) else [target]
+        if not all(isinstance(name, ast.Name) for name in names):
+            return None
+    return node
+
+class Bindings:
+    """
+    Names of the generated code: bound values, constants, local variables of inlined methods, and the statements of
+    inlined methods to place before the current statement.
+    """
+    def __init__(self, reserved, modes: Modes | None = None):
+        self.given = modes
+        self.values = {}
+        self.constants = set()
+        self.modes = []
+        self.prelude = []
+        self.reserved = set(reserved)
+
+    def name(self, label: str, value=None) -> str:
+        """
+        :return: unused identifier derived from label, or the identifier of value if it is bound to it already
+        """
+        label = ''.join(c if c.isalnum() or c == '_' else '_' for c in label).strip('_') or 'c'
+        name, i = label, 1
+        while name in self.reserved or name in self.values and (value is None or self.values[name] is not value):
+            name, i = f'{label}_{i}', i + 1
+        return name
+
+    def bind(self, value, label: str, constant: bool = False) -> ast.Name:
+        name = self.name(label, value)
+        self.values[name] = value
+        if constant:
+            self.constants.add(name)
+        return ast.Name(name, ast.Load())
+
+    def local(self, label: str) -> str:
+        name = self.name(label)
+        self.reserved.add(name)
+        return name
+
+    def constant(self, node) -> bool:
+        return isinstance(node, ast.Constant) or isinstance(node, ast.Name) and node.id in self.constants
+
+    def value(self, node):
+        return node.value if isinstance(node, ast.Constant) else self.values[node.id]
+
+class Specializer(ast.NodeTransformer):
+    """
+    Rewrites the syntax tree of a method of a model into flat code with bound constants.
+    """
+    def __init__(self, bindings: Bindings, env: dict, namespace: dict | None = None, arguments: dict | None = None,
+                 depth: int = 0, hoist: bool = False):
+        """
+        :param bindings: names of the generated code, shared by the inlined methods
+        :param env: names resolved to objects, e.g. self
+        :param namespace: globals of an inlined method, None to keep the free names of the frozen method itself
+        :param arguments: parameters and local variables of an inlined method and the expressions replacing them
+        :param depth: level of inlining
+        :param hoist: True if statements can be placed before the current expression, i.e. it is evaluated once and
+            unconditionally by a simple statement
+        """
+        self.bindings = bindings
+        self.env = env
+        self.namespace = namespace
+        self.arguments = arguments or {}
+        self.depth = depth
+        self.hoist = hoist
+
+    def block(self, statements: list) -> list:
+        """
+        :return: rewritten statements, with the statements of inlined methods before the statements calling them
+        """
+        result = []
+        for statement in statements:
+            if isinstance(statement, SIMPLE):
+                self.hoist = True
+                statement = self.visit(statement)
+                self.hoist = False
+                result += self.bindings.prelude
+                self.bindings.prelude = []
+            else:
+                for field, value in ast.iter_fields(statement):
+                    if isinstance(value, list) and value and isinstance(value[0], ast.stmt):
+                        setattr(statement, field, self.block(value))
+                    elif isinstance(value, list):
+                        setattr(statement, field, [self.visit(v) if isinstance(v, ast.AST) else v for v in value])
+                    elif isinstance(value, ast.AST):
+                        setattr(statement, field, self.visit(value))
+            result.append(statement)
+        return result
+
+    def conditional(self, node):
+        """
+        Visit an expression that is evaluated conditionally or repeatedly, into which statements cannot be hoisted.
+        """
+        hoist, self.hoist = self.hoist, False
+        node = self.visit(node)
+        self.hoist = hoist
+        return node
+
+    def resolve(self, node):
+        """
+        :return: (True, value) if the expression refers to a known object, else (False, None)
+        """
+        if isinstance(node, ast.Name):
+            if node.id in self.arguments:
+                argument = self.arguments[node.id]
+                if isinstance(argument, ast.Name) and argument.id in self.bindings.values:
+                    return True, self.bindings.values[argument.id]
+                return False, None
+            if node.id in self.env:
+                return True, self.env[node.id]
+            if self.namespace is not None and node.id in self.namespace:
+                return True, self.namespace[node.id]
+            if self.namespace is not None and hasattr(builtins, node.id):
+                return True, getattr(builtins, node.id)
+            return False, None
+        if isinstance(node, ast.Attribute):
+            found, value = self.resolve(node.value)
+            if found and not isinstance(value, np.ndarray) and hasattr(value, node.attr):
+                return True, getattr(value, node.attr)
+        return False, None
+
+    def label(self, node) -> str:
+        return ast.unparse(node).removeprefix('self.')
+
+    def bind(self, node, value) -> ast.AST:
+        if type(value) in (int, float, bool):
+            return ast.Constant(value)
+        return self.bindings.bind(value, self.label(node), numeric(value) or isinstance(value, Parameters))
+
+    def visit_Name(self, node):
+        if node.id in self.arguments:
+            replacement = copy.deepcopy(self.arguments[node.id])
+            if isinstance(replacement, ast.Name):
+                replacement.ctx = node.ctx
+            return replacement
+        found, value = self.resolve(node)
+        if found and isinstance(value, types.ModuleType):
+            return self.bindings.bind(value, node.id) if self.namespace is not None else node
+        if found:
+            return self.bind(node, value)
+        return node
+
+    def visit_Attribute(self, node):
+        found, value = self.resolve(node)
+        if found and isinstance(node.ctx, ast.Load) and not isinstance(value, types.ModuleType):
+            return self.bind(node, value)
+        return self.generic_visit(node)
+
+    def visit_Subscript(self, node):
+        found, value = self.resolve(node.value)
+        if (found and isinstance(value, Modes) and isinstance(node.slice, ast.Constant)
+                and isinstance(node.ctx, ast.Load)):
+            if (value, node.slice.value) not in self.bindings.modes:
+                self.bindings.modes.append((value, node.slice.value))
+            given = self.bindings.given
+            mode = (given if given is not None and given.index is value.index else value)[node.slice.value]
+            return self.bindings.bind(mode, f'mode_{node.slice.value}', constant=True)
+        return self.generic_visit(node)
+
+    def fold(self, node, function, *operands):
+        if all(self.bindings.constant(operand) for operand in operands):
+            values = [self.bindings.value(operand) for operand in operands]
+            if all(numeric(value) for value in values):
+                try:
+                    value = function(*values)
+                except (ArithmeticError, ValueError):
+                    return node
+                return ast.Constant(value) if type(value) in (int, float, bool) else self.bindings.bind(value, 'c', True)
+        return node
+
+    def visit_BinOp(self, node):
+        node = self.generic_visit(node)
+        if type(node.op) in OPERATORS:
+            return self.fold(node, OPERATORS[type(node.op)], node.left, node.right)
+        return node
+
+    def visit_UnaryOp(self, node):
+        node = self.generic_visit(node)
+        if type(node.op) in OPERATORS:
+            return self.fold(node, OPERATORS[type(node.op)], node.operand)
+        return node
+
+    def visit_IfExp(self, node):
+        test = self.visit(node.test)
+        if self.bindings.constant(test):
+            return self.visit(node.body if self.bindings.value(test) else node.orelse)
+        node.test, node.body, node.orelse = test, self.conditional(node.body), self.conditional(node.orelse)
+        return node
+
+    def visit_BoolOp(self, node):
+        node.values = [self.visit(node.values[0])] + [self.conditional(value) for value in node.values[1:]]
+        return node
+
+    def visit_Compare(self, node):
+        node.left = self.visit(node.left)
+        node.comparators = [self.visit(node.comparators[0])] + [self.conditional(c) for c in node.comparators[1:]]
+        return node
+
+    def visit_Lambda(self, node):
+        hoist, self.hoist = self.hoist, False
+        node = self.generic_visit(node)
+        self.hoist = hoist
+        return node
+
+    visit_ListComp = visit_SetComp = visit_DictComp = visit_GeneratorExp = visit_Lambda
+
+    def visit_Call(self, node):
+        found, function = self.resolve(node.func)
+        args = [self.visit(argument) for argument in node.args]
+        keywords = [self.visit(keyword) for keyword in node.keywords]
+        if not found or any(isinstance(argument, ast.Starred) for argument in args):
+            node.func, node.args, node.keywords = self.visit(node.func), args, keywords
+            return node
+
+        # pure calls of frozen records with constant arguments
+        owner = getattr(function, '__self__', None)
+        if isinstance(node.func, ast.Attribute) and owner is None:
+            owner = self.resolve(node.func.value)[1]
+        if (isinstance(owner, Parameters) and not keywords
+                and all(self.bindings.constant(argument) for argument in args)):
+            value = function(*[self.bindings.value(argument) for argument in args])
+            return self.bind(node.func, value)
+
+        if isinstance(function, np.poly1d) and len(args) == 1 and not keywords:
+            polynomial = self.polynomial(node.func, function, args[0])
+            if polynomial is not None:
+                return polynomial
+
+        inlined = self.inline(node.func, function, args) if self.depth < MAX_DEPTH and not keywords else None
+        if inlined is not None:
+            return inlined
+
+        node.func, node.args, node.keywords = self.bind(node.func, function), args, keywords
+        return node
+
+    def polynomial(self, func, polynomial: np.poly1d, x):
+        """
+        :return: expression of the evaluation of the polynomial at x in the order of np.polyval, None if x is an
+            expression that cannot be assigned to a local variable first
+        """
+        if not isinstance(x, (ast.Name, ast.Constant)):
+            if not self.hoist:
+                return None
+            name = self.bindings.local(f'{self.label(func)}_x')
+            self.bindings.prelude.append(ast.Assign([ast.Name(name, ast.Store())], x))
+            x = ast.Name(name, ast.Load())
+        y = ast.Constant(0.0)
+        for coefficient in polynomial.coeffs:
+            y = ast.BinOp(ast.BinOp(y, ast.Mult(), copy.deepcopy(x)), ast.Add(), ast.Constant(coefficient.item()))
+        return y
+
+    def inline(self, func, method, args):
+        """
+        :return: expression of the inlined method, with its statements added to the prelude, None if the method cannot
+            be inlined
+        """
+        if model(method) and isinstance(getattr(method, '__call__', None), types.MethodType):
+            method = method.__call__
+        node = inlinable(method)
+        if node is None:
+            return None
+        parameters = [parameter.arg for parameter in node.args.args]
+        defaults = [None] * (len(parameters) - len(node.args.defaults)) + node.args.defaults
+        if len(args) > len(parameters) - 1 or any(d is None for d in defaults[1 + len(args):]):
+            return None
+        values = dict(zip(parameters[1:], args + defaults[1 + len(args):]))
+
+        assigned = {name.id for statement in node.body[:-1] for name in ast.walk(statement.targets[0])
+                    if isinstance(name, ast.Name)}
+        uses = [n.id for n in ast.walk(node) if isinstance(n, ast.Name) and isinstance(n.ctx, ast.Load)]
+        simple = lambda value: isinstance(value, (ast.Name, ast.Constant))
+        expression = len(node.body) == 1 and all(uses.count(p) <= 1 or simple(v) for p, v in values.items())
+        if not expression and not self.hoist:
+            return None
+
+        label = self.label(func)
+        arguments = {}
+        for parameter, value in values.items():
+            if simple(value) and parameter not in assigned or expression:
+                arguments[parameter] = value
+            else:
+                name = self.bindings.local(f'{label}_{parameter}')
+                self.bindings.prelude.append(ast.Assign([ast.Name(name, ast.Store())], value))
+                arguments[parameter] = ast.Name(name, ast.Load())
+        for name in sorted(assigned - set(values)):
+            arguments[name] = ast.Name(self.bindings.local(f'{label}_{name}'), ast.Load())
+
+        specializer = Specializer(self.bindings, {parameters[0]: method.__self__}, method.__func__.__globals__,
+                                  arguments, self.depth + 1, self.hoist)
+        for statement in copy.deepcopy(node.body[:-1]):
+            statement = specializer.visit(statement)
+            self.bindings.prelude.append(statement)
+        return specializer.visit(copy.deepcopy(node.body[-1].value))
+
+def specialize(obj, name: str, modes: Modes | None = None):
+    """
+    :param modes: copy of modes of the model to read instead of them, None for the current modes
+    :return: function generated from the method name of obj in the modes, its source, and the modes of the model it
+        reads as (Modes, name) pairs
+    """
+    method = getattr(obj, name)
+    node = definition(method.__func__)
+    parameters = node.args.args
+    node.args.args = parameters[1:]
+    # the modes are constants of the function, the keyword selects the variant, see Frozen
+    node.args.kwonlyargs.append(ast.arg('modes'))
+    node.args.kw_defaults.append(ast.Constant(None))
+    bindings = Bindings({n.id for n in ast.walk(node) if isinstance(n, ast.Name)}
+                        | {n.arg for n in ast.walk(node) if isinstance(n, ast.arg)}, modes)
+    node.body = Specializer(bindings, {parameters[0].arg: obj}).block(node.body)
+    node.name = name
+
+    names = list(bindings.values)
+    factory = ast.FunctionDef('_factory', ast.arguments([], [ast.arg(n) for n in names], None, [], [], None, []),
+                              [node, ast.Return(ast.Name(name, ast.Load()))], [], None, None)
+    module = ast.fix_missing_locations(ast.Module([factory], []))
+    namespace = {}
+    exec(compile(module, f'<frozen {type(obj).__name__}.{name}>', 'exec'), method.__func__.__globals__, namespace)
+    return namespace['_factory'](*[bindings.values[n] for n in names]), ast.unparse(node), bindings.modes
+
+class Frozen:
+    """
+    Specialized functions of the methods of a model, as attributes of the same names.
+    """
+    def __init__(self, obj, *names: str):
+        """
+        :param obj: model, e.g. a system
+        :param names: names of the methods to freeze, e.g. the right-hand side and the event functions
+        """
+        self.obj = obj
+        self.variants = {}
+        self.sources = {}
+        self.keys = {}
+        for name in names:
+            setattr(self, name, self._freeze(name))
+
+    def _freeze(self, name: str):
+        method = getattr(self.obj, name)
+        function, source, modes = specialize(self.obj, name)
+        variants = self.variants[name] = {}
+        self.sources[name] = {}
+        # the key of a variant are the values of the modes it reads, of the model or of a given copy of them
+        if not modes:
+            self.keys[name] = key = lambda given=None: None
+        elif len(modes) == 1:
+            values, index = modes[0][0].values, modes[0][0].index[modes[0][1]]
+            self.keys[name] = key = lambda given=None: (values if given is None else given.values)[index]
+        else:
+            owners = list({id(m): m for m, _ in modes}.values())
+            self.keys[name] = key = lambda given=None: b''.join(
+                (given if given is not None and given.index is m.index else m).values.tobytes() for m in owners)
+        variants[key()], self.sources[name][key()] = function, source
+
+        if not modes:
+            frozen = function
+        elif len(modes) == 1:
+            def frozen(*args, modes=None):
+                try:
+                    return variants[values[index] if modes is None else modes.values[index]](*args)
+                except KeyError:
+                    return self._variant(name, modes)(*args)
+        else:
+            def frozen(*args, modes=None):
+                try:
+                    return variants[key(modes)](*args)
+                except KeyError:
+                    return self._variant(name, modes)(*args)
+
+        frozen.__name__ = name
+        for attribute in ('terminal', 'direction'):
+            if hasattr(method, attribute):
+                setattr(frozen, attribute, getattr(method, attribute))
+        return frozen
+
+    def _variant(self, name: str, modes: Modes | None = None):
+        """
+        :param modes: copy of the modes of the model, None for the current modes
+        :return: function of the method in the modes, generated on its first use
+        """
+        key = self.keys[name](modes)
+        if key not in self.variants[name]:
+            self.variants[name][key], self.sources[name][key], _ = specialize(self.obj, name, modes)
+        return self.variants[name][key]
+
+    def source(self, name: str) -> str:
+        """
+        :return: generated source of the method in the current modes
+        """
+        self._variant(name)
+        return self.sources[name][self.keys[name]()]
+
+def freeze(obj, *names: str) -> Frozen:
+    """
+    :param obj: model, e.g. a system
+    :param names: names of the methods to freeze, by default solve
+    :return: Frozen with the specialized methods as attributes
+    """
+    return Frozen(obj, *(names or ('solve',)))
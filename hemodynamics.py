@@ -4,9 +4,14 @@ Hemodynamic lumped-parameter models describing the dynamics of the systemic and/
 
 import numpy as np
 from scipy.integrate import solve_ivp
+from scipy.sparse import diags_array
 from tahs import TAH, TimeVaryingElastance
+from utils import records
+from trajectory import Trajectory
 
 class VAV:
+    states = ('Vv', 'P1', 'Part')
+
     def __init__(self, tah: TAH = TimeVaryingElastance(),
                  L: float = 0.01,
                  C: float = 1.5,
@@ -29,8 +34,19 @@ class VAV:
 
     def __call__(self, y0, t_begin: float = 0.0, t_end: float = 10.0):
         sol = solve_ivp(self.solve, [t_begin, t_end], y0, atol=1e-10, rtol=1e-10)
-        z = [self.flow(sol.t[i], y) for i, y in enumerate(sol.y.T)]
-        return sol.t, np.vstack([sol.y, np.asarray(z).T])
+        d = self.diagnostics(sol.t, sol.y)
+        return sol.t, np.vstack([sol.y, d.Pv, d.Qvv, d.Qart, d.Rvv, d.Rva])
+
+    def trajectory(self, y0, t_begin: float = 0.0, t_end: float = 10.0, period: float | None = None) -> Trajectory:
+        """
+        :param y0: initial states (Vv, P1, Part)
+        :param t_begin: start time
+        :param t_end: end time
+        :param period: duration of a cycle, e.g. the period of the activation
+        :return: trajectory with dense output, and the diagnostics as derived columns
+        """
+        sol = solve_ivp(self.solve, [t_begin, t_end], y0, atol=1e-10, rtol=1e-10, dense_output=True)
+        return Trajectory([sol], self.states, self.diagnostics, period)
 
     def solve(self, t, y):
         _, Qvv, Qart, _, Rva = self.flow(t, y)
@@ -49,6 +65,30 @@ class VAV:
 
         return Pv, Qvv, Qart, Rvv, Rva
 
+    def diagnostics(self, t, Y):
+        """
+        Derived signals of a trajectory, vectorized over the samples.
+
+        :param t: times of shape (n,)
+        :param Y: states (Vv, P1, Part) of shape (3, n)
+        :return: records of signals of shape (n,) with the ventricular pressure Pv, the inflow Qvv and outflow Qart,
+            the valve resistances Rvv and Rva, and the derivatives dVv, dP1 and dPart of the states
+        """
+        t = np.asarray(t, dtype=float)
+        Y = np.asarray(Y, dtype=float)
+        Pv = self.tah.pressure(Y[0], t)
+
+        dPVV = self.Pv - Pv
+        Rvv = np.where(dPVV >= 0, self.Rvo, self.Rvc)
+        Qvv = dPVV / Rvv
+
+        dPVA = Pv - Y[2]
+        Rva = np.where(dPVA >= 0, self.Rvo, self.Rvc)
+        Qart = dPVA / Rva
+
+        dVv, dP1, dPart = self.ode_vars(t, Y, Rva, Qvv, Qart)
+        return records(Pv=Pv, Qvv=Qvv, Qart=Qart, Rvv=Rvv, Rva=Rva, dVv=dVv, dP1=dP1, dPart=dPart)
+
     def ode_vars(self, t, y, Rva, Qvv, Qart):
         dVv = Qvv - Qart # Ventricular flow (inflow - outflow)
         dP1 = (Qart / self.C) - (y[1] / self.tau)
@@ -62,6 +102,166 @@ class VAV:
         return [dVv, dP1, dPart]
 
 
+class TransmissionLine:
+    """
+    Ventricle ejecting into an arterial line of N segments, each a series inertance and resistance followed by a shunt
+    compliance, terminated by a peripheral resistance to the venous pressure. The line is the discretized transmission
+    line of an artery, in which pressure waves travel with delay sqrt(L * C) and reflect at the termination.
+
+    The states alternate along the line, (Vv, P0, Q1, P1, ..., QN, PN), with P0 the pressure of the aortic root, Qk the
+    flow through and Pk the pressure at the end of segment k. Every state depends only on its neighbours, such that the
+    Jacobian is tridiagonal: the implicit solvers, Radau and BDF, factorize it in O(N) instead of forming an n x n
+    finite-difference Jacobian.
+    """
+
+    def __init__(self, tah: TAH | None = None,
+                 N: int = 100,
+                 L: float = 0.01,
+                 C: float = 1.5,
+                 R: float = 0.05,
+                 C0: float = 0.01,
+                 Rp: float = 1.0,
+                 Pv: float = 7.5,
+                 Rvo: float = 0.05,
+                 Rvc: float = 1000):
+        """
+        :param tah: ventricle, by default a TimeVaryingElastance
+        :param N: number of segments
+        :param L: total inertance of the line
+        :param C: total compliance of the line
+        :param R: total resistance of the line
+        :param C0: compliance of the aortic root
+        :param Rp: peripheral resistance terminating the line
+        :param Pv: venous pressure
+        :param Rvo: resistance of the open valves
+        :param Rvc: resistance of the closed valves
+        """
+        self.tah = TimeVaryingElastance() if tah is None else tah
+        self.N = N
+        self.L = L
+        self.C = C
+        self.R = R
+        self.C0 = C0
+        self.Rp = Rp
+        self.Pv = Pv
+        self.Rvo = Rvo
+        self.Rvc = Rvc
+
+        self.Ls = L / N # segment inertance
+        self.Cs = C / N # segment compliance
+        self.Rs = R / N # segment resistance
+
+    @property
+    def states(self) -> tuple[str, ...]:
+        return ('Vv', 'P0') + tuple(f'{name}{k}' for k in range(1, self.N + 1) for name in ('Q', 'P'))
+
+    @property
+    def jac_sparsity(self):
+        """
+        :return: sparse pattern of the Jacobian, tridiagonal, e.g. for the jac_sparsity of solve_ivp
+        """
+        n = 2 * self.N + 2
+        return diags_array([np.ones(n - 1), np.ones(n), np.ones(n - 1)], offsets=[-1, 0, 1], format='csc')
+
+    def __call__(self, y0, t_begin: float = 0.0, t_end: float = 10.0, method: str = 'Radau'):
+        sol = solve_ivp(self.solve, [t_begin, t_end], y0, method=method, jac=self.jacobian, atol=1e-8, rtol=1e-8)
+        d = self.diagnostics(sol.t, sol.y)
+        return sol.t, np.vstack([sol.y, d.Pv, d.Qvv, d.Qart, d.Qp])
+
+    def trajectory(self, y0, t_begin: float = 0.0, t_end: float = 10.0, period: float | None = None,
+                   method: str = 'Radau') -> Trajectory:
+        """
+        :param y0: initial states (Vv, P0, Q1, P1, ..., QN, PN)
+        :param t_begin: start time
+        :param t_end: end time
+        :param period: duration of a cycle, e.g. the period of the activation
+        :param method: implicit method of solve_ivp, which is given the analytic Jacobian
+        :return: trajectory with dense output, and the diagnostics as derived columns
+        """
+        sol = solve_ivp(self.solve, [t_begin, t_end], y0, method=method, jac=self.jacobian, atol=1e-8, rtol=1e-8,
+                        dense_output=True)
+        return Trajectory([sol], self.states, self.diagnostics, period)
+
+    def solve(self, t, y):
+        _, Qvv, Qart, _, _ = self.flow(t, y)
+        P = y[1::2] # P0, P1, ..., PN
+        Q = y[2::2]
+
+        dy = np.empty(len(y))
+        dy[0] = Qvv - Qart
+        dy[1] = (Qart - Q[0]) / self.C0
+        dy[2::2] = P[:-1] - P[1:] - self.Rs * Q
+        dy[2::2] /= self.Ls
+        dy[3:-2:2] = Q[:-1] - Q[1:]
+        dy[-1] = Q[-1] - (P[-1] - self.Pv) / self.Rp
+        dy[3::2] /= self.Cs
+        return dy
+
+    def flow(self, t, y):
+        Pv = self.tah.pressure(y[0], t)
+
+        dPVV = self.Pv - Pv # P_venous - P_ventricle
+        Rvv = 1.0 * self.Rvo if dPVV >= 0 else 1.0 * self.Rvc # Venous-ventricular resistance
+
+        dPVA = Pv - y[1] # P_ventricle - P_root
+        Rva = 1.0 * self.Rvo if dPVA >= 0 else 1.0 * self.Rvc # Ventricular-arterial resistance
+
+        return Pv, dPVV / Rvv, dPVA / Rva, Rvv, Rva
+
+    def jacobian(self, t, y):
+        """
+        Analytic Jacobian, with the valve resistances of the current state; the ventricular elastance dPv/dVv follows
+        from pressure_diff, which is linear in the flow.
+
+        :return: sparse tridiagonal matrix in CSC format, e.g. for the jac of solve_ivp
+        """
+        _, _, _, Rvv, Rva = self.flow(t, y)
+        E = self.tah.pressure_diff(y[0], 1.0, t) - self.tah.pressure_diff(y[0], 0.0, t)
+        n = 2 * self.N + 2
+
+        diagonal = np.zeros(n)
+        diagonal[0] = -E / Rvv - E / Rva
+        diagonal[1] = -1 / (Rva * self.C0)
+        diagonal[2::2] = -self.Rs / self.Ls
+        diagonal[-1] = -1 / (self.Rp * self.Cs)
+
+        upper = np.empty(n - 1) # d(dy[i]) / dy[i + 1]
+        upper[0] = 1 / Rva
+        upper[1] = -1 / self.C0
+        upper[2::2] = -1 / self.Ls
+        upper[3::2] = -1 / self.Cs
+
+        lower = np.empty(n - 1) # d(dy[i + 1]) / dy[i]
+        lower[0] = E / (Rva * self.C0)
+        lower[1::2] = 1 / self.Ls
+        lower[2::2] = 1 / self.Cs
+        return diags_array([lower, diagonal, upper], offsets=[-1, 0, 1], format='csc')
+
+    def diagnostics(self, t, Y):
+        """
+        Derived signals of a trajectory, vectorized over the samples.
+
+        :param t: times of shape (n,)
+        :param Y: states (Vv, P0, Q1, P1, ..., QN, PN) of shape (2N + 2, n)
+        :return: records of signals of shape (n,) with the ventricular pressure Pv, the inflow Qvv and outflow Qart, the
+            valve resistances Rvv and Rva, and the peripheral outflow Qp of the line
+        """
+        t = np.asarray(t, dtype=float)
+        Y = np.asarray(Y, dtype=float)
+        Pv = self.tah.pressure(Y[0], t)
+
+        dPVV = self.Pv - Pv
+        Rvv = np.where(dPVV >= 0, self.Rvo, self.Rvc)
+        Qvv = dPVV / Rvv
+
+        dPVA = Pv - Y[1]
+        Rva = np.where(dPVA >= 0, self.Rvo, self.Rvc)
+        Qart = dPVA / Rva
+
+        Qp = (Y[-1] - self.Pv) / self.Rp
+        return records(Pv=Pv, Qvv=Qvv, Qart=Qart, Rvv=Rvv, Rva=Rva, Qp=Qp)
+
+
 class Valve:
     def __init__(self, Ro: float = 0.1, Rc: float = 30000, threshold: float = 0.0):
         self.Ro = Ro
@@ -0,0 +1,191 @@
+"""
+Simulation of hybrid systems: continuous dynamics with discrete transitions at events, e.g. the opening and closing
+of valves.
+
+The integration is restarted at every terminal event, after applying the transition of the event to the model. The
+segments between restarts and the transitions are collected in a Trajectory, with the transitions in its event log.
+
+Transitions may declare the modes from which they can fire, e.g. the closing of a valve only from its open mode. Only
+the events of the transitions enabled in the current mode are monitored during a segment, which halves the event
+evaluations of models of valves, and no event needs a threshold that is never reached to stay inactive.
+
+A component that switches back and forth at ever shorter intervals, e.g. a valve closing against a flow it cannot
+stop, would grind the simulation to a halt in tiny segments. With chattering detection, such a component slides:
+its two modes are blended across a band around its switching surface, the regularization of Sotomayor and Teixeira
+of the sliding mode of Filippov, until the state leaves the band on either side. Both vector fields are evaluated in
+copies of the modes of the model, passed to the right-hand side and the event functions as keyword modes, e.g. to the
+functions of freezing.freeze, such that the modes of the model only change at events. Slides are recorded in the event
+log as the transition 'slide', e.g. trajectory.occurrences('valve_out', 'slide') lists them.
+"""
+
+import numpy as np
+from scipy.integrate import solve_ivp
+
+from trajectory import Trajectory
+from parameters import Parameters, Modes
+from utils import event
+
+class Chattering(Parameters):
+    """
+    Detection of chattering: a component chatters if it switched a number of times within a time window.
+    """
+    __slots__ = ('switches', 'window', 'band', 'method')
+
+    def __init__(self, switches: int = 8, window: float = 1e-4, band: float = 1e-4, method: str = 'LSODA'):
+        """
+        :param switches: number of switches
+        :param window: duration in which these switches mark chattering
+        :param band: half width of the band around the switching surface in which the modes are blended, in units of
+            the event functions, e.g. the head difference over a valve; the sliding dynamics are approximated to
+            about this width
+        :param method: method of solve_ivp while components slide, one for stiff systems, as the blending across a
+            narrow band is stiff
+        """
+        self.switches = switches
+        self.window = window
+        self.band = band
+        self.method = method
+
+def sliding(fun, component: str, a, b, modes: Modes, band: float):
+    """
+    Regularized right-hand side of a component sliding between two modes.
+
+    The position s across the switching surface is the mean of the distances into either mode, e.g. the head
+    difference over a valve minus the mean of its thresholds. Within the band |s| < band, the vector fields of the
+    modes are blended linearly in s; at its edges the component leaves into either mode.
+
+    :param fun: right-hand side fun(t, y, modes=None), evaluated in the given copy of the modes
+    :param component: name of the component in the modes
+    :param a: (mode, event) the component is in, and the event of the transition into it, monitored in the other mode,
+        e.g. of a valve that just opened, 1 and its opening
+    :param b: (mode, event) of the other mode, e.g. 0 and the closing of the valve
+    :param modes: modes of the model, of which copies with the component in either mode are passed to fun and the
+        events, by default; the functions returned take a copy as keyword modes instead, e.g. of an enclosing slide
+    :param band: half width of the band
+    :return: right-hand side, and the event functions of leaving the band into mode a and into mode b
+    """
+    (mode_a, event_a), (mode_b, event_b) = a, b
+
+    def split(modes):
+        modes_a, modes_b = modes.copy(), modes.copy()
+        modes_a[component], modes_b[component] = mode_a, mode_b
+        return modes_a, modes_b
+
+    default = split(modes)
+
+    def position(t, y, modes_a, modes_b):
+        # distance into mode b from its guard event_a, evaluated in mode b, ending in mode a
+        distance_b = -event_a.direction * event_a(t, y, modes=modes_b)
+        return 0.5 * (-event_b.direction * event_b(t, y, modes=modes_a) - distance_b)
+
+    def rhs(t, y, modes=None):
+        modes_a, modes_b = default if modes is None else split(modes)
+        f_b = np.asarray(fun(t, y, modes=modes_b), dtype=float)
+        f_a = np.asarray(fun(t, y, modes=modes_a), dtype=float)
+        alpha = min(max(0.5 + 0.5 * position(t, y, modes_a, modes_b) / band, 0.0), 1.0)
+        return alpha * f_a + (1 - alpha) * f_b
+
+    @event(direction=1)
+    def leaving_a(t, y, modes=None):
+        return position(t, y, *(default if modes is None else split(modes))) - band
+
+    @event(direction=-1)
+    def leaving_b(t, y, modes=None):
+        return position(t, y, *(default if modes is None else split(modes))) + band
+
+    return rhs, leaving_a, leaving_b
+
+def simulate(fun, t_span, y0, events, transitions, states=(), signals=None, diagnostics=None,
+             period: float | None = None, delay: float = 0.0, carry: float | None = None,
+             chattering: Chattering | None = None, modes: Modes | None = None, **options) -> Trajectory:
+    """
+    :param fun: right-hand side fun(t, y)
+    :param t_span: initial and final time
+    :param y0: initial states
+    :param events: terminal event functions of solve_ivp
+    :param transitions: (component, transition, action) or (component, transition, action, enabled) per event, with
+        the names of the component and transition recorded in the event log, the function applying the transition to
+        the model, e.g. valve.open, and the function telling whether the transition can fire from the current mode of
+        the model, e.g. from Modes.transitions; the events of disabled transitions are not monitored
+    :param states: names of the states, in the order of y
+    :param signals: functions (t, y) of the samples that depend on the discrete state of the model, e.g. the valve
+        states or the right-hand side, evaluated per segment before its transition and available as columns
+    :param diagnostics: function (t, Y) returning the records of derived signals
+    :param period: duration of a beat
+    :param delay: time skipped after an event before restarting from its state, e.g. to keep an event function that
+        is zero at the restart from triggering again
+    :param carry: cut-back of the step size at a restart: the first step after an event is this fraction of the last
+        full step accepted before it, i.e. not the step the event truncates, instead of the initial step of solve_ivp,
+        which starts small and ramps up, e.g. 0.5 for systems with many short segments; None restarts every segment
+        from the initial step. The steps are taken from the samples, so carry excludes the option t_eval
+    :param chattering: detection of chattering components, which then slide between their two modes until they leave
+        the band around their switching surface, None to switch at every event
+    :param modes: modes of the model, with the components named as in the transitions, required for chattering: a
+        sliding component evaluates fun and its events in copies of them, which they take as keyword modes
+    :param options: options of solve_ivp, e.g. rtol and atol, dense output is on by default
+    :return: trajectory of the segments, with the transitions in its event log
+    """
+    options.setdefault('dense_output', True)
+    trajectory = Trajectory(states=states, diagnostics=diagnostics, period=period)
+    signals = signals or {}
+    values = {name: [] for name in signals}
+
+    if chattering is not None and modes is None:
+        raise ValueError('chattering requires the modes of the model')
+    if carry is not None and 't_eval' in options:
+        raise ValueError('carry requires the samples of the accepted steps, which t_eval replaces')
+
+    slides = {} # transitions into the mode of sliding components and into their other mode, and these modes
+    switches = {} # times of the last switches of the components
+    first_step = None # of the current segment, None for the initial step of solve_ivp
+    step = None # last full step accepted, None before any
+    t, t_end = t_span
+    while True:
+        enabled = [i for i, transition in enumerate(transitions)
+                   if transition[0] not in slides and (len(transition) < 4 or transition[3]())]
+        rhs, exits, targets = fun, [], []
+        for component, (a, b, mode_a, mode_b) in slides.items():
+            rhs, *leaving = sliding(rhs, component, (mode_a, events[a]), (mode_b, events[b]), modes, chattering.band)
+            exits += leaving
+            targets += [a, b]
+        segment = options if first_step is None else {**options, 'first_step': first_step}
+        sol = solve_ivp(rhs, [t, t_end], y0, events=[events[i] for i in enabled] + exits,
+                        **(segment if not slides else {**segment, 'method': chattering.method}))
+        if sol.status == -1:
+            raise RuntimeError(f'integration failed at t = {sol.t[-1]}: {sol.message}')
+        trajectory.append(sol)
+        for name, signal in signals.items():
+            values[name].append(np.asarray(signal(sol.t, sol.y), dtype=float))
+        if sol.status != 1:
+            break
+
+        k = next(i for i, times in enumerate(sol.t_events) if len(times))
+        index = enabled[k] if k < len(enabled) else targets[k - len(enabled)]
+        component, transition, action, *_ = transitions[index]
+        previous = modes[component] if chattering is not None and component in modes.index else None
+        action()
+        t, y0 = sol.t_events[k][0], sol.y_events[k][0]
+        trajectory.record(t, component, transition)
+        if k >= len(enabled):
+            del slides[component]
+        elif chattering is not None:
+            times = switches.setdefault(component, [])
+            times.append(t)
+            del times[:-chattering.switches]
+            pair = [i for i, transition in enumerate(transitions) if transition[0] == component]
+            if (len(times) == chattering.switches and t - times[0] <= chattering.window and len(pair) == 2
+                    and previous is not None):
+                slides[component] = (index, pair[1] if pair[0] == index else pair[0], modes[component], previous)
+                trajectory.record(t, component, 'slide')
+                times.clear()
+        t += delay
+        if len(sol.t) > 2:
+            # the last sample is the event, which truncates the step after the sample before it
+            step = sol.t[-2] - sol.t[-3]
+        first_step = None
+        if carry is not None and step is not None and t < t_end:
+            first_step = min(carry * step, t_end - t)
+
+    for name in signals:
+        trajectory.derive(name, lambda _, segments=values[name]: np.concatenate(segments, axis=-1))
+    return trajectory
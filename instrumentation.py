@@ -0,0 +1,266 @@
+"""
+Opt-in instrumentation of models and simulations: call counts and timings per component method, and statistics of
+every solve_ivp call.
+
+Instrumentation wraps the methods of attached objects and replaces solve_ivp in the modules that use it; detach
+restores the original objects and functions, so nothing is wrapped, and nothing costs time, outside of an
+instrumented run:
+
+    with Instrumentation() as instrumentation:
+        instrumentation.attach(system)
+        instrumentation.solver()
+        system(y0, 0, 6)
+    print(instrumentation.report())
+
+Every component is timed inclusively (total) and exclusively (self, i.e. without the instrumented calls it makes),
+such that the self time of solve_ivp is the solver overhead besides the right-hand side, Jacobian and event functions.
+Attached objects cannot be pickled, e.g. by PouchSweep, while instrumented.
+"""
+
+import gc
+import sys
+import types
+import inspect
+from functools import wraps
+from time import perf_counter
+
+from scipy.integrate import solve_ivp as _solve_ivp
+
+LIBRARIES = {'numpy', 'scipy', 'matplotlib', 'sympy'} | set(sys.stdlib_module_names)
+
+# stages per step attempt of the explicit Runge-Kutta methods, with the first stage reused from the previous step
+RK_STAGES = {'RK23': 3, 'RK45': 6}
+
+class Counter:
+    """
+    Number of calls and time spent in one component.
+    """
+    def __init__(self, name: str):
+        self.name = name
+        self.calls = 0
+        self.total = 0.0
+        self.exclusive = 0.0
+
+class Segment:
+    """
+    Statistics of one solve_ivp call, i.e. of one segment between restarts at events.
+    """
+    def __init__(self, method: str, t0: float, t1: float, status: int, nfev: int, njev: int, nlu: int,
+                 accepted: int | None, rejected: int | None, events: list, rhs_calls: int, event_calls: int,
+                 seconds: float):
+        """
+        :param method: integration method
+        :param t0: initial time
+        :param t1: final time, the event time if a terminal event occurred
+        :param status: status of solve_ivp, 1 if a terminal event occurred
+        :param nfev: number of right-hand side evaluations reported by solve_ivp
+        :param njev: number of Jacobian evaluations reported by solve_ivp
+        :param nlu: number of LU decompositions reported by solve_ivp
+        :param accepted: number of accepted steps, None if unknown (t_eval given)
+        :param rejected: number of rejected steps, None if unknown (other than RK23 and RK45)
+        :param events: indices of the event functions that occurred
+        :param rhs_calls: number of right-hand side calls, including the ones of the initial step selection
+        :param event_calls: number of event function calls
+        :param seconds: wall time of the solve
+        """
+        self.method = method
+        self.t0 = t0
+        self.t1 = t1
+        self.status = status
+        self.nfev = nfev
+        self.njev = njev
+        self.nlu = nlu
+        self.accepted = accepted
+        self.rejected = rejected
+        self.events = events
+        self.rhs_calls = rhs_calls
+        self.event_calls = event_calls
+        self.seconds = seconds
+
+def model(value) -> bool:
+    """
+    :return: True if value is an instance of a class of this repository, i.e. a component that is attached recursively
+    """
+    return (not isinstance(value, (type, types.FunctionType, types.MethodType, types.ModuleType))
+            and type(value).__module__.split('.')[0] not in LIBRARIES)
+
+class Instrumentation:
+    """
+    Collector of component timings and solver statistics.
+    """
+    def __init__(self):
+        self.counters = {}
+        self.segments = []
+        self._stack = []
+        self._undo = []
+        self._classes = set()
+
+    def timed(self, name: str, function):
+        """
+        :return: wrapper of function that counts and times its calls under name
+        """
+        counter = self.counters.setdefault(name, Counter(name))
+        stack = self._stack
+
+        @wraps(function)
+        def wrapper(*args, **kwargs):
+            stack.append(0.0)
+            start = perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                elapsed = perf_counter() - start
+                counter.calls += 1
+                counter.total += elapsed
+                counter.exclusive += elapsed - stack.pop()
+                if stack:
+                    stack[-1] += elapsed
+        return wrapper
+
+    def attach(self, obj, methods=None, recursive: bool = True, _seen=None):
+        """
+        Time the methods of the class of obj, and of the components it holds.
+
+        Methods are wrapped on the class, not on the instance, such that calls through obj(), e.g. of a valve, are
+        timed as well. All instances of an attached class are timed, under the class name. Functions stored on the
+        instance, e.g. the H-Q curve pump.hq or an applied voltage, are wrapped in place if they are named in methods.
+
+        Instances are inspected without accessing their __dict__, which would slow down their attribute access for
+        the rest of the run.
+
+        :param obj: model or component
+        :param methods: names of the methods to time, by default all public methods and __call__ of the class
+        :param recursive: attach the components held by obj, with their default methods
+        :return: self
+        """
+        seen = set() if _seen is None else _seen
+        if id(obj) in seen:
+            return self
+        seen.add(id(obj))
+        cls = type(obj)
+
+        if methods is None:
+            methods = [m for m in dir(cls) if (not m.startswith('_') or m == '__call__')
+                       and inspect.isfunction(inspect.getattr_static(cls, m))]
+
+        for method in methods:
+            name = f'{cls.__name__}.{method}'
+            static = inspect.getattr_static(cls, method, None)
+            if static is None:
+                function = getattr(obj, method)
+                self._undo.append((setattr, obj, method, function))
+                setattr(obj, method, self.timed(name, function))
+            elif (cls, method) not in self._classes:
+                self._classes.add((cls, method))
+                if method in cls.__dict__:
+                    self._undo.append((setattr, cls, method, static))
+                else:
+                    self._undo.append((delattr, cls, method))
+                if isinstance(static, staticmethod):
+                    setattr(cls, method, staticmethod(self.timed(name, static.__func__)))
+                elif inspect.isfunction(static):
+                    setattr(cls, method, self.timed(name, static))
+
+        if recursive:
+            for value in gc.get_referents(obj):
+                if model(value):
+                    self.attach(value, _seen=seen)
+        return self
+
+    def solver(self, *modules):
+        """
+        Record every solve_ivp call made through the given modules.
+
+        :param modules: modules that imported solve_ivp, by default all loaded modules that did, and scipy.integrate
+        """
+        if not modules:
+            modules = [m for m in list(sys.modules.values()) if vars(m).get('solve_ivp') is _solve_ivp]
+        for module in modules:
+            self._undo.append((setattr, module, 'solve_ivp', vars(module)['solve_ivp']))
+            module.solve_ivp = self.solve_ivp
+        return self
+
+    def solve_ivp(self, fun, t_span, y0, method='RK45', t_eval=None, dense_output=False, events=None,
+                  vectorized=False, args=None, **options):
+        """
+        solve_ivp with timed right-hand side, Jacobian and event functions, and a Segment per call.
+        """
+        rhs = self.timed('solve_ivp.rhs', fun)
+        if callable(options.get('jac')):
+            options['jac'] = self.timed('solve_ivp.jacobian', options['jac'])
+        names = []
+        if events is not None:
+            events = [events] if callable(events) else events
+            names = [f'solve_ivp.event[{getattr(event, "__name__", i)}]' for i, event in enumerate(events)]
+            events = [self.timed(name, event) for name, event in zip(names, events)]
+
+        counters = [self.counters['solve_ivp.rhs']] + [self.counters[name] for name in dict.fromkeys(names)]
+        before = [counter.calls for counter in counters]
+        start = perf_counter()
+        sol = self.timed('solve_ivp', _solve_ivp)(rhs, t_span, y0, method=method, t_eval=t_eval,
+                                                  dense_output=dense_output, events=events, vectorized=vectorized,
+                                                  args=args, **options)
+        seconds = perf_counter() - start
+
+        calls = [counter.calls - calls for counter, calls in zip(counters, before)]
+        name = method if isinstance(method, str) else method.__name__
+        accepted = len(sol.t) - 1 if t_eval is None else None
+        rejected = None
+        if accepted is not None and name in RK_STAGES:
+            # two evaluations select the initial step, every step attempt takes one evaluation per stage
+            rejected = (sol.nfev - 2) // RK_STAGES[name] - accepted
+        self.segments.append(Segment(name, float(t_span[0]), float(sol.t[-1]), sol.status, sol.nfev, sol.njev,
+                                     sol.nlu, accepted, rejected,
+                                     [] if sol.t_events is None else [i for i, t in enumerate(sol.t_events) if len(t)],
+                                     calls[0], sum(calls[1:]), seconds))
+        return sol
+
+    def detach(self):
+        """
+        Restore all attached objects and modules; the counters and segments are kept.
+        """
+        while self._undo:
+            action, *arguments = self._undo.pop()
+            action(*arguments)
+        self._classes = set()
+
+    def reset(self):
+        self.counters = {}
+        self.segments = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exception):
+        self.detach()
+
+    def report(self, segments: bool = False) -> str:
+        """
+        :param segments: list every solve_ivp call, besides their totals
+        :return: table of the components by total time, and the solver statistics
+        """
+        lines = [f'{"component":<60} {"calls":>9} {"total [s]":>11} {"self [s]":>11} {"per call [us]":>14}']
+        for counter in sorted(self.counters.values(), key=lambda c: c.total, reverse=True):
+            if counter.calls:
+                lines.append(f'{counter.name:<60} {counter.calls:>9} {counter.total:>11.4g} {counter.exclusive:>11.4g} '
+                             f'{1e6 * counter.total / counter.calls:>14.4g}')
+
+        if self.segments:
+            def total(attribute):
+                values = [getattr(s, attribute) for s in self.segments]
+                return '-' if any(v is None for v in values) else sum(values)
+
+            lines += ['', f'solve_ivp: {len(self.segments)} segments ({len(self.segments) - 1} restarts), '
+                          f'{sum(s.status == 1 for s in self.segments)} terminal events, '
+                          f'{sum(s.seconds for s in self.segments):.4g} s',
+                      f'  steps: {total("accepted")} accepted, {total("rejected")} rejected',
+                      f'  evaluations: {total("nfev")} rhs, {total("njev")} jacobian, {total("nlu")} LU, '
+                      f'{total("event_calls")} event functions']
+            if segments:
+                lines.append(f'  {"method":<8} {"t0":>10} {"t1":>10} {"accepted":>9} {"rejected":>9} {"nfev":>7} '
+                             f'{"events":>8} {"seconds":>9}')
+                for s in self.segments:
+                    lines.append(f'  {s.method:<8} {s.t0:>10.5g} {s.t1:>10.5g} {str(s.accepted):>9} '
+                                 f'{str(s.rejected):>9} {s.nfev:>7} {",".join(map(str, s.events)) or "-":>8} '
+                                 f'{s.seconds:>9.4g}')
+        return '\n'.join(lines)
@@ -3,18 +3,11 @@ Lumped-parameter models describing the dynamics of DC motors.
 """
 from abc import ABC, abstractmethod
 import numpy as np
-from matplotlib import pyplot as plt
 
 from scipy.integrate import solve_ivp
 from math import sqrt, pi
 from utils import Sigmoid
 
-import matplotlib.pylab as pylab
-
-params = {'legend.fontsize': 'xx-large',
-         'axes.labelsize': 'xx-large'}
-pylab.rcParams.update(params)
-
 class DCM:
     def __init__(self, voltage = lambda t: Sigmoid(2, 0.1)(t), R: float = 0.2, L: float = 0.11 / 10,
                  M: float = 3.88 / 1e7, kt: float = 5.9 / 1000, mu: float = 12/1e7):
@@ -159,6 +152,13 @@ class DCMotor(Motor):
         return (self.alpha - tau / V) * self.kt / self.gamma
 
 if __name__ == '__main__':
+    from matplotlib import pyplot as plt
+    import matplotlib.pylab as pylab
+
+    params = {'legend.fontsize': 'xx-large',
+             'axes.labelsize': 'xx-large'}
+    pylab.rcParams.update(params)
+
     motor = DCMotor()
 
     fig, ax = plt.subplots()
@@ -0,0 +1,302 @@
+"""
+Lumped hydraulic circuits defined by a netlist.
+
+A Netlist connects nodes by elements: resistors, inductors, pumps, capacitors to ground, valves that switch at events,
+diode valves and TAHs. Instead of hand-derived flow balances, the linear elements are assembled into sparse matrices,
+once per combination of the valve modes; a right-hand side evaluates the nonlinear elements, i.e. the ventricular heads
+of the TAHs, the diode valves and head-dependent resistors, and multiplies the states with the assembled matrix:
+
+    netlist = Netlist()
+    netlist.pump('flow', 'ha', 'h1', L=0.01, R=10)
+    netlist.capacitor('h1', C=1.0)
+    netlist.valve('hvalve', 'h1', 'ha', Valve(Ropen=1, Rclosed=1000, dhopen=4, dhclose=1))
+    netlist.capacitor('ha', C=0.01)
+    netlist.tah('vv', 'ha', 'hv', LinearMembrane(E=1, Vv0=-1))
+    ...
+    system = MotorPumpLoadAssembly(motor, pump, netlist)
+    simulate(system.solve, [0, 10], y0, netlist.events(offset=2), netlist.transitions(), states=system.states)
+
+The states are the heads of the nodes with a capacitor, the flows of the inductors and pumps, and the volumes of the
+TAHs, in order of declaration; a Netlist in a pump assembly declares its pump first, as the pump flow is its first
+state. The heads of the other nodes follow from the states: a ventricle from its TAH, and nodes without capacitor from
+their flow balance, which is eliminated in the assembly. Nonlinear elements therefore connect nodes with a capacitor,
+ventricles or ground only.
+"""
+
+import numpy as np
+from scipy import sparse
+from scipy.sparse.linalg import splu
+
+from circuits import Circuit, Valve, DiodeValve
+from parameters import Modes
+from utils import event
+
+GROUND = '0'
+
+class Assembly:
+    """
+    Matrices of a netlist in one combination of the valve modes, of the known heads and flows z, i.e. the states, the
+    ventricular heads and a zero for ground.
+    """
+    __slots__ = ('derivatives', 'nonlinear', 'heads', 'valves')
+
+    def __init__(self, derivatives, nonlinear, heads, valves):
+        """
+        :param derivatives: sparse matrix of the derivatives of the states from z
+        :param nonlinear: sparse matrix of the derivatives of the states from the flows of the nonlinear elements
+        :param heads: sparse matrix of the heads of the nodes from z
+        :param valves: rows of the head differences across the valves from z
+        """
+        self.derivatives = derivatives
+        self.nonlinear = nonlinear
+        self.heads = heads
+        self.valves = valves
+
+class Netlist(Circuit):
+    """
+    Circuit of nodes and elements, built by chaining the element methods, e.g. Netlist().capacitor('h1', C=1.0).
+    Node GROUND has zero head.
+    """
+    def __init__(self):
+        self.nodes = []
+        self.states = ()
+        self.capacitances = {}
+        self.resistors = []
+        self.nonlinear = []
+        self.valves = []
+        self.inductors = []
+        self.tahs = []
+        self.modes = Modes()
+        self._assemblies = {}
+        self._layout = None
+
+    def _node(self, node: str) -> str:
+        if node != GROUND and node not in self.nodes:
+            self.nodes.append(node)
+        self._assemblies = {}
+        self._layout = None
+        return node
+
+    def _state(self, name: str) -> int:
+        if name in self.states:
+            raise ValueError(f'state {name} is already defined')
+        self.states += (name,)
+        return len(self.states) - 1
+
+    def capacitor(self, node: str, C: float):
+        """
+        Capacitance from the node to ground, with the head of the node as state of the same name.
+        """
+        self._node(node)
+        self._state(node)
+        self.capacitances[node] = C
+        return self
+
+    def resistor(self, name: str, a: str, b: str, R):
+        """
+        :param R: resistance, or function R(t, dh) of the time and head difference a - b for a nonlinear resistor
+        """
+        if callable(R):
+            self.nonlinear.append((name, self._node(a), self._node(b), lambda t, dh: dh / R(t, dh)))
+        else:
+            self.resistors.append((name, self._node(a), self._node(b), R))
+        return self
+
+    def diode(self, name: str, a: str, b: str, diode: DiodeValve = DiodeValve()):
+        """
+        Valve open for flow from a to b.
+        """
+        self.nonlinear.append((name, self._node(a), self._node(b), lambda t, dh: diode.flow(dh)))
+        return self
+
+    def valve(self, name: str, a: str, b: str, valve: Valve = Valve()):
+        """
+        Valve opening and closing at events of the head difference a - b, with its state in the modes of the netlist.
+        """
+        self.valves.append((name, self._node(a), self._node(b), valve))
+        modes = Modes(*[v[0] for v in self.valves])
+        modes.values[:-1] = self.modes.values
+        self.modes = modes
+        return self
+
+    def inductor(self, name: str, a: str, b: str, L: float, R: float = 0.0):
+        """
+        Inertance with a series resistance, with the flow from a to b as state.
+        """
+        self.inductors.append((name, self._node(a), self._node(b), L, R, False))
+        self._state(name)
+        return self
+
+    def pump(self, name: str, a: str, b: str, L: float, R: float = 0.0):
+        """
+        Inductor with the pump head, the argument h_pump of solve, raising the head from a to b.
+        """
+        self.inductors.append((name, self._node(a), self._node(b), L, R, True))
+        self._state(name)
+        return self
+
+    def tah(self, name: str, pouch: str, ventricle: str, tah):
+        """
+        Ventricle of a TAH, with the ventricular volume as state and its head tah.pressure(h pouch, volume). The flow
+        into the ventricle displaces the pouch, into the pouch node, which has a capacitor.
+        """
+        self.tahs.append((name, self._node(pouch), self._node(ventricle), tah))
+        self._state(name)
+        return self
+
+    def _assemble(self) -> Assembly:
+        n, m = len(self.states), len(self.tahs)
+        columns = n + m + 1
+        index = {node: i for i, node in enumerate(self.nodes)}
+        state = {name: i for i, name in enumerate(self.states)}
+
+        # z columns of the nodes whose heads are known
+        known = {node: state[node] for node in self.capacitances}
+        for j, (name, pouch, ventricle, tah) in enumerate(self.tahs):
+            if ventricle in known:
+                raise ValueError(f'ventricle {ventricle} of {name} cannot have a capacitor')
+            if pouch not in self.capacitances:
+                raise ValueError(f'pouch {pouch} of {name} needs a capacitor')
+            known[ventricle] = n + j
+        algebraic = [index[node] for node in self.nodes if node not in known]
+
+        def matrix(entries, shape):
+            rows, cols, values = np.array(entries, dtype=float).reshape(-1, 3).T
+            return sparse.csr_array((values, (rows.astype(int), cols.astype(int))), shape=shape)
+
+        conductances = [(a, b, 1 / R) for _, a, b, R in self.resistors]
+        conductances += [(a, b, 1 / valve.resistance(self.modes[name])) for name, a, b, valve in self.valves]
+        G = matrix([(index[p], index[q], s * g) for a, b, g in conductances for p, q, s in
+                    ((a, a, 1), (b, b, 1), (a, b, -1), (b, a, -1)) if p != GROUND and q != GROUND], (len(index),) * 2)
+        B = matrix([(index[node], state[name], s) for name, a, b, *_ in self.inductors
+                    for node, s in ((a, -1), (b, 1)) if node != GROUND], (len(index), columns))
+        E = matrix([(index[node], column, 1) for node, column in known.items()], (len(index), columns))
+
+        # heads of the nodes without capacitor from their flow balance G_AA h_A = (B - G E)_A z
+        H = E
+        if algebraic:
+            try:
+                lu = splu(sparse.csc_array(G[algebraic][:, algebraic]))
+            except RuntimeError:
+                raise ValueError('every node without capacitor needs a resistive path to a node with a known head')
+            K = lu.solve((B - G @ E)[algebraic].toarray())
+            P = matrix([(i, k, 1) for k, i in enumerate(algebraic)], (len(index), len(algebraic)))
+            H = sparse.csr_array(E + P @ sparse.csr_array(K))
+        inflow = B - G @ H
+
+        # flow balances of the capacitors and ventricles, and the pouches displaced by the ventricles
+        balance = [(state[node], index[node], 1 / C) for node, C in self.capacitances.items()]
+        for name, pouch, ventricle, tah in self.tahs:
+            balance += [(state[name], index[ventricle], 1), (state[pouch], index[ventricle], 1 / self.capacitances[pouch])]
+        balance = matrix(balance, (n, len(index)))
+
+        def head(node):
+            return H[[index[node]]] if node != GROUND else sparse.csr_array((1, columns))
+
+        rows = []
+        for name, a, b, L, R, _ in self.inductors:
+            row = (head(a) - head(b)).tocoo()
+            rows += [(state[name], c, v / L) for c, v in zip(row.col, row.data)] + [(state[name], state[name], -R / L)]
+        derivatives = sparse.csr_array(balance @ inflow + matrix(rows, (n, columns)))
+
+        for name, a, b, _ in self.nonlinear:
+            if any(node != GROUND and node not in known for node in (a, b)):
+                raise ValueError(f'{name} connects a node without capacitor')
+        injection = matrix([(index[node], k, s) for k, (_, a, b, _) in enumerate(self.nonlinear)
+                            for node, s in ((a, -1), (b, 1)) if node != GROUND], (len(index), len(self.nonlinear)))
+
+        valves = [(head(a) - head(b)).toarray()[0] for _, a, b, _ in self.valves]
+        return Assembly(derivatives, sparse.csr_array(balance @ injection), H, valves)
+
+    def assembly(self) -> Assembly:
+        """
+        :return: matrices in the current modes, assembled on their first use
+        """
+        key = self.modes.values.tobytes()
+        if key not in self._assemblies:
+            self._assemblies[key] = self._assemble()
+        return self._assemblies[key]
+
+    def layout(self) -> dict:
+        """
+        :return: indices of the states and of the columns of z that the right-hand side evaluates, computed once
+        """
+        if self._layout is None:
+            n, state = len(self.states), {name: i for i, name in enumerate(self.states)}
+            column = {GROUND: n + len(self.tahs), **{node: state[node] for node in self.capacitances},
+                      **{ventricle: n + j for j, (_, _, ventricle, _) in enumerate(self.tahs)}}
+            pumps = [(state[name], L) for name, a, b, L, R, pump in self.inductors if pump]
+            self._layout = {'tahs': [(state[pouch], state[name], tah) for name, pouch, _, tah in self.tahs],
+                            'pumps': (np.array([i for i, _ in pumps], dtype=int), np.array([1 / L for _, L in pumps])),
+                            'nonlinear': [(column[a], column[b], flow) for _, a, b, flow in self.nonlinear]}
+        return self._layout
+
+    def _known(self, y) -> np.ndarray:
+        y = np.asarray(y)
+        n = len(self.states)
+        z = np.zeros((n + len(self.tahs) + 1,) + y.shape[1:])
+        z[:n] = y
+        for j, (pouch, volume, tah) in enumerate(self.layout()['tahs']):
+            z[n + j] = tah.pressure(y[pouch], y[volume])
+        return z
+
+    def solve(self, t, h_pump, y, closed: dict | None = None):
+        """
+        :param h_pump: head of the pumps
+        :param y: states, of shape (nstates,) or (nstates, n)
+        :param closed: unused, the states of the valves are the modes of the netlist
+        :return: derivatives of the states
+        """
+        assembly, layout = self.assembly(), self.layout()
+        z = self._known(y)
+        dy = assembly.derivatives @ z
+        pumps, gains = layout['pumps']
+        dy[pumps] += np.multiply.outer(gains, h_pump)
+        if self.nonlinear:
+            dy += assembly.nonlinear @ np.array([flow(t, z[a] - z[b]) for a, b, flow in layout['nonlinear']])
+        return list(dy)
+
+    def node_heads(self, y) -> dict:
+        """
+        :return: heads of the nodes
+        """
+        return dict(zip(self.nodes, self.assembly().heads @ self._known(y)))
+
+    def diagnostics(self, t, h_pump, y, closed: dict | None = None):
+        heads = self.node_heads(y)
+        heads[GROUND] = 0.0
+        flows = {name: (heads[a] - heads[b]) / R for name, a, b, R in self.resistors}
+        flows.update({name: (heads[a] - heads[b]) / valve.resistance(self.modes[name])
+                      for name, a, b, valve in self.valves})
+        flows.update({name: flow(t, heads[a] - heads[b]) for name, a, b, flow in self.nonlinear})
+        return {**{f'head_{node}': heads[node] for node in self.nodes},
+                **{f'flow_{name}': flow for name, flow in flows.items()}}
+
+    def events(self, offset: int = 0) -> list:
+        """
+        :param offset: index of the first state of the netlist in the states of the system
+        :return: event functions (t, y) of the opening and closing of every valve, in the order of transitions
+        """
+        n = len(self.states)
+
+        def dh(y, k):
+            return self.assembly().valves[k] @ self._known(y[offset:offset + n])
+
+        functions = []
+        for k, (_, a, b, valve) in enumerate(self.valves):
+            @event(direction=1)
+            def opening(t, y, k=k, valve=valve):
+                return valve.event_open(dh(y, k))
+
+            @event(direction=-1)
+            def closing(t, y, k=k, valve=valve):
+                return valve.event_close(dh(y, k))
+
+            functions += [opening, closing]
+        return functions
+
+    def transitions(self) -> list:
+        """
+        :return: transitions of hybrid.simulate of the events
+        """
+        return [transition for name, *_ in self.valves for transition in self.modes.transitions(name)]
@@ -1,4 +1,82 @@
-from math import sin, cos, pi
+"""
+Normalized energy models of hydraulically actuated pouches and pouch arrays.
+
+Design variables are arrays of shape (..., 4) for a single pouch and (..., 6) for pouch arrays, such that stacked
+designs are evaluated in one call; loads broadcast against the leading dimensions x.shape[:-1].
+"""
+
+from math import pi, sin, cos
+import numpy as np
+from scipy.optimize import minimize
+
+def _arc(theta):
+    """
+    Shape functions of a circular pouch arc and their derivatives to theta:
+    f = sin(theta) / theta and g = (theta - sin(theta) cos(theta)) / 2 theta**2.
+
+    Below theta = 0.05 a Taylor expansion is used to avoid cancellation.
+
+    :param theta: half opening angle of the pouch arc
+    :return: f, df/dtheta, g, dg/dtheta
+    """
+    if np.ndim(theta) == 0:
+        return _arc_scalar(float(theta))
+    theta = np.asarray(theta, dtype=float)
+    small = theta < 0.05
+    t = np.where(small, 1.0, theta) # avoid division by zero in the exact branch
+    s, c = np.sin(t), np.cos(t)
+    t2 = theta**2
+
+    f = np.where(small, 1 - t2 / 6 + t2**2 / 120 - t2**3 / 5040, s / t)
+    df = np.where(small, theta * (-1 / 3 + t2 / 30 - t2**2 / 840), c / t - s / t**2)
+    g = np.where(small, theta * (1 / 3 - t2 / 15 + 2 * t2**2 / 315 - t2**3 / 2835), (t - s * c) / t**2 / 2)
+    dg = np.where(small, 1 / 3 - t2 / 5 + 2 * t2**2 / 63 - t2**3 / 405, -c**2 / t**2 + s * c / t**3)
+    return f, df, g, dg
+
+def _arc_scalar(theta: float):
+    """
+    _arc for a single design, with math instead of numpy to avoid the array overhead in scalar solves.
+    """
+    t2 = theta**2
+    if theta < 0.05:
+        return (1 - t2 / 6 + t2**2 / 120 - t2**3 / 5040,
+                theta * (-1 / 3 + t2 / 30 - t2**2 / 840),
+                theta * (1 / 3 - t2 / 15 + 2 * t2**2 / 315 - t2**3 / 2835),
+                1 / 3 - t2 / 5 + 2 * t2**2 / 63 - t2**3 / 405)
+    s, c = sin(theta), cos(theta)
+    return s / theta, c / theta - s / t2, (theta - s * c) / t2 / 2, -c**2 / t2 + s * c / t2 / theta
+
+def _arc_diff2(theta):
+    """
+    Second derivatives to theta of the shape functions f and g of _arc.
+
+    :param theta: half opening angle of the pouch arc
+    :return: d2f/dtheta2, d2g/dtheta2
+    """
+    if np.ndim(theta) == 0:
+        return _arc_diff2_scalar(float(theta))
+    theta = np.asarray(theta, dtype=float)
+    small = theta < 0.05
+    t = np.where(small, 1.0, theta)
+    s, c = np.sin(t), np.cos(t)
+    t2 = theta**2
+
+    ddf = np.where(small, -1 / 3 + t2 / 10 - t2**2 / 168 + t2**3 / 6480, -s / t - 2 * c / t**2 + 2 * s / t**3)
+    ddg = np.where(small, theta * (-2 / 5 + 8 * t2 / 63 - 2 * t2**2 / 135),
+                   2 * s * c / t**2 + (3 * c**2 - s**2) / t**3 - 3 * s * c / t**4)
+    return ddf, ddg
+
+def _arc_diff2_scalar(theta: float):
+    """
+    _arc_diff2 for a single design, with math instead of numpy.
+    """
+    t2 = theta**2
+    if theta < 0.05:
+        return (-1 / 3 + t2 / 10 - t2**2 / 168 + t2**3 / 6480,
+                theta * (-2 / 5 + 8 * t2 / 63 - 2 * t2**2 / 135))
+    s, c = sin(theta), cos(theta)
+    t3 = t2 * theta
+    return -s / theta - 2 * c / t2 + 2 * s / t3, 2 * s * c / t2 + (3 * c**2 - s**2) / t3 - 3 * s * c / t3 / theta
 
 class Pouch:
 
@@ -14,13 +92,34 @@ class Pouch:
         work_pressure = pressure * self.volume(x)
         return strain_energy - work_force - work_pressure
 
+    def energy_diff(self, x, force, pressure):
+        """
+        :param x: design variables x = (lh = l/L, hh = h/H, dh = d/D, theta)
+        :param force: normalized force Fn = FL/uLHD = F/uHD
+        :param pressure: normalized actuation pressure Pn = PL^2D/uLHD = PL/uH
+        :return: gradient of the normalized energy dEn/dx
+        """
+        force, pressure = np.asarray(force)[..., None], np.asarray(pressure)[..., None]
+        return self.strain_energy_diff(x) - force * self.width_diff(x) - pressure * self.volume_diff(x)
+
+    def energy_diff2(self, x, force, pressure):
+        """
+        :param x: design variables x = (lh = l/L, hh = h/H, dh = d/D, theta)
+        :param force: normalized force Fn = FL/uLHD = F/uHD
+        :param pressure: normalized actuation pressure Pn = PL^2D/uLHD = PL/uH
+        :return: Hessian of the normalized energy d2En/dx2
+        """
+        force, pressure = np.asarray(force)[..., None, None], np.asarray(pressure)[..., None, None]
+        return self.strain_energy_diff2(x) - force * self.width_diff2(x) - pressure * self.volume_diff2(x)
+
     @staticmethod
     def width(x):
         """
         :param x: design variables x = (lh = l/L, hh = h/H, dh = d/D, theta)
         :return: normalized width wh = w / L = lh sin(theta) / theta
         """
-        return x[0] * sin(x[3]) / x[3]
+        f, _, _, _ = _arc(x[..., 3])
+        return x[..., 0] * f
 
     @staticmethod
     def volume(x):
@@ -28,7 +127,8 @@ class Pouch:
         :param x: design variables x = (lh = l/L, hh = h/H, dh = d/D, theta)
         :return: normalized pouch volume vph = vp / DL**2 = 0.5 lh**2 dh (theta - sin(theta) cos(theta)) / theta**2
         """
-        return x[0] ** 2 * x[2] * (x[3] - sin(x[3]) * cos(x[3])) / x[3] ** 2 / 2
+        _, _, g, _ = _arc(x[..., 3])
+        return x[..., 0] ** 2 * x[..., 2] * g
 
     @staticmethod
     def mat_volume(x):
@@ -36,7 +136,7 @@ class Pouch:
         :param x: design variables x = (lh = l/L, hh = h/H, dh = d/D, theta)
         :return: normalized pouch material volume vmph = vmp / LHD = 2 lh hh dh
         """
-        return 2 * x[0] * x[1] * x[2]
+        return 2 * x[..., 0] * x[..., 1] * x[..., 2]
 
     @staticmethod
     def sed(x):
@@ -44,7 +144,93 @@ class Pouch:
         :param x: design variables x = (lh = l/L, hh = h/H, dh = d/D, theta)
         :return: normalized strain energy density Wh = W / u = 0.5 (x1**2 + x2**2 + x3**2 - 3)
         """
-        return (x[0]**2 + x[1]**2 + x[2]**2 - 3) / 2
+        return (x[..., 0]**2 + x[..., 1]**2 + x[..., 2]**2 - 3) / 2
+
+    @staticmethod
+    def width_diff(x):
+        """
+        :param x: design variables x = (lh = l/L, hh = h/H, dh = d/D, theta, ...)
+        :return: dwh/dx = (sin(theta) / theta, 0, 0, lh d(sin(theta) / theta)/dtheta, 0, ...)
+        """
+        f, df, _, _ = _arc(x[..., 3])
+        dw = np.zeros(np.shape(x))
+        dw[..., 0] = f
+        dw[..., 3] = x[..., 0] * df
+        return dw
+
+    @staticmethod
+    def volume_diff(x):
+        """
+        :param x: design variables x = (lh = l/L, hh = h/H, dh = d/D, theta, ...)
+        :return: dvph/dx = (2 lh dh g, 0, lh**2 g, lh**2 dh dg/dtheta, 0, ...), with g = vph / lh**2 dh
+        """
+        _, _, g, dg = _arc(x[..., 3])
+        dv = np.zeros(np.shape(x))
+        dv[..., 0] = 2 * x[..., 0] * x[..., 2] * g
+        dv[..., 2] = x[..., 0]**2 * g
+        dv[..., 3] = x[..., 0]**2 * x[..., 2] * dg
+        return dv
+
+    @staticmethod
+    def strain_energy_diff(x):
+        """
+        :param x: stretches x = (lh = l/L, hh = h/H, dh = d/D, ...)
+        :return: d(Wh vmph)/dx = vmph dWh/dx + Wh dvmph/dx, with dWh/dx = (lh, hh, dh) and dvmph/dx = 2 (hh dh, lh dh, lh hh)
+        """
+        sed = Pouch.sed(x)
+        mat_volume = Pouch.mat_volume(x)
+        du = np.zeros(np.shape(x))
+        du[..., 0] = x[..., 0] * mat_volume + 2 * sed * x[..., 1] * x[..., 2]
+        du[..., 1] = x[..., 1] * mat_volume + 2 * sed * x[..., 0] * x[..., 2]
+        du[..., 2] = x[..., 2] * mat_volume + 2 * sed * x[..., 0] * x[..., 1]
+        return du
+
+    @staticmethod
+    def width_diff2(x):
+        """
+        :param x: design variables x = (lh = l/L, hh = h/H, dh = d/D, theta, ...)
+        :return: d2wh/dx2, nonzero in the (lh, theta) block
+        """
+        _, df, _, _ = _arc(x[..., 3])
+        ddf, _ = _arc_diff2(x[..., 3])
+        dw = np.zeros(np.shape(x) + np.shape(x)[-1:])
+        dw[..., 0, 3] = dw[..., 3, 0] = df
+        dw[..., 3, 3] = x[..., 0] * ddf
+        return dw
+
+    @staticmethod
+    def volume_diff2(x):
+        """
+        :param x: design variables x = (lh = l/L, hh = h/H, dh = d/D, theta, ...)
+        :return: d2vph/dx2, nonzero in the (lh, dh, theta) block
+        """
+        _, _, g, dg = _arc(x[..., 3])
+        _, ddg = _arc_diff2(x[..., 3])
+        dv = np.zeros(np.shape(x) + np.shape(x)[-1:])
+        dv[..., 0, 0] = 2 * x[..., 2] * g
+        dv[..., 0, 2] = dv[..., 2, 0] = 2 * x[..., 0] * g
+        dv[..., 0, 3] = dv[..., 3, 0] = 2 * x[..., 0] * x[..., 2] * dg
+        dv[..., 2, 3] = dv[..., 3, 2] = x[..., 0]**2 * dg
+        dv[..., 3, 3] = x[..., 0]**2 * x[..., 2] * ddg
+        return dv
+
+    @staticmethod
+    def strain_energy_diff2(x):
+        """
+        :param x: stretches x = (lh = l/L, hh = h/H, dh = d/D, ...)
+        :return: d2(Wh vmph)/dx2 = vmph I + dWh/dx dvmph/dx^T + dvmph/dx dWh/dx^T + Wh d2vmph/dx2 in the stretch block
+        """
+        sed = Pouch.sed(x)
+        mat_volume = Pouch.mat_volume(x)
+        stretch = x[..., :3]
+        dvm = 2 * np.stack([x[..., 1] * x[..., 2], x[..., 0] * x[..., 2], x[..., 0] * x[..., 1]], axis=-1)
+        ddvm = 2 * np.stack([np.zeros_like(sed), x[..., 2], x[..., 1],
+                             x[..., 2], np.zeros_like(sed), x[..., 0],
+                             x[..., 1], x[..., 0], np.zeros_like(sed)], axis=-1).reshape(np.shape(sed) + (3, 3))
+        du = np.zeros(np.shape(x) + np.shape(x)[-1:])
+        du[..., :3, :3] = (mat_volume[..., None, None] * np.eye(3) + stretch[..., :, None] * dvm[..., None, :]
+                           + dvm[..., :, None] * stretch[..., None, :] + sed[..., None, None] * ddvm)
+        return du
 
 class PouchArray:
 
@@ -61,8 +247,8 @@ class PouchArray:
         :param pressure: normalized actuation pressure Pn = PL^2D/uLHD = PL/uH
         :return: normalized energy En = E / NuLHD
         """
-        xp = x[:4] # pouch variables xp = lh, hh, dh, theta
-        xs = [x[4], x[5], x[2]] # seal variables xs = lsh, th, dh
+        xp = x[..., :4] # pouch variables xp = lh, hh, dh, theta
+        xs = np.stack([x[..., 4], x[..., 5], x[..., 2]], axis=-1) # seal variables xs = lsh, th, dh
 
         strain_energy_pouch = Pouch.sed(xp) * Pouch.mat_volume(xp)
         strain_energy_seal = self.Lsh * Pouch.sed(xs) * Pouch.mat_volume(xs)
@@ -70,6 +256,85 @@ class PouchArray:
         work_pressure = pressure * Pouch.volume(xp)
         return strain_energy_pouch + strain_energy_seal - work_force - work_pressure
 
+    def energy_diff(self, x, force, pressure):
+        """
+        :param x: design variables x = (lh = l/L, hh = h/H, dh = d/D, theta, lsh = ls/Ls, th = t/H)
+        :param force: normalized force Fn = FL/uLHD = F/uHD
+        :param pressure: normalized actuation pressure Pn = PL^2D/uLHD = PL/uH
+        :return: gradient of the normalized energy dEn/dx
+        """
+        force, pressure = np.asarray(force)[..., None], np.asarray(pressure)[..., None]
+        return self.strain_energy_diff(x) - force * self.extension_diff(x) - pressure * Pouch.volume_diff(x)
+
+    def strain_energy_diff(self, x):
+        """
+        Gradient of the strain energy of pouch and seal.
+
+        :param x: design variables x = (lh = l/L, hh = h/H, dh = d/D, theta, lsh = ls/Ls, th = t/H)
+        :return: d(Wh vmph + Lsh Whs vmsh)/dx
+        """
+        xs = np.stack([x[..., 4], x[..., 5], x[..., 2]], axis=-1) # seal variables xs = lsh, th, dh
+
+        du = Pouch.strain_energy_diff(x)
+        dus = self.Lsh * Pouch.strain_energy_diff(xs)
+        du[..., 3] = 0.0
+        du[..., 4] = dus[..., 0]
+        du[..., 5] = dus[..., 1]
+        du[..., 2] += dus[..., 2]
+        return du
+
+    def seal_energy_diff(self, x):
+        """
+        Gradient of the strain energy of the seal per unit Lsh.
+
+        :param x: design variables x = (lh = l/L, hh = h/H, dh = d/D, theta, lsh = ls/Ls, th = t/H)
+        :return: d(Whs vmsh)/dx
+        """
+        xs = np.stack([x[..., 4], x[..., 5], x[..., 2]], axis=-1) # seal variables xs = lsh, th, dh
+        du = np.zeros(np.shape(x))
+        du[..., [4, 5, 2]] = Pouch.strain_energy_diff(xs)
+        return du
+
+    def parameter_diff(self, x, force, pressure, name: str):
+        """
+        Derivative of the gradient to a parameter at fixed normalized loads. The energy is linear in Lsh:
+
+        d2En/dxdLsh = d(Whs vmsh)/dx - Fn dlsh/dx
+
+        :param x: design variables x = (lh = l/L, hh = h/H, dh = d/D, theta, lsh = ls/Ls, th = t/H)
+        :param force: normalized force Fn = FL/uLHD = F/uHD
+        :param pressure: normalized actuation pressure Pn = PL^2D/uLHD = PL/uH
+        :param name: parameter, 'Lsh'
+        :return: d(dEn/dx)/dparameter
+        """
+        if name != 'Lsh':
+            raise ValueError(f"no derivative to parameter '{name}' of {type(self).__name__}")
+        return self.seal_energy_diff(x) - np.asarray(force)[..., None] * np.eye(6)[4]
+
+    def energy_diff2(self, x, force, pressure):
+        """
+        :param x: design variables x = (lh = l/L, hh = h/H, dh = d/D, theta, lsh = ls/Ls, th = t/H)
+        :param force: normalized force Fn = FL/uLHD = F/uHD
+        :param pressure: normalized actuation pressure Pn = PL^2D/uLHD = PL/uH
+        :return: Hessian of the normalized energy d2En/dx2
+        """
+        force, pressure = np.asarray(force)[..., None, None], np.asarray(pressure)[..., None, None]
+        return self.strain_energy_diff2(x) - force * self.extension_diff2(x) - pressure * Pouch.volume_diff2(x)
+
+    def strain_energy_diff2(self, x):
+        """
+        Hessian of the strain energy of pouch and seal.
+
+        :param x: design variables x = (lh = l/L, hh = h/H, dh = d/D, theta, lsh = ls/Ls, th = t/H)
+        :return: d2(Wh vmph + Lsh Whs vmsh)/dx2
+        """
+        xs = np.stack([x[..., 4], x[..., 5], x[..., 2]], axis=-1) # seal variables xs = lsh, th, dh
+        rows, columns = np.ix_([4, 5, 2], [4, 5, 2])
+
+        du = Pouch.strain_energy_diff2(x)
+        du[..., rows, columns] += self.Lsh * Pouch.strain_energy_diff2(xs)
+        return du
+
     def extension(self, x):
         """
         Normalized absolute change in array length.
@@ -77,7 +342,23 @@ class PouchArray:
         :param x: design variables x = (lh = l/L, hh = h/H, dh = d/D, theta, lsh = ls/Ls, th = t/H)
         :return: array extension wt = (wa - Wa) / FNL = wh + (lsh - 1)Lsh - 1
         """
-        return Pouch.width(x[:4]) + (x[4] - 1) * self.Lsh - 1
+        return Pouch.width(x[..., :4]) + (x[..., 4] - 1) * self.Lsh - 1
+
+    def extension_diff(self, x):
+        """
+        :param x: design variables x = (lh = l/L, hh = h/H, dh = d/D, theta, lsh = ls/Ls, th = t/H)
+        :return: dwt/dx = dwh/dx + Lsh dlsh/dx
+        """
+        de = Pouch.width_diff(x)
+        de[..., 4] = self.Lsh
+        return de
+
+    def extension_diff2(self, x):
+        """
+        :param x: design variables x = (lh = l/L, hh = h/H, dh = d/D, theta, lsh = ls/Ls, th = t/H)
+        :return: d2wt/dx2 = d2wh/dx2
+        """
+        return Pouch.width_diff2(x)
 
     def width(self, x):
         """
@@ -86,7 +367,7 @@ class PouchArray:
         :param x: design variables x = (lh = l/L, hh = h/H, dh = d/D, theta, lsh = ls/Ls, th = t/H)
         :return: wah = wa / Wa = (wh + lsh Lsh) / (1 + Lsh)
         """
-        return (Pouch.width(x[:4]) + x[4] * self.Lsh) / (1 + self.Lsh)
+        return (Pouch.width(x[..., :4]) + x[..., 4] * self.Lsh) / (1 + self.Lsh)
 
 class CylindricalPouchArray(PouchArray):
     def __init__(self, Lsh: float = 0.02, N: int = 10):
@@ -94,7 +375,7 @@ class CylindricalPouchArray(PouchArray):
         super().__init__(Lsh)
 
     def vcb(self, x):
-        return x[2] * (Pouch.width(x[:4]) + x[4] * self.Lsh)**2 / 4 / pi
+        return x[..., 2] * (Pouch.width(x[..., :4]) + x[..., 4] * self.Lsh)**2 / 4 / pi
 
     def ab(self, x):
         """
@@ -102,7 +383,25 @@ class CylindricalPouchArray(PouchArray):
 
         ab = Fh / Pc / NLD
         """
-        return x[2] * (Pouch.width(x[:4]) + x[4] * self.Lsh) / 2 / pi
+        return x[..., 2] * (Pouch.width(x[..., :4]) + x[..., 4] * self.Lsh) / 2 / pi
+
+    def ab_diff(self, x):
+        """
+        dab/dx = dh (dwh/dx + Lsh dlsh/dx) / 2 / pi + (wh + lsh Lsh) ddh/dx / 2 / pi
+        """
+        da = x[..., 2, None] * self.extension_diff(x) / 2 / pi
+        da[..., 2] = (Pouch.width(x[..., :4]) + x[..., 4] * self.Lsh) / 2 / pi
+        return da
+
+    def ab_diff2(self, x):
+        """
+        d2ab/dx2 = dh d2wh/dx2 / 2 / pi + (ddh/dx dwt/dx^T + dwt/dx ddh/dx^T) / 2 / pi
+        """
+        de = self.extension_diff(x)
+        da = x[..., 2, None, None] * self.extension_diff2(x) / 2 / pi
+        da[..., 2, :] += de / 2 / pi
+        da[..., :, 2] += de / 2 / pi
+        return da
 
     def cylinder_volume(self, x):
         """
@@ -111,7 +410,16 @@ class CylindricalPouchArray(PouchArray):
         vch = vc / DNL**2 = N vcb - vph / 2
         with vcb = dh (wh + lsh Lsh)**2 / 4 / pi
         """
-        return self.N * self.vcb(x) - Pouch.volume(x[:4]) / 2
+        return self.N * self.vcb(x) - Pouch.volume(x[..., :4]) / 2
+
+    def cylinder_volume_diff(self, x):
+        """
+        dvch/dx = N dvcb/dx - dvph/dx / 2
+        with dvcb/dx = ab dwt/dx + (wh + lsh Lsh)**2 / 4 / pi ddh/dx
+        """
+        dv = self.ab(x)[..., None] * self.extension_diff(x)
+        dv[..., 2] = (Pouch.width(x[..., :4]) + x[..., 4] * self.Lsh)**2 / 4 / pi
+        return self.N * dv - Pouch.volume_diff(x) / 2
 
     def energy(self, x, pressure_cylinder, pressure):
         """
@@ -120,8 +428,8 @@ class CylindricalPouchArray(PouchArray):
         :param pressure: normalized actuation pressure Pn = PL^2D/uLHD = PL/uH
         :return: normalized energy En = E / NuLHD
         """
-        xp = x[:4] # pouch variables xp = lh, hh, dh, theta
-        xs = [x[4], x[5], x[2]] # seal variables xs = lsh, th, dh
+        xp = x[..., :4] # pouch variables xp = lh, hh, dh, theta
+        xs = np.stack([x[..., 4], x[..., 5], x[..., 2]], axis=-1) # seal variables xs = lsh, th, dh
 
         strain_energy_pouch = Pouch.sed(xp) * Pouch.mat_volume(xp)
         strain_energy_seal = self.Lsh * Pouch.sed(xs) * Pouch.mat_volume(xs)
@@ -129,8 +437,111 @@ class CylindricalPouchArray(PouchArray):
         work_pressure = pressure * Pouch.volume(xp)
         return strain_energy_pouch + strain_energy_seal - work_force - work_pressure
 
+    def energy_diff(self, x, pressure_cylinder, pressure):
+        """
+        :param x: design variables x = (lh = l/L, hh = h/H, dh = d/D, theta, lsh = ls/Ls, th = t/H)
+        :param pressure_cylinder: normalized cylinder pressure Pcn = NL Pc / uH
+        :param pressure: normalized actuation pressure Pn = PL^2D/uLHD = PL/uH
+        :return: gradient of the normalized energy dEn/dx
+        """
+        pressure_cylinder, pressure = np.asarray(pressure_cylinder)[..., None], np.asarray(pressure)[..., None]
+        return self.strain_energy_diff(x) - pressure_cylinder * self.work_diff(x) - pressure * Pouch.volume_diff(x)
+
+    def work_diff(self, x):
+        """
+        Gradient of the work of the cylinder pressure per unit Pcn.
+
+        d(ab wt)/dx = wt dab/dx + ab dwt/dx
+        """
+        return self.extension(x)[..., None] * self.ab_diff(x) + self.ab(x)[..., None] * self.extension_diff(x)
+
+    def parameter_diff(self, x, pressure_cylinder, pressure, name: str):
+        """
+        Derivative of the gradient to a parameter.
+
+        Lsh, at fixed normalized loads: with wt = wh + (lsh - 1) Lsh - 1 and ab = dh (wh + lsh Lsh) / 2 / pi, both linear
+        in Lsh, the energy is quadratic in Lsh and
 
+        d2En/dxdLsh = d(Whs vmsh)/dx - Pcn ((lsh - 1) dab/dx + wt d2ab/dxdLsh + dh lsh / 2 / pi dwt/dx + ab dlsh/dx)
 
+        with d2ab/dxdLsh = (dh dlsh/dx + lsh ddh/dx) / 2 / pi.
+
+        N, continuous, at fixed cylinder pressure Pc: N enters the energy only through Pcn = NL Pc / uH, such that
+        d(dEn/dx)/dN = -Pcn / N d(ab wt)/dx. The cylinder volume depends on N directly, see cylinder_volume.
+
+        :param x: design variables x = (lh = l/L, hh = h/H, dh = d/D, theta, lsh = ls/Ls, th = t/H)
+        :param pressure_cylinder: normalized cylinder pressure Pcn = NL Pc / uH
+        :param pressure: normalized actuation pressure Pn = PL^2D/uLHD = PL/uH
+        :param name: parameter, 'Lsh' or 'N'
+        :return: d(dEn/dx)/dparameter
+        """
+        pressure_cylinder = np.asarray(pressure_cylinder)[..., None]
+        if name == 'N':
+            return -pressure_cylinder / self.N * self.work_diff(x)
+        if name != 'Lsh':
+            raise ValueError(f"no derivative to parameter '{name}' of {type(self).__name__}")
+        dh, lsh = x[..., 2, None], x[..., 4, None]
+        seal = np.eye(6)[4] # dlsh/dx
+        dab = (dh * seal + lsh * np.eye(6)[2]) / 2 / pi # d2ab/dxdLsh
+        dwork = ((lsh - 1) * self.ab_diff(x) + self.extension(x)[..., None] * dab
+                 + dh * lsh / 2 / pi * self.extension_diff(x) + self.ab(x)[..., None] * seal)
+        return self.seal_energy_diff(x) - pressure_cylinder * dwork
+
+    def energy_diff2(self, x, pressure_cylinder, pressure):
+        """
+        :param x: design variables x = (lh = l/L, hh = h/H, dh = d/D, theta, lsh = ls/Ls, th = t/H)
+        :param pressure_cylinder: normalized cylinder pressure Pcn = NL Pc / uH
+        :param pressure: normalized actuation pressure Pn = PL^2D/uLHD = PL/uH
+        :return: Hessian of the normalized energy d2En/dx2
+        """
+        pressure_cylinder = np.asarray(pressure_cylinder)[..., None, None]
+        pressure = np.asarray(pressure)[..., None, None]
+        ab, de, da = self.ab(x), self.extension_diff(x), self.ab_diff(x)
+        ddwork_force = (self.extension(x)[..., None, None] * self.ab_diff2(x) + ab[..., None, None] * self.extension_diff2(x)
+                        + da[..., :, None] * de[..., None, :] + de[..., :, None] * da[..., None, :])
+        return self.strain_energy_diff2(x) - pressure_cylinder * ddwork_force - pressure * Pouch.volume_diff2(x)
+
+    def reduced_diff(self, lh: float, theta: float, lsh: float, pressure_cylinder: float, pressure: float):
+        """
+        Derivatives of a single design in the reduced variables z = (lh, theta, lsh) of PouchEquilibriumSolver, in
+        closed form with scalar math. With hh = 1 / lh, dh = 1 and th = 1 / lsh the energy and cylinder volume are
+
+        En = lh**2 + 1/lh**2 - 2 + Lsh (lsh**2 + 1/lsh**2 - 2) - Pcn wc (wc - 1 - Lsh) / 2 / pi - Pn lh**2 g
+        vch = N wc**2 / 4 / pi - lh**2 g / 2
+
+        with wc = lh f + lsh Lsh and f, g the shape functions of the pouch arc, see _arc.
+
+        :param pressure_cylinder: normalized cylinder pressure Pcn = NL Pc / uH
+        :param pressure: normalized actuation pressure Pn = PL^2D/uLHD = PL/uH
+        :return: dEn/dz, d2En/dz2 as rows, d(dEn/dz)/dPcn, d(dEn/dz)/dPn, vch and dvch/dz, as tuples of floats
+        """
+        f, df, g, dg = _arc_scalar(theta)
+        ddf, ddg = _arc_diff2_scalar(theta)
+        Lsh = self.Lsh
+        wc = lh * f + lsh * Lsh
+        dw = (f, lh * df, Lsh) # dwc/dz
+        work = (2 * wc - 1 - Lsh) / 2 / pi # d(wc (wc - 1 - Lsh) / 2 / pi)/dwc, its second derivative is 1 / pi
+        dvp = (2 * lh * g, lh**2 * dg, 0.0) # dvph/dz
+
+        dpc = (-work * dw[0], -work * dw[1], -work * dw[2])
+        dp = (-dvp[0], -dvp[1], 0.0)
+        gradient = (2 * lh - 2 / lh**3 + pressure_cylinder * dpc[0] - pressure * dvp[0],
+                    pressure_cylinder * dpc[1] - pressure * dvp[1],
+                    Lsh * (2 * lsh - 2 / lsh**3) + pressure_cylinder * dpc[2])
+
+        pc = pressure_cylinder
+        h_ll = 2 + 6 / lh**4 - pc * f * f / pi - 2 * pressure * g
+        h_lt = -pc * (f * dw[1] / pi + work * df) - 2 * pressure * lh * dg
+        h_ls = -pc * f * Lsh / pi
+        h_tt = -pc * (dw[1]**2 / pi + work * lh * ddf) - pressure * lh**2 * ddg
+        h_ts = -pc * dw[1] * Lsh / pi
+        h_ss = Lsh * (2 + 6 / lsh**4) - pc * Lsh**2 / pi
+        hessian = ((h_ll, h_lt, h_ls), (h_lt, h_tt, h_ts), (h_ls, h_ts, h_ss))
+
+        scale = self.N * wc / 2 / pi
+        volume = self.N * wc**2 / 4 / pi - lh**2 * g / 2
+        volume_diff = (scale * dw[0] - dvp[0] / 2, scale * dw[1] - dvp[1] / 2, scale * dw[2])
+        return gradient, hessian, dpc, dp, volume, volume_diff
 
 class PouchArray2(PouchArray):
 
@@ -165,7 +576,7 @@ class PouchArray2(PouchArray):
         :param x:
         :return:
         """
-        return self.vh2vb * Pouch.volume(x[:4])
+        return self.vh2vb * Pouch.volume(x[..., :4])
 
     def energy(self, x, force, pressure):
         """
@@ -175,4 +586,275 @@ class PouchArray2(PouchArray):
         :return: normalized energy En = E / NuLHD
         """
 
-        return super().energy(x, force, self.pa2p * pressure)
\ No newline at end of file
+        return super().energy(x, force, self.pa2p * pressure)
+
+    def energy_diff(self, x, force, pressure):
+        """
+        :param x: design variables x = (lh = l/L, hh = h/H, dh = d/D, theta, lsh = ls/Ls, th = t/H)
+        :param force: normalized force Fn = FL/uLHD = F/uHD
+        :param pressure: normalized actuation pressure Pa = P Wa / uNH
+        :return: gradient of the normalized energy dEn/dx
+        """
+        return super().energy_diff(x, force, self.pa2p * pressure)
+
+    def parameter_diff(self, x, force, pressure, name: str):
+        """
+        Derivative of the gradient to a parameter at fixed normalized loads.
+
+        Lsh as of PouchArray. N, continuous, at fixed Lwh: N enters through Lsh = N Lwh / (1 - N Lwh) and the
+        pressure conversion pa2p = 1 - N Lwh, such that
+
+        d(dEn/dx)/dN = dLsh/dN d(dEn/dx)/dLsh + Lwh Pa dvph/dx, with dLsh/dN = Lwh / (1 - N Lwh)**2
+
+        :param x: design variables x = (lh = l/L, hh = h/H, dh = d/D, theta, lsh = ls/Ls, th = t/H)
+        :param force: normalized force Fn = FL/uLHD = F/uHD
+        :param pressure: normalized actuation pressure Pa = P Wa / uNH
+        :param name: parameter, 'Lsh' or 'N'
+        :return: d(dEn/dx)/dparameter
+        """
+        if name != 'N':
+            return super().parameter_diff(x, force, self.pa2p * pressure, name)
+        dlsh = self.Lwh / (1 - self.N * self.Lwh)**2
+        return (dlsh * super().parameter_diff(x, force, self.pa2p * pressure, 'Lsh')
+                + self.Lwh * np.asarray(pressure)[..., None] * Pouch.volume_diff(x))
+
+    def energy_diff2(self, x, force, pressure):
+        """
+        :param x: design variables x = (lh = l/L, hh = h/H, dh = d/D, theta, lsh = ls/Ls, th = t/H)
+        :param force: normalized force Fn = FL/uLHD = F/uHD
+        :param pressure: normalized actuation pressure Pa = P Wa / uNH
+        :return: Hessian of the normalized energy d2En/dx2
+        """
+        return super().energy_diff2(x, force, self.pa2p * pressure)
+
+class PouchEquilibriumSolver:
+    """
+    Equilibrium solver in reduced coordinates.
+
+    The incompressibility constraints lh hh dh = 1 and lsh th dh = 1 together with dh = 1 are eliminated exactly
+    via hh = 1 / lh and th = 1 / lsh, such that the constrained problem in x = (lh, hh, dh, theta, lsh, th)
+    becomes a bound-constrained problem in z = (lh, theta, lsh), or z = (lh, theta) for a single pouch.
+    """
+    def __init__(self, model: Pouch | PouchArray | None = None,
+                 method: str = 'L-BFGS-B',
+                 tol: float = 1e-15,
+                 gtol: float = 1e-8,
+                 lower: float = 1e-6):
+        """
+        :param model: pouch (array) model providing energy(x, load, pressure) and energy_diff(x, load, pressure), by
+            default a CylindricalPouchArray
+        :param method: bound-constrained minimization method of scipy.optimize.minimize
+        :param tol: tolerance on the relative energy reduction and projected gradient
+        :param gtol: projected gradient below which a result is accepted, whether or not the optimizer converged;
+            results of the optimizer above it are refined by newton
+        :param lower: lower bound on the stretches lh and lsh
+        """
+        model = CylindricalPouchArray() if model is None else model
+        self.model = model
+        self.method = method
+        self.tol = tol
+        self.gtol = gtol
+        self.array = isinstance(model, PouchArray)
+        self.bounds = [(lower, None), (0, pi)] + ([(lower, None)] if self.array else [])
+        self.z0 = np.array([1, 1e-6, 1] if self.array else [1, 1e-6], dtype=float)
+
+    def expand(self, z):
+        """
+        :param z: reduced variables z = (lh, theta, lsh), array of shape (..., 3)
+        :return: design variables x = (lh, 1 / lh, 1, theta, lsh, 1 / lsh), array of shape (..., 6)
+        """
+        z = np.asarray(z, dtype=float)
+        lh, theta = z[..., 0], z[..., 1]
+        if self.array:
+            return np.stack([lh, 1 / lh, np.ones_like(lh), theta, z[..., 2], 1 / z[..., 2]], axis=-1)
+        return np.stack([lh, 1 / lh, np.ones_like(lh), theta], axis=-1)
+
+    def reduce(self, x):
+        """
+        :param x: design variables x = (lh, hh, dh, theta, lsh, th), array of shape (..., 6)
+        :return: reduced variables z = (lh, theta, lsh), array of shape (..., 3)
+        """
+        x = np.asarray(x, dtype=float)
+        return x[..., [0, 3, 4]] if self.array else x[..., [0, 3]]
+
+    def energy(self, z, load, pressure):
+        return self.model.energy(self.expand(z), load, pressure)
+
+    def energy_diff(self, z, load, pressure):
+        return self.chain(z, self.model.energy_diff(self.expand(z), load, pressure))
+
+    def chain(self, z, dx):
+        """
+        Chain rule d/dz = d/dx dx/dz, with dhh/dlh = -1 / lh**2 and dth/dlsh = -1 / lsh**2.
+        """
+        dz = [dx[..., 0] - dx[..., 1] / z[..., 0]**2, dx[..., 3]]
+        if self.array:
+            dz.append(dx[..., 4] - dx[..., 5] / z[..., 2]**2)
+        return np.stack(dz, axis=-1)
+
+    def energy_diff2(self, z, load, pressure):
+        """
+        d2En/dz2 = dx/dz^T d2En/dx2 dx/dz + dEn/dhh d2hh/dlh2 + dEn/dth d2th/dlsh2,
+        with d2hh/dlh2 = 2 / lh**3 and d2th/dlsh2 = 2 / lsh**3.
+        """
+        z = np.asarray(z, dtype=float)
+        x = self.expand(z)
+        dx = self.model.energy_diff(x, load, pressure)
+        jacobian = self.jacobian(z)
+        dz = np.swapaxes(jacobian, -1, -2) @ self.model.energy_diff2(x, load, pressure) @ jacobian
+        dz[..., 0, 0] += 2 * dx[..., 1] / z[..., 0]**3
+        if self.array:
+            dz[..., 2, 2] += 2 * dx[..., 5] / z[..., 2]**3
+        return dz
+
+    def jacobian(self, z):
+        """
+        :param z: reduced variables z = (lh, theta, lsh)
+        :return: dx/dz, array of shape (..., 6, 3)
+        """
+        z = np.asarray(z, dtype=float)
+        nz = z.shape[-1]
+        jacobian = np.zeros(z.shape[:-1] + (2 * nz, nz))
+        jacobian[..., 0, 0] = 1
+        jacobian[..., 1, 0] = -1 / z[..., 0]**2
+        jacobian[..., 3, 1] = 1
+        if self.array:
+            jacobian[..., 4, 2] = 1
+            jacobian[..., 5, 2] = -1 / z[..., 2]**2
+        return jacobian
+
+    def load_diff(self, z):
+        """
+        Derivatives of dEn/dz to the loads. The energies are linear in the loads, such that
+        d(dEn/dz)/dload = dEn/dz(z, 1, 0) - dEn/dz(z, 0, 0).
+
+        :param z: reduced variables z = (lh, theta, lsh)
+        :return: d(dEn/dz)/dload, d(dEn/dz)/dpressure
+        """
+        unloaded = self.energy_diff(z, 0.0, 0.0)
+        return self.energy_diff(z, 1.0, 0.0) - unloaded, self.energy_diff(z, 0.0, 1.0) - unloaded
+
+    def parameter_diff(self, z, load, pressure, name: str):
+        """
+        Derivative of dEn/dz to a model parameter, in closed form by the model, see e.g.
+        CylindricalPouchArray.parameter_diff for the parameters and the loads held fixed.
+
+        :param name: model parameter, e.g. 'Lsh' or 'N', the latter continuous
+        :return: d(dEn/dz)/dparameter
+        """
+        if not hasattr(self.model, 'parameter_diff'):
+            raise ValueError(f"no derivative to parameter '{name}' of {type(self.model).__name__}")
+        z = np.asarray(z, dtype=float)
+        return self.chain(z, self.model.parameter_diff(self.expand(z), load, pressure, name))
+
+    def sensitivities(self, z, load, pressure, parameters=()):
+        """
+        Derivatives of the equilibrium z*(load, pressure) by the implicit function theorem,
+        dz*/dp = -(d2En/dz2)^-1 d(dEn/dz)/dp, with one batched linear solve for all points and derivatives.
+
+        Derivatives of the design variables follow as dx*/dp = dx/dz dz*/dp, see jacobian,
+        and those of derived quantities by the chain rule, e.g. dvc/dPc = dvc/dx dx*/dPc.
+
+        :param z: equilibria in reduced variables, array of shape (..., nz)
+        :param load: normalized force or cylinder pressure
+        :param pressure: normalized actuation pressure
+        :param parameters: model parameters to differentiate to, see parameter_diff
+        :return: dz*/dload, dz*/dpressure and dz*/dparameter for every parameter, each of shape (..., nz)
+        """
+        z = np.asarray(z, dtype=float)
+        rhs = list(self.load_diff(z)) + [self.parameter_diff(z, load, pressure, name) for name in parameters]
+        dz = -np.linalg.solve(self.energy_diff2(z, load, pressure), np.stack(rhs, axis=-1))
+        return tuple(np.moveaxis(dz, -1, 0))
+
+    def __call__(self, load: float, pressure: float, x0=None):
+        """
+        :param load: normalized force or cylinder pressure, first load argument of model.energy
+        :param pressure: normalized actuation pressure
+        :param x0: initial (warm start) design variables, by default the undeformed state
+        :return: scipy.optimize.OptimizeResult with design variables x and reduced variables z
+        """
+        z0 = self.z0 if x0 is None else self.reduce(x0)
+        result = minimize(self.energy, z0, args=(load, pressure), jac=self.energy_diff, bounds=self.bounds,
+                          method=self.method, tol=self.tol)
+        result.z = result.x
+        if np.all(np.isfinite(result.z)) and self.projected_gradient(result.z, load, pressure) > self.gtol:
+            # the optimizer also stops on the relative energy reduction, above gtol Newton refines the stationarity
+            result.z = self.newton(load, pressure, z0=result.z, fallback=False)[0]
+        result.x = self.expand(result.z)
+        result.success = bool(self.projected_gradient(result.z, load, pressure) <= self.gtol)
+        return result
+
+    def newton(self, load, pressure, z0=None, maxiter: int = 100, fallback: bool = True):
+        """
+        Damped Newton iteration on the stationarity conditions dEn/dz = 0 of all load points at once.
+
+        Every iteration solves the small systems of all points with one batched np.linalg.solve. The Hessian is shifted
+        to positive definite where needed, such that every step is a descent direction, and the step of every point is
+        restricted to the bounds and backtracked on the energy until it decreases sufficiently. Points leave the
+        iteration once their projected gradient is below gtol; points that do not converge are solved by the optimizer,
+        warm-started from their last iterate.
+
+        :param load: normalized forces or cylinder pressures, broadcast against pressure
+        :param pressure: normalized actuation pressures
+        :param z0: initial reduced variables of shape (nz,) or (..., nz), by default the undeformed state
+        :param maxiter: maximum number of Newton iterations
+        :param fallback: solve the points that did not converge with the optimizer
+        :return: reduced variables z of shape (..., nz), design variables x and mask of converged points
+        """
+        load, pressure = np.broadcast_arrays(np.asarray(load, dtype=float), np.asarray(pressure, dtype=float))
+        nz = len(self.z0)
+        z = np.array(np.broadcast_to(self.z0 if z0 is None else z0, load.shape + (nz,)), dtype=float)
+        lower, upper = np.nan_to_num(np.array(self.bounds, dtype=float), nan=np.inf).T
+
+        active = np.flatnonzero(self.projected_gradient(z, load, pressure).reshape(-1) > self.gtol)
+        flat_z, flat_load, flat_pressure = z.reshape(-1, nz), load.reshape(-1), pressure.reshape(-1)
+        for _ in range(maxiter):
+            if not len(active):
+                break
+            za, la, pa = flat_z[active], flat_load[active], flat_pressure[active]
+            g = self.energy_diff(za, la, pa)
+            H = self.energy_diff2(za, la, pa)
+            shift = np.maximum(0, 1e-8 - np.linalg.eigvalsh(H)[:, 0])
+            dz = -np.linalg.solve(H + shift[:, None, None] * np.eye(nz), g[..., None])[..., 0]
+
+            # largest step within the bounds
+            with np.errstate(divide='ignore', invalid='ignore'):
+                room = np.where(dz < 0, (lower - za) / dz, np.where(dz > 0, (upper - za) / dz, np.inf))
+            alpha = np.minimum(1.0, np.min(room, axis=-1))
+
+            # backtracking line search with per-point masks, within round-off of the energy close to convergence
+            energy = self.energy(za, la, pa)
+            energy = energy + 4 * np.finfo(float).eps * (1 + np.abs(energy))
+            slope = np.sum(g * dz, axis=-1)
+            searching = np.ones(len(active), dtype=bool)
+            for _ in range(30):
+                trial = np.clip(za[searching] + alpha[searching, None] * dz[searching], lower, upper)
+                decrease = (self.energy(trial, la[searching], pa[searching])
+                            <= energy[searching] + 1e-4 * alpha[searching] * slope[searching])
+                index = np.flatnonzero(searching)
+                za[index[decrease]] = trial[decrease]
+                searching[index[decrease]] = False
+                alpha[searching] /= 2
+                if not np.any(searching):
+                    break
+
+            flat_z[active] = za
+            stalled = searching
+            converged = self.projected_gradient(za, la, pa) <= self.gtol
+            active = active[~(converged | stalled)]
+
+        converged = self.projected_gradient(z, load, pressure) <= self.gtol
+        if fallback:
+            for index in map(tuple, np.argwhere(~converged)):
+                result = self(load[index], pressure[index], x0=self.expand(z[index]))
+                z[index] = result.z
+                converged[index] = result.success
+        return z, self.expand(z), converged
+
+    def projected_gradient(self, z, load, pressure):
+        """
+        Stationarity measure of the bound-constrained problem, max |z - clip(z - dEn/dz)|.
+        """
+        lower, upper = np.array(self.bounds, dtype=float).T
+        dz = self.energy_diff(z, load, pressure)
+        return np.max(np.abs(z - np.clip(z - dz, lower, np.nan_to_num(upper, nan=np.inf))), axis=-1)
@@ -0,0 +1,111 @@
+"""
+Immutable parameter records and compact vectors of discrete modes.
+
+Models that switch, e.g. valves, keep their parameters in a frozen record and their discrete state in a Modes vector
+owned by the system that simulates them. Records can therefore be shared, e.g. as default arguments or between
+threads, without copying; they pickle as a tuple of their fields; and records of one type stack into a record of
+arrays, i.e. a structure-of-arrays batch that vectorized models evaluate at once:
+
+    valve = Valve(Ropen=1, Rclosed=1e4)
+    batch = Valve.stack([valve, valve.replace(Ropen=2)])
+    batch.resistance(np.array([1, 1]))  # array([1., 2.])
+"""
+
+import numpy as np
+
+class Parameters:
+    """
+    Frozen record with __slots__. Subclasses list the arguments of their __init__ in __slots__, in order, and assign
+    each of them once in __init__.
+    """
+    __slots__ = ()
+
+    def __setattr__(self, name, value):
+        if hasattr(self, name):
+            raise AttributeError(f'{type(self).__name__} is immutable, use replace')
+        object.__setattr__(self, name, value)
+
+    def __delattr__(self, name):
+        raise AttributeError(f'{type(self).__name__} is immutable')
+
+    @classmethod
+    def fields(cls) -> tuple[str, ...]:
+        return tuple(name for c in reversed(cls.__mro__) for name in c.__dict__.get('__slots__', ()))
+
+    def values(self) -> tuple:
+        return tuple(getattr(self, name) for name in self.fields())
+
+    def replace(self, **changes):
+        """
+        :return: copy of the record with the given fields changed
+        """
+        return type(self)(**{**dict(zip(self.fields(), self.values())), **changes})
+
+    @classmethod
+    def stack(cls, records):
+        """
+        :param records: records of this type
+        :return: record with the arrays of the fields of the records
+        """
+        return cls(*(np.array(values) for values in zip(*(record.values() for record in records))))
+
+    def __reduce__(self):
+        return type(self), self.values()
+
+    def __eq__(self, other):
+        return type(self) is type(other) and all(np.array_equal(a, b) for a, b in zip(self.values(), other.values()))
+
+    def __hash__(self):
+        return hash((type(self), self.values()))
+
+    def __repr__(self):
+        return f'{type(self).__name__}({", ".join(f"{n}={v!r}" for n, v in zip(self.fields(), self.values()))})'
+
+class Modes:
+    """
+    Discrete states of the switching components of a system, one int8 per named component.
+    """
+    __slots__ = ('index', 'values')
+
+    def __init__(self, *names: str, initial: int = 0):
+        self.index = {name: i for i, name in enumerate(names)}
+        self.values = np.full(len(names), initial, dtype=np.int8)
+
+    def __getitem__(self, name: str) -> int:
+        return self.values[self.index[name]]
+
+    def __setitem__(self, name: str, value: int):
+        self.values[self.index[name]] = value
+
+    def setter(self, name: str, value: int):
+        """
+        :return: function setting the mode of the component, e.g. a transition of hybrid.simulate
+        """
+        return lambda: self.__setitem__(name, value)
+
+    def transitions(self, name: str, states=(('open', 1), ('close', 0))) -> list:
+        """
+        :param name: name of the component
+        :param states: names of the transitions and the modes they lead to
+        :return: transitions of hybrid.simulate of the component, each enabled only in the modes it leaves, such that
+            e.g. an open valve only monitors its closing
+        """
+        return [(name, transition, self.setter(name, value), lambda value=value: self[name] != value)
+                for transition, value in states]
+
+    def copy(self) -> 'Modes':
+        modes = Modes()
+        modes.index = self.index
+        modes.values = self.values.copy()
+        return modes
+
+    def __reduce__(self):
+        return _modes, (tuple(self.index), self.values)
+
+    def __repr__(self):
+        return f'Modes({", ".join(f"{n}={v}" for n, v in zip(self.index, self.values))})'
+
+def _modes(names, values):
+    modes = Modes(*names)
+    modes.values[:] = values
+    return modes
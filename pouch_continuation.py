@@ -0,0 +1,219 @@
+"""
+Pseudo-arclength continuation of pouch equilibria.
+
+Equilibria are traced as the curve G(z, lambda) = dEn/dz = 0 in the reduced coordinates of PouchEquilibriumSolver,
+with lambda the load or the actuation pressure. Every step consists of a tangent predictor and a Newton corrector on
+the arclength-augmented system, so the curve is followed through limit points where a load-controlled minimizer
+snaps to another branch. Only the first point requires a call to the optimizer.
+"""
+
+import numpy as np
+from normalized_pouch import PouchEquilibriumSolver
+
+class Branch:
+    """
+    Equilibrium curve with stability and branch structure.
+    """
+    def __init__(self, parameter: int, fixed: float, lam, z, x, stable, folds, status: str,
+                 optimizer_calls: int, newton_iterations: int):
+        """
+        :param parameter: continuation parameter, 0 for the load and 1 for the actuation pressure
+        :param fixed: value of the other load
+        :param lam: continuation parameter along the curve
+        :param z: reduced variables along the curve
+        :param x: design variables along the curve
+        :param stable: True where the reduced Hessian is positive definite (local energy minimum)
+        :param folds: list of limit points (index, lambda, z), with the fold between index and index + 1
+        :param status: reason the continuation stopped
+        :param optimizer_calls: number of calls to the optimizer
+        :param newton_iterations: number of corrector iterations, i.e. linear solves besides the tangents
+        """
+        self.parameter = parameter
+        self.fixed = fixed
+        self.lam = lam
+        self.z = z
+        self.x = x
+        self.stable = stable
+        self.folds = folds
+        self.status = status
+        self.optimizer_calls = optimizer_calls
+        self.newton_iterations = newton_iterations
+
+    def segments(self):
+        """
+        :return: list of (start, stop, stable) index ranges with uniform stability
+        """
+        change = np.flatnonzero(np.diff(self.stable.astype(int))) + 1
+        bounds = np.concatenate(([0], change, [len(self.stable)]))
+        return [(int(a), int(b), bool(self.stable[a])) for a, b in zip(bounds[:-1], bounds[1:])]
+
+    def bistable(self):
+        """
+        Parameter intervals in which two or more stable segments coexist.
+
+        :return: list of (lambda_min, lambda_max)
+        """
+        intervals = [(np.min(self.lam[a:b]), np.max(self.lam[a:b])) for a, b, stable in self.segments() if stable]
+        overlaps = []
+        for i, (a0, a1) in enumerate(intervals):
+            for b0, b1 in intervals[i + 1:]:
+                low, high = max(a0, b0), min(a1, b1)
+                if low < high:
+                    overlaps.append((low, high))
+        return overlaps
+
+    def __repr__(self):
+        return (f"Branch({len(self.lam)} points, {len(self.folds)} folds, bistable={self.bistable()}, "
+                f"status='{self.status}', optimizer_calls={self.optimizer_calls}, "
+                f"newton_iterations={self.newton_iterations})")
+
+class PouchContinuation:
+    """
+    Pseudo-arclength continuation with adaptive step length and fold detection.
+    """
+    def __init__(self, solver: PouchEquilibriumSolver | None = None,
+                 ds: float = 0.02,
+                 ds_min: float = 1e-8,
+                 ds_max: float = 0.25,
+                 tol: float = 1e-10,
+                 max_newton: int = 8,
+                 max_steps: int = 10000,
+                 zmax: float = 20.0,
+                 alignment: float = 0.95):
+        """
+        :param solver: reduced-coordinate solver providing the energy derivatives, by default of a CylindricalPouchArray
+        :param ds: initial arclength step
+        :param ds_min: step below which the continuation stops
+        :param ds_max: maximum arclength step
+        :param tol: tolerance on the Newton update and on the equilibrium residual
+        :param max_newton: maximum number of corrector iterations per step
+        :param max_steps: maximum number of continuation steps
+        :param zmax: stretch at which the branch is considered unbounded
+        :param alignment: minimum cosine between consecutive tangents of an accepted step
+        """
+        self.solver = PouchEquilibriumSolver() if solver is None else solver
+        self.ds = ds
+        self.ds_min = ds_min
+        self.ds_max = ds_max
+        self.tol = tol
+        self.max_newton = max_newton
+        self.max_steps = max_steps
+        self.zmax = zmax
+        self.alignment = alignment
+        self.lower, self.upper = np.nan_to_num(np.array(self.solver.bounds, dtype=float), nan=np.inf).T
+
+    def loads(self, lam, fixed, parameter):
+        return (lam, fixed) if parameter == 0 else (fixed, lam)
+
+    def residual(self, y, fixed, parameter):
+        """
+        :param y: augmented unknowns y = (z, lambda)
+        :return: equilibrium residual G = dEn/dz and its Jacobian [dG/dz, dG/dlambda]
+        """
+        z, lam = y[:-1], y[-1]
+        load, pressure = self.loads(lam, fixed, parameter)
+        jacobian = np.column_stack((self.solver.energy_diff2(z, load, pressure), self.solver.load_diff(z)[parameter]))
+        return self.solver.energy_diff(z, load, pressure), jacobian
+
+    def tangent(self, y, t, fixed, parameter):
+        """
+        Unit null vector of [dG/dz, dG/dlambda], oriented along the previous tangent t.
+        """
+        _, jacobian = self.residual(y, fixed, parameter)
+        t_new = np.linalg.solve(np.vstack((jacobian, t)), np.eye(len(y))[-1])
+        return t_new / np.linalg.norm(t_new)
+
+    def correct(self, y_pred, t, fixed, parameter, natural: bool = False):
+        """
+        Newton corrector on G(z, lambda) = 0 with the arclength condition t.(y - y_pred) = 0,
+        or with lambda fixed if natural.
+
+        :return: corrected unknowns and number of iterations, or None if the corrector failed
+        """
+        y = y_pred.copy()
+        constraint = np.eye(len(y))[-1] if natural else t
+        for iteration in range(1, self.max_newton + 1):
+            g, jacobian = self.residual(y, fixed, parameter)
+            dy = np.linalg.solve(np.vstack((jacobian, constraint)), -np.append(g, constraint @ (y - y_pred)))
+            y += dy
+            if not np.all(np.isfinite(y)):
+                return None
+            # the flat state theta = 0 is a symmetry plane of the energy, round-off may push theta just below it
+            y[:-1] = np.clip(y[:-1], self.lower, self.upper)
+            if np.max(np.abs(dy)) <= self.tol * (1 + np.max(np.abs(y))):
+                g, _ = self.residual(y, fixed, parameter)
+                if np.max(np.abs(g)) <= 10 * self.tol:
+                    return y, iteration
+        return None
+
+    def __call__(self, start: float, stop: float, fixed: float, parameter: int = 0, x0=None):
+        """
+        :param start: initial value of the continuation parameter
+        :param stop: final value of the continuation parameter
+        :param fixed: value of the other load
+        :param parameter: continuation parameter, 0 for the load and 1 for the actuation pressure
+        :param x0: initial guess of the first equilibrium, by default the undeformed state
+        :return: Branch
+        """
+        direction = np.sign(stop - start)
+        result = self.solver(*self.loads(start, fixed, parameter), x0=x0)
+        y = np.append(result.z, start)
+        if not result.success:
+            return Branch(parameter, fixed, y[-1:], y[None, :-1], result.x[None], np.zeros(1, dtype=bool), [],
+                          'no equilibrium at start', 1, 0)
+        t = self.tangent(y, direction * np.eye(len(y))[-1], fixed, parameter)
+
+        points, folds = [y], []
+        ds, newton_iterations, status = self.ds, 0, 'max steps'
+        for _ in range(self.max_steps):
+            corrected = self.correct(y + ds * t, t, fixed, parameter)
+            if corrected is None:
+                ds /= 2
+                if ds < self.ds_min:
+                    status = 'step size'
+                    break
+                continue
+
+            y_new, iterations = corrected
+            newton_iterations += iterations
+            if direction * (y_new[-1] - stop) >= 0:
+                # end point: interpolate to lambda = stop and correct at fixed lambda
+                a = (stop - y[-1]) / (y_new[-1] - y[-1])
+                end = self.correct(y + a * (y_new - y), t, fixed, parameter, natural=True)
+                if end is None:
+                    # the interpolated point is no equilibrium to keep, approach the end in shorter steps
+                    ds /= 2
+                    if ds < self.ds_min:
+                        status = 'step size'
+                        break
+                    continue
+                newton_iterations += end[1]
+                points.append(end[0])
+                status = 'stop'
+                break
+
+            t_new = self.tangent(y_new, t, fixed, parameter)
+            jumped = np.sign(t[-1]) == np.sign(t_new[-1]) != np.sign(y_new[-1] - y[-1])
+            if (t @ t_new < self.alignment or jumped) and ds > self.ds_min:
+                # the tangent turned too far, or lambda moved against both tangents, within one step:
+                # the corrector may have jumped to another branch or across an asymptote
+                ds /= 2
+                continue
+            if np.sign(t_new[-1]) != np.sign(t[-1]):
+                # limit point: dlambda/ds changes sign, locate by linear interpolation of the tangent
+                a = t[-1] / (t[-1] - t_new[-1])
+                fold = y + a * (y_new - y)
+                folds.append((len(points) - 1, fold[-1], fold[:-1]))
+
+            points.append(y_new)
+            y, t = y_new, t_new
+            if np.max(y[:-1]) > self.zmax:
+                status = 'unbounded'
+                break
+            ds = min(self.ds_max, ds * (1.5 if iterations <= 2 else 0.5 if iterations >= 5 else 1.0))
+
+        points = np.array(points)
+        z, lam = points[:, :-1], points[:, -1]
+        load, pressure = self.loads(lam, fixed, parameter)
+        stable = np.linalg.eigvalsh(self.solver.energy_diff2(z, load, pressure))[:, 0] > 0
+        return Branch(parameter, fixed, lam, z, self.solver.expand(z), stable, folds, status, 1, newton_iterations)
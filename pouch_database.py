@@ -0,0 +1,264 @@
+"""
+Persistent store of pouch equilibria.
+
+Equilibria are indexed by the model, i.e. its class and parameters such as (Lsh, N), and by the loads (load, pressure).
+Every model has its own directory, in which every insertion adds a chunk of two .npy files: the loads of shape (n, 2)
+and the design variables of shape (n, nx). Chunks are never rewritten, so several scripts may insert into the same
+store, and they are read memory-mapped. A sorted index of the keys of all chunks, stored alongside and updated by every
+insertion, is binary searched, such that a lookup only touches the rows it returns.
+"""
+
+import os
+import json
+import time
+import pickle
+import numpy as np
+
+from pouch_sweeps import PouchSweep
+
+class PouchDatabase:
+    """
+    On-disk equilibrium store with incremental insertion, nearest-neighbour warm starts and lazy reads.
+    """
+    def __init__(self, path: str = 'pouch_equilibria', digits: int = 12):
+        """
+        :param path: root directory of the store
+        :param digits: decimals of the loads used to identify a point
+        """
+        self.path = path
+        self.digits = digits
+        self._indices = {}
+        self._states = {}
+
+    @staticmethod
+    def parameters(model):
+        """
+        :return: class name and scalar parameters of the model, e.g. ('CylindricalPouchArray', {'Lsh': 0.1, 'N': 8})
+        """
+        return type(model).__name__, {k: v.item() if isinstance(v, np.generic) else v
+                                      for k, v in sorted(vars(model).items()) if np.isscalar(v)}
+
+    def directory(self, model):
+        name, parameters = self.parameters(model)
+        return os.path.join(self.path, '_'.join([name] + [f'{k}={v!r}' for k, v in parameters.items()]))
+
+    def _keys(self, loads, pressures):
+        return np.round(np.stack(np.broadcast_arrays(loads, pressures), axis=-1), self.digits)
+
+    @staticmethod
+    def _sortable(keys):
+        # complex numbers sort by their real part first, so (load, pressure) pairs sort lexicographically
+        return keys[..., 0] + 1j * keys[..., 1]
+
+    def index(self, model):
+        """
+        Sorted key index of the model: the keys of all stored points, and the chunk and row of each.
+
+        The index is stored with the chunks as index.npz, rewritten by every insertion. Chunks it does not cover yet,
+        e.g. inserted concurrently by another script, are added by reading their loads only.
+
+        :return: names of the chunks, keys as complex numbers load + i pressure in ascending order, and per key the
+            position of its chunk in the names and its row in the chunk
+        """
+        directory = self.directory(model)
+        index = self._indices.get(directory)
+        if index is None:
+            index = [], np.empty(0, dtype=complex), np.empty(0, dtype=int), np.empty(0, dtype=int)
+            path = os.path.join(directory, 'index.npz')
+            if os.path.exists(path):
+                with np.load(path) as data:
+                    index = list(data['names']), data['keys'], data['chunk'], data['row']
+        if os.path.isdir(directory):
+            names = set(index[0])
+            for file in sorted(os.listdir(directory)):
+                if file.startswith('loads_') and file not in names:
+                    tag = file[len('loads_'):]
+                    if os.path.exists(os.path.join(directory, 'state_' + tag)):
+                        keys = np.round(np.load(os.path.join(directory, file)), self.digits)
+                        index = self._merge(index, tag, keys)
+        self._indices[directory] = index
+        return index
+
+    def _merge(self, index, tag: str, keys):
+        """
+        :return: index with the keys of a new chunk
+        """
+        names, sorted_keys, chunk, row = index
+        merged = np.concatenate([sorted_keys, self._sortable(keys)])
+        order = np.argsort(merged, kind='stable')
+        return ([*names, 'loads_' + tag], merged[order], np.concatenate([chunk, np.full(len(keys), len(names))])[order],
+                np.concatenate([row, np.arange(len(keys))])[order])
+
+    def _state(self, directory: str, name: str):
+        """
+        :return: memory-mapped equilibria of the chunk with loads file name
+        """
+        path = os.path.join(directory, 'state_' + name[len('loads_'):])
+        if path not in self._states:
+            self._states[path] = np.load(path, mmap_mode='r')
+        return self._states[path]
+
+    def chunks(self, model):
+        """
+        Memory-mapped chunks of the model, as a list of (loads, state); chunks written by others are picked up.
+        """
+        directory = self.directory(model)
+        return [(np.load(os.path.join(directory, name), mmap_mode='r'), self._state(directory, name))
+                for name in self.index(model)[0]]
+
+    def read(self, model):
+        """
+        :return: loads, pressures and equilibria of all stored points of the model
+        """
+        chunks = self.chunks(model)
+        if not chunks:
+            return np.empty(0), np.empty(0), np.empty((0, 0))
+        keys = np.concatenate([k for k, _ in chunks])
+        return keys[:, 0], keys[:, 1], np.concatenate([s for _, s in chunks])
+
+    def lookup(self, model, loads, pressures):
+        """
+        Binary search of the keys in the index, reading only the rows of the chunks that hold them.
+
+        :param loads: normalized forces or cylinder pressures, broadcast against pressures
+        :param pressures: normalized actuation pressures
+        :return: stored equilibria of shape (..., nx), NaN where missing, and mask of the stored points
+        """
+        names, sorted_keys, chunk, row = self.index(model)
+        keys = self._sortable(self._keys(loads, pressures))
+        if not len(names):
+            return np.full(keys.shape + (0,), np.nan), np.zeros(keys.shape, dtype=bool)
+        position = np.minimum(np.searchsorted(sorted_keys, keys), len(sorted_keys) - 1)
+        found = sorted_keys[position] == keys
+
+        directory = self.directory(model)
+        state = np.full(keys.shape + self._state(directory, names[0]).shape[-1:], np.nan)
+        for c in np.unique(chunk[position[found]]):
+            selected = found & (chunk[position] == c)
+            state[selected] = self._state(directory, names[c])[row[position[selected]]]
+        return state, found
+
+    def grid(self, model, loads, pressures):
+        """
+        Stored equilibria on a (load, pressure) grid, of which every point must be stored.
+
+        :param loads: normalized forces or cylinder pressures
+        :param pressures: normalized actuation pressures
+        :return: equilibria of shape (len(loads), len(pressures), nx)
+        """
+        state, found = self.lookup(model, np.asarray(loads)[:, None], np.asarray(pressures)[None, :])
+        if not np.all(found):
+            raise KeyError(f'{np.count_nonzero(~found)} of {found.size} points are not stored in '
+                           f'{self.directory(model)}, solve them with PouchDatabase.solve first')
+        return state
+
+    def load(self, model, filename, solver=None):
+        """
+        Import a pickled grid [loads, pressures, state] of equilibria, as written by the data scripts.
+
+        :param filename: pickle of loads of shape (n,), pressures of shape (m,) and equilibria of shape (n, m, nx)
+        :param solver: PouchEquilibriumSolver validating the equilibria: points of which the projected gradient exceeds
+            its gtol, e.g. solved by an earlier solver, are not imported, such that solve solves them again
+        :return: number of inserted points
+        """
+        with open(filename, 'rb') as file:
+            loads, pressures, state = pickle.load(file)
+        loads, pressures = np.asarray(loads)[:, None], np.asarray(pressures)[None, :]
+        state = np.asarray(state, dtype=float)
+        if solver is not None:
+            valid = solver.projected_gradient(solver.reduce(state), loads, pressures) <= solver.gtol
+            state = np.where(valid[..., None], state, np.nan)
+        return self.insert(model, loads, pressures, state)
+
+    def nearest(self, model, load, pressure):
+        """
+        Distances are taken between the logarithms of the loads and of the pressures, such that both axes of the
+        geometric grids of the data sets weigh alike; values below the smallest positive one of an axis are clipped.
+
+        :return: equilibrium of the stored point nearest to (load, pressure), or None if the store is empty
+        """
+        names, keys, chunk, row = self.index(model)
+        if not len(keys):
+            return None
+        distance = 0.0
+        for stored, value in ((keys.real, load), (keys.imag, pressure)):
+            floor = np.min(stored[stored > 0], initial=value if value > 0 else 1.0)
+            distance = distance + (np.log(np.maximum(stored, floor)) - np.log(max(value, floor)))**2
+        i = int(np.argmin(distance))
+        return np.array(self._state(self.directory(model), names[chunk[i]])[row[i]])
+
+    def insert(self, model, loads, pressures, state):
+        """
+        Store new equilibria; points that are stored already are skipped.
+
+        :param loads: normalized forces or cylinder pressures, broadcast against pressures
+        :param pressures: normalized actuation pressures
+        :param state: equilibria of shape (..., nx)
+        :return: number of inserted points
+        """
+        keys = self._keys(loads, pressures).reshape(-1, 2)
+        state = np.asarray(state, dtype=float).reshape(len(keys), -1)
+        _, found = self.lookup(model, keys[:, 0], keys[:, 1])
+        new = ~found & np.all(np.isfinite(state), axis=-1)
+        keys, indices = np.unique(keys[new], axis=0, return_index=True)
+        if not len(keys):
+            return 0
+
+        directory = self.directory(model)
+        index = self.index(model)
+        os.makedirs(directory, exist_ok=True)
+        meta = os.path.join(directory, 'model.json')
+        if not os.path.exists(meta):
+            name, parameters = self.parameters(model)
+            with open(meta, 'w') as file:
+                json.dump({'model': name, 'parameters': parameters}, file)
+
+        # the state is written first, a chunk becomes visible once its loads file exists
+        tag = f'{time.time_ns()}_{os.getpid()}.npy'
+        for prefix, data in (('state_', state[new][indices]), ('loads_', keys)):
+            temporary = os.path.join(directory, 'tmp_' + prefix + tag)
+            with open(temporary, 'wb') as file:
+                np.save(file, data)
+            os.replace(temporary, os.path.join(directory, prefix + tag))
+
+        names, sorted_keys, chunk, row = self._indices[directory] = self._merge(index, tag, keys)
+        temporary = os.path.join(directory, f'tmp_index_{tag[:-len(".npy")]}.npz')
+        with open(temporary, 'wb') as file:
+            np.savez(file, names=np.array(names), keys=sorted_keys, chunk=chunk, row=row)
+        os.replace(temporary, os.path.join(directory, 'index.npz'))
+        return len(keys)
+
+    def solve(self, sweep: PouchSweep, loads, pressures, chain: int = 0):
+        """
+        Equilibria on a (load, pressure) grid, solving and storing only the points that are not stored yet.
+
+        Chains without any stored point are warm-started from the nearest stored neighbour of their first point.
+
+        :param sweep: sweep used to solve the missing points
+        :param loads: normalized forces or cylinder pressures
+        :param pressures: normalized actuation pressures
+        :param chain: axis along which warm starts are chained, 0 for loads and 1 for pressures
+        :return: equilibria of shape (len(loads), len(pressures), nx) and mask of solved points
+        """
+        model = sweep.solver.model
+        loads = np.asarray(loads, dtype=float)
+        pressures = np.asarray(pressures, dtype=float)
+        state, found = self.lookup(model, loads[:, None], pressures[None, :])
+        if np.all(found):
+            return state, found
+
+        x0 = np.tile(sweep.solver.expand(sweep.solver.z0), (found.shape[1 - chain], 1))
+        for column in range(len(x0)):
+            stored = found[:, column] if chain == 0 else found[column, :]
+            if not np.any(stored):
+                first = (loads[0], pressures[column]) if chain == 0 else (loads[column], pressures[0])
+                neighbour = self.nearest(model, *first)
+                if neighbour is not None:
+                    x0[column] = neighbour
+
+        if np.any(found):
+            state, solved = sweep(loads, pressures, chain=chain, x0=x0, state=state, solved=found)
+        else:
+            state, solved = sweep(loads, pressures, chain=chain, x0=x0)
+        self.insert(model, loads[:, None], pressures[None, :], np.where(solved[..., None], state, np.nan))
+        return state, solved
@@ -0,0 +1,202 @@
+"""
+Surrogate TAH models generated from pouch equilibria.
+
+The LIMO model describes the cylinder pressure of a CylindricalPouchArray as a bivariate cubic in the normalized
+cylinder volume and actuation pressure. The cubic is linear in its coefficients, so it is fitted by linear least
+squares, without the iterations and initial guess of a nonlinear curve fit. The ChebyshevTAH interpolates the same
+relation on a Chebyshev grid instead, with an accuracy set by its degree.
+"""
+
+import numpy as np
+from numpy.polynomial.chebyshev import chebval2d
+from scipy.fft import dctn
+
+from normalized_pouch import CylindricalPouchArray, PouchEquilibriumSolver
+from pouch_sweeps import PouchSweep
+from pouch_database import PouchDatabase
+from tahs import LIMO, PouchArrayTAH, ChebyshevTAH
+
+def cubic_basis(vc, pact):
+    """
+    Monomials of the LIMO fcn, in the order of its coefficients c.
+
+    :param vc: normalized cylinder volume
+    :param pact: normalized actuation pressure
+    :return: basis of shape (..., 8)
+    """
+    vc, pact = np.broadcast_arrays(vc, pact)
+    return np.stack([np.ones_like(vc), vc, pact, vc**2, pact**2, vc * pact, vc**3, pact**3], axis=-1)
+
+def bivariate_cubic_fit(vc, pact, pc, folds: int = 5, seed: int = 0):
+    """
+    Least squares fit of pc = f[vc, pact] with f the bivariate cubic of LIMO.fcn.
+
+    Non-finite samples, e.g. unsolved equilibria, are ignored.
+
+    :param vc: normalized cylinder volume
+    :param pact: normalized actuation pressure, broadcast against vc
+    :param pc: normalized cylinder pressure, broadcast against vc
+    :param folds: number of folds of the cross-validation
+    :param seed: seed of the random partition into folds
+    :return: coefficients c, and RMS error of the fit and of the k-fold cross-validation
+    """
+    vc, pact, pc = np.broadcast_arrays(vc, pact, pc)
+    A = cubic_basis(vc, pact).reshape(-1, 8)
+    b = pc.reshape(-1)
+    finite = np.all(np.isfinite(A), axis=-1) & np.isfinite(b)
+    A, b = A[finite], b[finite]
+
+    c = np.linalg.lstsq(A, b, rcond=None)[0]
+    fit_error = np.sqrt(np.mean((A @ c - b)**2))
+
+    fold = np.random.default_rng(seed).permutation(len(b)) % folds
+    residuals = np.concatenate([A[fold == k] @ np.linalg.lstsq(A[fold != k], b[fold != k], rcond=None)[0]
+                                - b[fold == k] for k in range(folds)])
+    return c, fit_error, np.sqrt(np.mean(residuals**2))
+
+class LIMOSurrogate:
+    """
+    Pipeline from pouch geometry to LIMO: solve the equilibria, compute the cylinder volume and fit the cubic.
+
+    Equilibria are kept in a PouchDatabase, so regenerating the model for a known geometry does not solve anything.
+    """
+    def __init__(self, Lsh: float = 0.1, N: int = 8,
+                 Pc=None,
+                 P=None,
+                 database: PouchDatabase | None = None,
+                 processes: int | None = None,
+                 folds: int = 5,
+                 seed: int = 0):
+        """
+        :param Lsh: relative seal length Lsh = Ls / L
+        :param N: number of pouches
+        :param Pc: normalized cylinder pressures of the fit, warm starts are chained along Pc, by default the fit range
+            of the force data set
+        :param P: normalized actuation pressures of the fit, by default the fit range of the force data set
+        :param database: store of the equilibria, by default in the directory pouch_equilibria
+        :param processes: number of worker processes used for missing equilibria
+        :param folds: number of folds of the cross-validation
+        :param seed: seed of the random partition into folds
+        """
+        self.model = CylindricalPouchArray(Lsh=Lsh, N=N)
+        self.Pc = np.geomspace(0.0001, 2.5, 100)[60:] if Pc is None else np.asarray(Pc, dtype=float)
+        self.P = np.geomspace(0.0001, 2.5, 20)[5:-1] if P is None else np.asarray(P, dtype=float)
+        self.database = PouchDatabase() if database is None else database
+        self.sweep = PouchSweep(PouchEquilibriumSolver(self.model), processes=processes)
+        self.folds = folds
+        self.seed = seed
+
+    def fit(self):
+        """
+        :return: coefficients c, and RMS error of the fit and of the cross-validation
+        """
+        state, solved = self.database.solve(self.sweep, self.Pc, self.P, chain=0)
+        vc = np.where(solved, self.model.cylinder_volume(state), np.nan)
+        return bivariate_cubic_fit(vc, self.P[None, :], self.Pc[:, None], self.folds, self.seed)
+
+    def __call__(self, **kwargs) -> LIMO:
+        """
+        :param kwargs: dimensional parameters of LIMO, e.g. Pact, L, D, H and mu
+        :return: LIMO of the pouch geometry
+        """
+        self.c, self.fit_error, self.cv_error = self.fit()
+        return LIMO(N=self.model.N, c=self.c, **kwargs)
+
+def chebyshev_nodes(degree: int, domain):
+    """
+    Chebyshev extrema cos(pi k / degree) mapped onto the domain (low, high), in decreasing order.
+    """
+    return domain[0] + (np.cos(np.pi * np.arange(degree + 1) / degree) + 1) / 2 * (domain[1] - domain[0])
+
+def chebyshev_coefficients(table):
+    """
+    Coefficients of the tensor Chebyshev series interpolating a table on the Chebyshev extrema of chebyshev_nodes.
+
+    The interpolation is separable and the extrema are the nodes of the DCT-I, such that the coefficients follow from
+    one two-dimensional DCT-I in O(d^2 log d), c_jk = dct_jk / d^2, halved in the first and last row and column.
+
+    :param table: values on the grid, indexed [ivcn, ipactn], of shape (d + 1, d + 1)
+    :return: coefficients of chebval2d, of the same shape
+    """
+    table = np.asarray(table, dtype=float)
+    coefficients = dctn(table, type=1) / np.prod(np.array(table.shape) - 1)
+    coefficients[[0, -1], :] /= 2
+    coefficients[:, [0, -1]] /= 2
+    return coefficients
+
+class ChebyshevSurrogate:
+    """
+    Pipeline from pouch geometry to ChebyshevTAH: solve Pcn at prescribed (vcn, pactn) on a tensor Chebyshev grid,
+    interpolate, and certify the maximum error against held-out equilibria at random points of the domain.
+
+    The degree is doubled until the maximum error is below tol, such that the accuracy is set by tol.
+    """
+    def __init__(self, Lsh: float = 0.1, N: int = 8,
+                 vcn=(0.1, 0.9),
+                 pactn=(0.0, 1.0),
+                 degree: int = 8,
+                 max_degree: int = 64,
+                 tol: float = 1e-2,
+                 holdout: int = 200,
+                 seed: int = 0):
+        """
+        :param Lsh: relative seal length Lsh = Ls / L
+        :param N: number of pouches
+        :param vcn: domain of the normalized cylinder volume vcn = vc / NL^2D
+        :param pactn: domain of the normalized actuation pressure pactn = Pact L / muH
+        :param degree: initial degree of the series in both variables
+        :param max_degree: maximum degree of the series
+        :param tol: maximum error in Pcn
+        :param holdout: number of held-out equilibria used to measure the error
+        :param seed: seed of the held-out points
+        """
+        self.tah = PouchArrayTAH(N=N, Lsh=Lsh)
+        self.domain = np.array([vcn, pactn], dtype=float)
+        self.degree = degree
+        self.max_degree = max_degree
+        self.tol = tol
+        self.holdout = holdout
+        self.seed = seed
+
+    def solve(self, vcn, pactn):
+        """
+        :return: Pcn at prescribed vcn and pactn
+        """
+        return self.tah.equilibrium(vcn, pactn)[0][-1]
+
+    def tabulate(self, degree: int):
+        """
+        :return: Pcn on the tensor Chebyshev grid of the given degree, indexed [ivcn, ipactn]
+        """
+        vcn, pactn = chebyshev_nodes(degree, self.domain[0]), chebyshev_nodes(degree, self.domain[1])
+        table = np.zeros((degree + 1, degree + 1))
+        for j, p in enumerate(pactn):
+            # sweep back and forth through the volumes, such that every solve is warm-started from a neighbour
+            for i in (range(degree + 1) if j % 2 == 0 else reversed(range(degree + 1))):
+                table[i, j] = self.solve(vcn[i], p)
+        return table
+
+    def fit(self):
+        """
+        :return: Chebyshev coefficients and their maximum error against the held-out equilibria
+        """
+        points = np.random.default_rng(self.seed).uniform(self.domain[:, 0], self.domain[:, 1], (self.holdout, 2))
+        points = points[np.argsort(points[:, 1])] # warm starts along increasing actuation pressure
+        reference = np.array([self.solve(vcn, pactn) for vcn, pactn in points])
+
+        degree = self.degree
+        while True:
+            coefficients = chebyshev_coefficients(self.tabulate(degree))
+            u = 2 * (points - self.domain[:, 0]) / (self.domain[:, 1] - self.domain[:, 0]) - 1
+            error = np.max(np.abs(chebval2d(u[:, 0], u[:, 1], coefficients) - reference))
+            if error <= self.tol or 2 * degree > self.max_degree:
+                return coefficients, error
+            degree *= 2
+
+    def __call__(self, **kwargs) -> ChebyshevTAH:
+        """
+        :param kwargs: dimensional parameters of ChebyshevTAH, e.g. Pact, L, D, H and mu
+        :return: ChebyshevTAH of the pouch geometry
+        """
+        self.coefficients, self.max_error = self.fit()
+        return ChebyshevTAH(self.coefficients, self.domain, N=self.tah.N, max_error=self.max_error, **kwargs)
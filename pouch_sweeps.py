@@ -0,0 +1,170 @@
+"""
+Parallel load sweeps of pouch equilibria.
+
+Warm starts only chain along one load axis, so every chain along the other axis is solved in its own worker process.
+Workers write their equilibria directly into a shared output array and only report the index they reached.
+"""
+
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing import RawArray
+
+from normalized_pouch import PouchEquilibriumSolver
+
+_worker = {}
+
+def _views(state_memory, done_memory, shape):
+    return (np.frombuffer(state_memory, dtype=float).reshape(shape),
+            np.frombuffer(done_memory, dtype=bool).reshape(shape[:2]))
+
+def _attach(solver, loads, pressures, chain, state_memory, done_memory, shape):
+    """
+    Worker initializer: keep the solver and views on the shared output arrays for the lifetime of the process.
+    """
+    state, done = _views(state_memory, done_memory, shape)
+    _worker.update(solver=solver, loads=loads, pressures=pressures, chain=chain, state=state, done=done)
+
+def _solve_chain(column: int, start: int, x0, substeps: int):
+    """
+    Solve one warm-start chain from index start onwards.
+
+    A failed point is retried by sub-stepping the load from the last good point.
+
+    :return: column and index of the first point that could not be solved, or the chain length on success
+    """
+    solver, state, done = _worker['solver'], _worker['state'], _worker['done']
+    loads, pressures, chain = _worker['loads'], _worker['pressures'], _worker['chain']
+    chained = loads if chain == 0 else pressures
+    fixed = pressures[column] if chain == 0 else loads[column]
+
+    def solve(value, x):
+        load, pressure = (value, fixed) if chain == 0 else (fixed, value)
+        result = solver(load, pressure, x0=x)
+        return result.x if result.success and np.all(np.isfinite(result.x)) else None
+
+    x = x0
+    for i in range(start, len(chained)):
+        index = (i, column) if chain == 0 else (column, i)
+        if done[index]:
+            # solved before, e.g. read from a database: reuse as warm start
+            x = state[index]
+            continue
+        x_new = solve(chained[i], x)
+        if x_new is None and i > 0:
+            x_new = x
+            for value in np.linspace(chained[i - 1], chained[i], substeps + 1)[1:]:
+                x_new = solve(value, x_new)
+                if x_new is None:
+                    break
+        if x_new is None:
+            return column, i
+        state[index] = x_new
+        done[index] = True
+        x = x_new
+    return column, len(chained)
+
+class PouchSweep:
+    """
+    Sweep of pouch equilibria over a (load, pressure) grid, with warm starts chained along one axis.
+
+    The result has the layout state[iload, ipressure, :] of the pickled data sets, independent of the chain axis.
+    """
+    def __init__(self, solver: PouchEquilibriumSolver | None = None,
+                 processes: int | None = None,
+                 restarts: int = 3,
+                 substeps: int = 8):
+        """
+        :param solver: equilibrium solver, pickled once per worker process, by default of a CylindricalPouchArray
+        :param processes: number of worker processes, by default the number of CPUs; 1 solves in-process
+        :param restarts: number of times a failed or crashed chain is restarted from its last good point
+        :param substeps: number of load sub-steps used to recover from a failed point, doubled on every restart
+        """
+        self.solver = PouchEquilibriumSolver() if solver is None else solver
+        self.processes = processes
+        self.restarts = restarts
+        self.substeps = substeps
+
+    def __call__(self, loads, pressures, chain: int = 0, x0=None, state=None, solved=None):
+        """
+        :param loads: normalized forces or cylinder pressures
+        :param pressures: normalized actuation pressures
+        :param chain: axis along which warm starts are chained, 0 for loads and 1 for pressures
+        :param x0: initial design variables of every chain, of shape (nx,) or (number of chains, nx),
+            by default the undeformed state
+        :param state: previously solved equilibria of shape (len(loads), len(pressures), nx), which are not recomputed
+        :param solved: mask of the previously solved points in state
+        :return: equilibria of shape (len(loads), len(pressures), nx) and mask of solved points
+        """
+        loads = np.asarray(loads, dtype=float)
+        pressures = np.asarray(pressures, dtype=float)
+        x0 = self.solver.expand(self.solver.z0) if x0 is None else np.asarray(x0, dtype=float)
+        shape = (len(loads), len(pressures), x0.shape[-1])
+
+        state_memory = RawArray('d', int(np.prod(shape)))
+        done_memory = RawArray('b', int(np.prod(shape[:2])))
+        initial_state, initial_solved = state, solved
+        state, done = _views(state_memory, done_memory, shape)
+        state[:] = np.nan
+        if initial_solved is not None:
+            done[:] = initial_solved
+            state[done] = np.asarray(initial_state)[done]
+
+        initargs = (self.solver, loads, pressures, chain, state_memory, done_memory, shape)
+        columns = range(shape[1 - chain])
+        if self.processes == 1:
+            _attach(*initargs)
+            try:
+                for column in columns:
+                    self._serial(column, chain, x0, state, done)
+            finally:
+                _worker.clear()
+        else:
+            self._parallel(columns, chain, x0, state, done, initargs)
+        return state, done
+
+    def _restart_point(self, column, chain, x0, state, done):
+        """
+        First unsolved index of a chain and the last good design variables before it.
+        """
+        solved = done[:, column] if chain == 0 else done[column, :]
+        start = int(np.argmin(solved)) if not np.all(solved) else len(solved)
+        if start == 0:
+            return start, x0[column] if x0.ndim == 2 else x0
+        return start, state[start - 1, column] if chain == 0 else state[column, start - 1]
+
+    def _serial(self, column, chain, x0, state, done):
+        for restart in range(self.restarts + 1):
+            start, x = self._restart_point(column, chain, x0, state, done)
+            _, stop = _solve_chain(column, start, x, self.substeps * 2**restart)
+            if stop == done.shape[chain]:
+                return
+
+    def _parallel(self, columns, chain, x0, state, done, initargs):
+        attempts = dict.fromkeys(columns, 0)
+        pending = set(columns)
+        while pending:
+            with ProcessPoolExecutor(self.processes, initializer=_attach, initargs=initargs) as pool:
+                futures = {}
+                for column in pending:
+                    start, x = self._restart_point(column, chain, x0, state, done)
+                    futures[pool.submit(_solve_chain, column, start, x, self.substeps * 2**attempts[column])] = column
+                try:
+                    while futures:
+                        finished, _ = wait(futures, return_when=FIRST_COMPLETED)
+                        for future in finished:
+                            column, stop = future.result()
+                            del futures[future]
+                            if stop == done.shape[chain] or attempts[column] == self.restarts:
+                                pending.discard(column)
+                            else:
+                                attempts[column] += 1
+                                start, x = self._restart_point(column, chain, x0, state, done)
+                                futures[pool.submit(_solve_chain, column, start, x,
+                                                    self.substeps * 2**attempts[column])] = column
+                except BrokenProcessPool:
+                    # a worker died; its chain, and all chains in flight, resume from their last good point
+                    for column in futures.values():
+                        attempts[column] += 1
+                        if attempts[column] > self.restarts:
+                            pending.discard(column)
@@ -30,15 +30,16 @@ for p in P:
         results.append(result)
         x0 = result.x
 
-    ax[0,0].plot(F, [i.x[0] for i in results])
-    ax[1,0].plot(F, [i.x[1] for i in results])
-    ax[2,0].plot(F, [i.x[2] for i in results], label=r'$\frac{{PL}}{{\mu H}}={{{}}}$'.format(p))
-    ax[0,1].plot(F, [i.x[3] / pi for i in results])
-    ax[1,1].plot(F, [i.x[4] for i in results])
-    ax[2,1].plot(F, [i.x[5] for i in results])
-    ax[0,2].plot(F, [Pouch.width(i.x[:4]) for i in results])
-    ax[1,2].plot(F, [Pouch.volume(i.x[:4]) for i in results])
-    ax[2,2].plot(F, [poucharray.array_width(i.x) for i in results])
+    x = np.array([i.x for i in results])
+    ax[0,0].plot(F, x[:, 0])
+    ax[1,0].plot(F, x[:, 1])
+    ax[2,0].plot(F, x[:, 2], label=r'$\frac{{PL}}{{\mu H}}={{{}}}$'.format(p))
+    ax[0,1].plot(F, x[:, 3] / pi)
+    ax[1,1].plot(F, x[:, 4])
+    ax[2,1].plot(F, x[:, 5])
+    ax[0,2].plot(F, Pouch.width(x))
+    ax[1,2].plot(F, Pouch.volume(x))
+    ax[2,2].plot(F, poucharray.width(x))
 
 ax[0,0].set_ylabel(r'$\frac{l}{L}$')
 ax[1,0].set_ylabel(r'$\frac{h}{H}$')
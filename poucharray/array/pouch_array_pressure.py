@@ -30,15 +30,16 @@ for f in F:
         results.append(result)
         x0 = result.x
 
-    ax[0,0].plot(P, [i.x[0] for i in results])
-    ax[1,0].plot(P, [i.x[1] for i in results])
-    ax[2,0].plot(P, [i.x[2] for i in results], label=r'$\frac{{F}}{{\mu HD}}={{{}}}$'.format(f))
-    ax[0,1].plot(P, [i.x[3] / pi for i in results])
-    ax[1,1].plot(P, [i.x[4] for i in results])
-    ax[2,1].plot(P, [i.x[5] for i in results])
-    ax[0,2].plot(P, [Pouch.width(i.x[:4]) for i in results])
-    ax[1,2].plot(P, [Pouch.volume(i.x[:4]) for i in results])
-    ax[2,2].plot(P, [poucharray.array_width(i.x) for i in results])
+    x = np.array([i.x for i in results])
+    ax[0,0].plot(P, x[:, 0])
+    ax[1,0].plot(P, x[:, 1])
+    ax[2,0].plot(P, x[:, 2], label=r'$\frac{{F}}{{\mu HD}}={{{}}}$'.format(f))
+    ax[0,1].plot(P, x[:, 3] / pi)
+    ax[1,1].plot(P, x[:, 4])
+    ax[2,1].plot(P, x[:, 5])
+    ax[0,2].plot(P, Pouch.width(x))
+    ax[1,2].plot(P, Pouch.volume(x))
+    ax[2,2].plot(P, poucharray.width(x))
 
 ax[0,0].set_ylabel(r'$\frac{l}{L}$')
 ax[1,0].set_ylabel(r'$\frac{h}{H}$')
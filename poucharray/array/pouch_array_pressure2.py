@@ -30,15 +30,16 @@ for f in F:
         results.append(result)
         x0 = result.x
 
-    ax[0,0].plot(Pa, [i.x[0] for i in results])
-    ax[1,0].plot(Pa, [i.x[1] for i in results])
-    ax[2,0].plot(Pa, [i.x[2] for i in results], label=r'$\frac{{F}}{{\mu HD}}={{{}}}$'.format(f))
-    ax[0,1].plot(Pa, [i.x[3] / pi for i in results])
-    ax[1,1].plot(Pa, [i.x[4] for i in results])
-    ax[2,1].plot(Pa, [i.x[5] for i in results])
-    ax[0,2].plot(Pa, [Pouch.width(i.x[:4]) for i in results])
-    ax[1,2].plot(Pa, [Pouch.volume(i.x[:4]) for i in results])
-    ax[2,2].plot(Pa, [poucharray.volume(i.x) for i in results])
+    x = np.array([i.x for i in results])
+    ax[0,0].plot(Pa, x[:, 0])
+    ax[1,0].plot(Pa, x[:, 1])
+    ax[2,0].plot(Pa, x[:, 2], label=r'$\frac{{F}}{{\mu HD}}={{{}}}$'.format(f))
+    ax[0,1].plot(Pa, x[:, 3] / pi)
+    ax[1,1].plot(Pa, x[:, 4])
+    ax[2,1].plot(Pa, x[:, 5])
+    ax[0,2].plot(Pa, Pouch.width(x))
+    ax[1,2].plot(Pa, Pouch.volume(x))
+    ax[2,2].plot(Pa, poucharray.volume(x))
 
 ax[0,0].set_ylabel(r'$\frac{l}{L}$')
 
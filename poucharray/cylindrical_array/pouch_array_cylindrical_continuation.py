@@ -0,0 +1,30 @@
+from math import pi
+import numpy as np
+from matplotlib import pyplot as plt
+from normalized_pouch import CylindricalPouchArray, PouchEquilibriumSolver
+from pouch_continuation import PouchContinuation
+
+poucharray = CylindricalPouchArray(Lsh=0.1, N=5)
+continuation = PouchContinuation(PouchEquilibriumSolver(poucharray))
+
+Pc = (0.0001, 0.5, 1.0, 2.0)
+
+fig, ax = plt.subplots(1, 2)
+
+for pc in Pc:
+    branch = continuation(0.0001, 3.0, pc, parameter=1)
+    print(pc, branch)
+    for start, stop, stable in branch.segments():
+        line, = ax[0].plot(branch.lam[start:stop], branch.x[start:stop, 0], '-' if stable else '--')
+        ax[1].plot(branch.lam[start:stop], branch.x[start:stop, 3] / pi, '-' if stable else '--',
+                   color=line.get_color())
+    for index, lam, z in branch.folds:
+        ax[0].plot(lam, z[0], 'ko')
+        ax[1].plot(lam, z[1] / pi, 'ko')
+
+ax[0].set_xlabel(r'$\frac{PL}{\mu H}$')
+ax[1].set_xlabel(r'$\frac{PL}{\mu H}$')
+ax[0].set_ylabel(r'$\frac{l}{L}$')
+ax[1].set_ylabel(r'$\frac{\theta}{\pi}$')
+
+plt.show()
@@ -35,16 +35,17 @@ for p in P:
         results.append(result)
         x0 = result.x
 
-    ax[0,0].plot(Pc, [i.x[0] for i in results])
-    ax[1,0].plot(Pc, [i.x[1] for i in results])
-    ax[2,0].plot(Pc, [i.x[2] for i in results], label=r'$\frac{{PL}}{{\mu H}}={{{}}}$'.format(p))
-    ax[0,1].plot(Pc, [i.x[3] / pi for i in results])
-    ax[1,1].plot(Pc, [i.x[4] for i in results])
-    ax[2,1].plot(Pc, [i.x[5] for i in results])
-    ax[0,2].plot(Pc, [Pouch.width(i.x[:4]) for i in results])
-    ax[1,2].plot(Pc, [Pouch.volume(i.x[:4]) for i in results])
-    ax[2,2].plot(Pc, [poucharray.cylinder_volume(i.x) for i in results])
-    ax2.plot([poucharray.cylinder_volume(i.x) - poucharray.cylinder_volume(results[0].x) for i in results], [-(Pouch.volume(i.x) - Pouch.volume(results[0].x)) for i in results], label=r'$\frac{{PL}}{{\mu H}}={{{}}}$'.format(p))
+    x = np.array([i.x for i in results])
+    ax[0,0].plot(Pc, x[:, 0])
+    ax[1,0].plot(Pc, x[:, 1])
+    ax[2,0].plot(Pc, x[:, 2], label=r'$\frac{{PL}}{{\mu H}}={{{}}}$'.format(p))
+    ax[0,1].plot(Pc, x[:, 3] / pi)
+    ax[1,1].plot(Pc, x[:, 4])
+    ax[2,1].plot(Pc, x[:, 5])
+    ax[0,2].plot(Pc, Pouch.width(x))
+    ax[1,2].plot(Pc, Pouch.volume(x))
+    ax[2,2].plot(Pc, poucharray.cylinder_volume(x))
+    ax2.plot(poucharray.cylinder_volume(x) - poucharray.cylinder_volume(x[0]), -(Pouch.volume(x) - Pouch.volume(x[0])), label=r'$\frac{{PL}}{{\mu H}}={{{}}}$'.format(p))
 
 ax2.plot([0, 0.5], [0, 0.5], 'k--')
 ax2.set_xlim(left=0)
@@ -32,17 +32,18 @@ for pc in Pc:
         results.append(result)
         x0 = result.x
 
-    ax[0,0].plot(P, [i.x[0] for i in results])
-    ax[1,0].plot(P, [i.x[1] for i in results])
-    ax[2,0].plot(P, [i.x[2] for i in results], label=r'$\frac{{P_\text{{c}}NL}}{{\mu H}}={{{}}}$'.format(pc))
-    ax[0,1].plot(P, [i.x[3] / pi for i in results])
-    ax[1,1].plot(P, [i.x[4] for i in results])
-    ax[2,1].plot(P, [i.x[5] for i in results])
-    ax[0,2].plot(P, [Pouch.width(i.x[:4]) for i in results])
-    ax[1,2].plot(P, [Pouch.volume(i.x[:4]) for i in results])
-    ax[2,2].plot(P, [poucharray.cylinder_volume(i.x) for i in results], 'o-')
-
-    ax2.plot([Pouch.volume(i.x[:4]) - Pouch.volume(results[0].x) for i in results], [-(poucharray.cylinder_volume(i.x) - poucharray.cylinder_volume(results[0].x)) for i in results], 'o-',label=r'$\frac{{P_\text{{c}}NL}}{{\mu H}}={{{}}}$'.format(pc))
+    x = np.array([i.x for i in results])
+    ax[0,0].plot(P, x[:, 0])
+    ax[1,0].plot(P, x[:, 1])
+    ax[2,0].plot(P, x[:, 2], label=r'$\frac{{P_\text{{c}}NL}}{{\mu H}}={{{}}}$'.format(pc))
+    ax[0,1].plot(P, x[:, 3] / pi)
+    ax[1,1].plot(P, x[:, 4])
+    ax[2,1].plot(P, x[:, 5])
+    ax[0,2].plot(P, Pouch.width(x))
+    ax[1,2].plot(P, Pouch.volume(x))
+    ax[2,2].plot(P, poucharray.cylinder_volume(x), 'o-')
+
+    ax2.plot(Pouch.volume(x) - Pouch.volume(x[0]), -(poucharray.cylinder_volume(x) - poucharray.cylinder_volume(x[0])), 'o-',label=r'$\frac{{P_\text{{c}}NL}}{{\mu H}}={{{}}}$'.format(pc))
 
 
 ax2.plot([0, 0.5], [0, 0.5], 'k--')
@@ -2,9 +2,9 @@ from math import pi
 import numpy as np
 from matplotlib import pyplot as plt
 import matplotlib.pylab as pylab
-from normalized_pouch import Pouch, CylindricalPouchArray
-import pickle
-from scipy.optimize import curve_fit
+from normalized_pouch import Pouch, CylindricalPouchArray, PouchEquilibriumSolver
+from pouch_database import PouchDatabase
+from pouch_surrogates import bivariate_cubic_fit
 
 def func(xy, a, b, c, d, e, f, g, h):
     x, y = xy
@@ -16,20 +16,24 @@ params = {'legend.fontsize': 'xx-large',
 pylab.rcParams.update(params)
 
 poucharray = CylindricalPouchArray(Lsh=0.1, N=8)
+solver = PouchEquilibriumSolver(poucharray)
 
-Pc, P, state = pickle.load(open("cylindrical_force_data.p", "rb"))
-Pc = Pc[60:]
-P = P[5:-1]
-state = state[60:, 5:-1,:]
+database = PouchDatabase('pouch_equilibria')
+database.load(poucharray, 'cylindrical_force_data.p', solver)
 
+# fit range of the force data set, see pouch_array_cylindrical_force_data.py
+Pc = np.geomspace(0.0001, 2.5, 100)[60:]
+P = np.geomspace(0.0001, 2.5, 20)[5:-1]
+state = database.grid(poucharray, Pc, P)
+
+VC = poucharray.cylinder_volume(state) # cylinder volume of all (Pc, P) designs
+x = VC.T.flatten()
 y = np.repeat(P, len(Pc))
-x = []
 z = np.tile(Pc, len(P))
 
 plt.figure()
 for ip, p in enumerate(P):
-    vc = [poucharray.cylinder_volume(state[i, ip, :]) for i in range(0, len(Pc))]
-    x.extend(np.asarray(vc))
+    vc = VC[:, ip]
     plt.scatter(vc, Pc, c=p * np.ones_like(Pc), cmap='jet')
     plt.plot(vc, Pc, 'r--', alpha=0.1)
     plt.clim(0, 2.5)
@@ -40,11 +44,12 @@ plt.ylim([-0.1, 2.5])
 plt.axvline(0, color='k')
 plt.axhline(0, color='k')
 
-popt, pcov = curve_fit(func, (x, y), z)
+popt, fit_error, cv_error = bivariate_cubic_fit(x, y, z)
+print(f'RMS error: fit {fit_error:.3g}, cross-validation {cv_error:.3g}')
 
 plt.figure()
 for ip, p in enumerate(P):
-    vc = np.asarray([poucharray.cylinder_volume(state[i, ip, :]) for i in range(0, len(Pc))])
+    vc = VC[:, ip]
     plt.scatter(vc, func((vc, p), popt[0], popt[1], popt[2], popt[3], popt[4], popt[5], popt[6], popt[7]), c=p * np.ones_like(Pc), cmap='jet')
     plt.plot(vc, func((vc, p), popt[0], popt[1], popt[2], popt[3], popt[4], popt[5], popt[6], popt[7]), 'b--', alpha=0.1)
     plt.clim(0, 2.5)
@@ -2,27 +2,38 @@ from math import pi
 import numpy as np
 from matplotlib import pyplot as plt
 import matplotlib.pylab as pylab
-from normalized_pouch import Pouch, CylindricalPouchArray
-import pickle
+from normalized_pouch import Pouch, CylindricalPouchArray, PouchEquilibriumSolver
+from pouch_database import PouchDatabase
 
 params = {'legend.fontsize': 'xx-large',
          'axes.labelsize': 'xx-large'}
 pylab.rcParams.update(params)
 
 poucharray = CylindricalPouchArray(Lsh=0.1, N=8)
+solver = PouchEquilibriumSolver(poucharray)
 
 
-Pc, P, state = pickle.load(open("cylindrical_force_data.p", "rb"))
+database = PouchDatabase('pouch_equilibria')
+database.load(poucharray, 'cylindrical_force_data.p', solver)
+database.load(poucharray, 'cylindrical_pressure_data.p', solver)
+
+Pc = np.geomspace(0.0001, 2.5, 100)
+P = np.geomspace(0.0001, 2.5, 20)
+state = database.grid(poucharray, Pc, P)
+VC = poucharray.cylinder_volume(state)
 
 for ip, p in enumerate(P):
-    vc = [poucharray.cylinder_volume(state[i, ip, :]) for i in range(0, len(Pc))]
+    vc = VC[:, ip]
     plt.scatter(vc, Pc, c=p * np.ones_like(Pc), cmap='jet')
     plt.plot(vc, Pc, 'r--', alpha=0.1)
     plt.clim(0, 2.5)
 
-Pc, P, state = pickle.load(open("cylindrical_pressure_data.p", "rb"))
+Pc = np.linspace(0.001, 5, 20)
+P = np.geomspace(0.00001, 1.75, 100)
+state = database.grid(poucharray, Pc, P)
+VC = poucharray.cylinder_volume(state)
 for ip, p in enumerate(P):
-    vc = [poucharray.cylinder_volume(state[i, ip, :]) for i in range(0, len(Pc))]
+    vc = VC[:, ip]
     plt.scatter(vc, Pc, c=p * np.ones_like(Pc), cmap='jet')
     plt.plot(vc, Pc, 'r--', alpha=0.1)
     plt.clim(0, 2.5)
@@ -1,26 +1,22 @@
-from math import pi
-from scipy.optimize import minimize
 import numpy as np
-from normalized_pouch import CylindricalPouchArray
+from normalized_pouch import CylindricalPouchArray, PouchEquilibriumSolver
+from pouch_sweeps import PouchSweep
+from pouch_database import PouchDatabase
 import pickle
 
-poucharray = CylindricalPouchArray(Lsh=0.1, N=8)
+if __name__ == '__main__':
+    poucharray = CylindricalPouchArray(Lsh=0.1, N=8)
+    sweep = PouchSweep(PouchEquilibriumSolver(poucharray))
+    database = PouchDatabase('pouch_equilibria')
+    # the checked-in data set seeds the database, its points that are not equilibria of the solver are solved again
+    database.load(poucharray, 'cylindrical_pressure_data.p', sweep.solver)
 
-bnds = [(0, None), (0, None), (0, None), (0, pi), (0, None), (0, None)]
+    Pc = np.linspace(0.001, 5, 20)
+    P = np.geomspace(0.00001, 1.75, 100)
 
-cons = [{'type': 'eq', 'fun': lambda x: x[0] * x[1] * x[2] - 1},
-        {'type': 'eq', 'fun': lambda x: x[4] * x[5] * x[2] - 1},
-        {'type': 'eq', 'fun': lambda x: x[2] - 1}]
+    # only points missing from the database are solved
+    # warm starts chain along P, every Pc row is solved in its own process
+    state, solved = database.solve(sweep, Pc, P, chain=1)
+    assert np.all(solved), f'{np.count_nonzero(~solved)} points did not converge'
 
-Pc = np.linspace(0.001, 5, 20)
-P = np.geomspace(0.00001, 1.75, 100)
-
-state = np.zeros((np.size(Pc), np.size(P), 6), dtype=float)
-for ipc, pc in enumerate(Pc):
-    x0 = np.array([1, 1, 1, 1e-6, 1, 1], dtype=float)
-    for ip, p in enumerate(P):
-        state[ipc, ip, :] = minimize(poucharray.energy, x0=x0, bounds=bnds, args=(pc, p), constraints=cons,
-                          method='trust-constr').x
-        x0[:] = state[ipc, ip, :]
-
-pickle.dump([Pc, P, state], open("cylindrical_pressure_data.p", "wb"))
\ No newline at end of file
+    pickle.dump([Pc, P, state], open("cylindrical_pressure_data.p", "wb"))
@@ -29,12 +29,13 @@ for p in P:
         results.append(result)
         x0 = result.x
 
-    ax[0,0].plot(F, [i.x[0] for i in results])
-    ax[1,0].plot(F, [i.x[1] for i in results])
-    ax[0,1].plot(F, [i.x[3] / pi for i in results])
-    ax[1,1].plot(F, [pouch.width(i.x) for i in results])
-    ax[0,2].plot(F, [pouch.volume(i.x) for i in results])
-    ax[1,2].plot(F, [i.x[2] for i in results], label=r'$\frac{{PL}}{{\mu H}}={{{}}}$'.format(p))
+    x = np.array([i.x for i in results])
+    ax[0,0].plot(F, x[:, 0])
+    ax[1,0].plot(F, x[:, 1])
+    ax[0,1].plot(F, x[:, 3] / pi)
+    ax[1,1].plot(F, pouch.width(x))
+    ax[0,2].plot(F, pouch.volume(x))
+    ax[1,2].plot(F, x[:, 2], label=r'$\frac{{PL}}{{\mu H}}={{{}}}$'.format(p))
 
 ax[0,0].set_ylabel(r'$\frac{l}{L}$')
 ax[1,0].set_ylabel(r'$\frac{h}{H}$')
@@ -29,12 +29,13 @@ for f in F:
         results.append(result)
         x0 = result.x
 
-    ax[0,0].plot(P, [i.x[0] for i in results])
-    ax[1,0].plot(P, [i.x[1] for i in results])
-    ax[0,1].plot(P, [i.x[3] / pi for i in results])
-    ax[1,1].plot(P, [pouch.width(i.x) for i in results])
-    ax[0,2].plot(P, [pouch.volume(i.x) for i in results], 'o-')
-    ax[1,2].plot(P, [i.x[2] for i in results], label=r'$\frac{{F}}{{\mu HD}}={{{}}}$'.format(f))
+    x = np.array([i.x for i in results])
+    ax[0,0].plot(P, x[:, 0])
+    ax[1,0].plot(P, x[:, 1])
+    ax[0,1].plot(P, x[:, 3] / pi)
+    ax[1,1].plot(P, pouch.width(x))
+    ax[0,2].plot(P, pouch.volume(x), 'o-')
+    ax[1,2].plot(P, x[:, 2], label=r'$\frac{{F}}{{\mu HD}}={{{}}}$'.format(f))
 
 ax[0,0].set_ylabel(r'$\frac{l}{L}$')
 ax[1,0].set_ylabel(r'$\frac{h}{H}$')
@@ -4,13 +4,12 @@ Lumped parameter models describing the analytical -- typically nonlinear but sta
 import numpy as np
 from abc import ABC, abstractmethod
 
-from scipy.integrate import solve_ivp
-
 from circuits import Circuit, RLCCircuit
 from motors import DCMotor
-from utils import cubic_fit, quadratic_fit
+from utils import cubic_fit, quadratic_fit, records, samplewise
+from trajectory import Trajectory
+from hybrid import simulate
 from math import pi
-from matplotlib import pyplot as plt
 
 class CP:
     g = 9.81
@@ -109,28 +108,100 @@ class CentrifugalPump(Pump):
 
 class MotorPumpLoadAssembly:
     def __init__(self,
-                 motor: DCMotor = DCMotor(),
-                 pump: CentrifugalPump = CentrifugalPump(),
-                 circuit: Circuit = RLCCircuit()):
-        self.motor = motor
-        self.pump = pump
-        self.circuit = circuit
+                 motor: DCMotor | None = None,
+                 pump: CentrifugalPump | None = None,
+                 circuit: Circuit | None = None):
+        self.motor = DCMotor() if motor is None else motor
+        self.pump = CentrifugalPump() if pump is None else pump
+        self.circuit = RLCCircuit() if circuit is None else circuit
 
     def __call__(self,
                  y0: tuple[float, ...],
                  t: float = 10.0,
                  t_begin: float = 0.0,
                  atol: float = 1e-6, rtol: float = 1e-6, max_step=0.001):
-        sol = solve_ivp(self.solve, [t_begin, t], y0, atol=atol, rtol=rtol, max_step=max_step)
-        z = [self.pump.solve(sol.t[i], y) for i, y in enumerate(sol.y[1:3].T)]
-        return sol.t, np.vstack(([sol.y, np.asarray(z).T]))
+        trajectory = self.trajectory(y0, t, t_begin, atol=atol, rtol=rtol, max_step=max_step)
+        return trajectory.t, np.vstack((trajectory.y, self.pump.solve(trajectory.t, trajectory.y[1:3])))
+
+    @property
+    def states(self) -> tuple[str, ...]:
+        return ('current', 'speed') + self.circuit.states
+
+    def trajectory(self,
+                   y0: tuple[float, ...],
+                   t: float = 10.0,
+                   t_begin: float = 0.0,
+                   atol: float = 1e-6, rtol: float = 1e-6, max_step=0.001) -> Trajectory:
+        """
+        Hysteretic elements of the circuit, e.g. an Oscillator, are switched at their events, at which the integration
+        is restarted. Their states are recorded per sample as columns <element>_closed, which the diagnostics use, and
+        restored afterwards, such that the simulation can be repeated.
+
+        :return: trajectory with dense output, and the diagnostics as derived columns
+        """
+        elements = self.circuit.elements()
+        initial = {name: element.closed for name, element in elements.items()}
+        signals = {f'{name}_closed': lambda t, y, element=element: np.full(len(t), float(element.closed))
+                   for name, element in elements.items()}
+        try:
+            trajectory = simulate(self.solve, [t_begin, t], y0, self.circuit.events(offset=2),
+                                  self.circuit.transitions(), states=self.states, signals=signals,
+                                  atol=atol, rtol=rtol, max_step=max_step)
+        finally:
+            for name, element in elements.items():
+                element.closed = initial[name]
+        trajectory.diagnostics = lambda t, Y: self.diagnostics(
+            t, Y, {name: trajectory[f'{name}_closed'] == 1 for name in elements})
+        return trajectory
 
     def solve(self, t, y):
         tau, h_pump = self.pump.solve(t, y[1:3]) # in kPa
         return self.ode(t, y, tau, h_pump)
 
-    def ode(self, t, y, tau, h_pump):
+    def diagnostics(self, t, Y, closed: dict | None = None):
+        """
+        Derived signals of a trajectory, vectorized over the samples.
+
+        Stateful circuits, of which a component changes its state on evaluation, are evaluated sample by sample.
+
+        :param t: times of shape (n,)
+        :param Y: states (current, speed, circuit states) of shape (nstates, n), further rows are ignored,
+            e.g. the pump torque and head that __call__ appends
+        :param closed: states of the hysteretic elements of the circuit per sample by name, e.g. the <element>_closed
+            columns of a trajectory, passed to the circuit, by default their current states
+        :return: records of signals of shape (n,) with the applied voltage, the pump torque and head, the derivatives
+            dcurrent, dspeed and d<circuit state> of the states, the heads and flows of the circuit and the powers
+        """
+        t = np.asarray(t, dtype=float)
+        Y = np.asarray(Y, dtype=float)[:2 + len(self.circuit.states)]
+        closed = None if closed is None else {name: np.asarray(states, dtype=bool) for name, states in closed.items()}
+        names = []
+
+        def signals(t, y, *states):
+            sample = None if closed is None else dict(zip(closed, states))
+            tau, h_pump = self.pump.solve(t, y[1:3])
+            circuit = self.circuit.diagnostics(t, h_pump, y[2:], sample)
+            names[:] = circuit
+            return [self.motor.applied_voltage(t), tau, h_pump, *self.ode(t, y, tau, h_pump, sample), *circuit.values()]
+
+        voltage, torque, head, dcurrent, dspeed, *values = samplewise(signals, t, Y, *(closed or {}).values(),
+                                                                  stateful=self.circuit.stateful)
+        derivatives = dict(zip(['d' + state for state in self.circuit.states], values))
+        current, speed, flow = Y[0], Y[1], Y[2]
+        return records(voltage=voltage, torque_pump=torque, head_pump=head, dcurrent=dcurrent, dspeed=dspeed,
+                       **derivatives, **dict(zip(names, values[len(derivatives):])),
+                       power_electrical=voltage * current,
+                       power_resistance=self.motor.R * current**2,
+                       power_inductance=self.motor.L * dcurrent * current,
+                       power_emf=self.motor.kb * speed * current,
+                       power_motor=self.motor.kt * current * speed,
+                       power_friction=self.motor.mu * speed**2,
+                       power_inertia=self.motor.M * dspeed * speed,
+                       power_load=torque * speed,
+                       power_hydraulic=head * self.pump.gamma * flow / 60000)
+
+    def ode(self, t, y, tau, h_pump, closed: dict | None = None):
         dmotor = self.motor.solve_tau(t, y[0], y[1], tau)
-        dcircuit = self.circuit.solve(t, h_pump, y[2:])
+        dcircuit = self.circuit.solve(t, h_pump, y[2:], closed)
         return dmotor + dcircuit # combinging two tuples
 
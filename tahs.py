@@ -2,9 +2,12 @@
 Lumped parameter models describing the -- typically nonlinear but static -- behaviour of TAHs.
 """
 
+import warnings
+from math import pi
 import numpy as np
-from matplotlib import pyplot as plt
 from abc import ABC, abstractmethod
+from collections import OrderedDict
+from numpy.polynomial.chebyshev import chebval2d, chebder
 
 from utils import TDP
 
@@ -178,10 +181,19 @@ class PressureActuatedNonlinearMembrane(PATAH):
         return self.Pact.diff(t) + dPvdV * flow
 
 class LIMO(PATAH):
-    def __init__(self, Pact: TDP = TDP(min=0, max=120), L: float = 0.017, N: int = 8, D: float = 0.05, H: float = 0.001, mu: float = 3e5):
+    def __init__(self, Pact: TDP = TDP(min=0, max=120), L: float = 0.017, N: int = 8, D: float = 0.05, H: float = 0.001, mu: float = 3e5,
+                 c: np.ndarray = None):
+        """
+        :param c: coefficients of the normalized bivariate cubic fcn, by default those of the original curve_fit of
+            CylindricalPouchArray(Lsh=0.1, N=8) equilibria, kept such that earlier results are reproduced; they are not
+            the least squares fit of pouch_surrogates.LIMOSurrogate on the current equilibria of that geometry, which
+            generates the coefficients for any pouch geometry
+        """
         self.Pact = Pact
-        self.c = np.array([-2.26531554e+00,  1.61644772e+01,  1.01374824e-02, -3.77366149e+01,
-                           -3.00151200e+00,  1.06145026e+01,  2.87000461e+01,  9.13326808e-01])
+        if c is None:
+            c = [-2.26531554e+00,  1.61644772e+01,  1.01374824e-02, -3.77366149e+01,
+                 -3.00151200e+00,  1.06145026e+01,  2.87000461e+01,  9.13326808e-01]
+        self.c = np.array(c, dtype=float)
 
         self.mmhg2pa = 133
         self.ml2m3 = 1e-6
@@ -211,12 +223,281 @@ class LIMO(PATAH):
         a, b, c, d, e, f, g, h = self.c
         return c + 2 * e * pact + f * vc + 3 * h * pact**2
 
+    def fcn_diff(self, vc, pact):
+        """
+        dPcn/dvcn and dPcn/dpactn of the normalized function
+        """
+        return self.dfcndvc(vc, pact), self.dfcndpact(vc, pact)
+
     def pressure_diff(self, vc: float, flow: float, t: float) -> float:
         vcn = vc * self.ml2m3 / self.N / self.L ** 2 / self.D
         pactn = self.Pact(t) * self.L / self.mu / self.H
-        return self.mu * self.H * (self.dfcndvc(vcn, pactn) * flow / self.N / self.L**2 / self.D * self.ml2m3 + self.dfcndpact(vcn, pactn) * self.Pact.diff(t) * self.L / self.mu / self.H) / self.N / self.L
+        dfcndvc, dfcndpact = self.fcn_diff(vcn, pactn)
+        return self.mu * self.H * (dfcndvc * flow / self.N / self.L**2 / self.D * self.ml2m3 + dfcndpact * self.Pact.diff(t) * self.L / self.mu / self.H) / self.N / self.L
+
+class PouchArrayTAH(LIMO):
+    """
+    Pressure actuated pouch array TAH with the cylinder pressure from the CylindricalPouchArray equilibrium.
+
+    Instead of the fitted Pcn = f[vcn, pactn] of LIMO, of which the normalization is reused, the equilibrium at
+    prescribed cylinder volume is solved on every call: Newton on dEn/dz(z, Pcn, pactn) = 0 and vch(z) = vcn for the unknowns (z, Pcn), warm-started from the previous
+    call. Recent (vcn, pactn) -> (z, Pcn) pairs are cached, such that repeated evaluations are free.
+
+    The residual and its Jacobian are evaluated in closed form with scalar math, see CylindricalPouchArray.reduced_diff,
+    and the Newton systems are solved by the Schur complement of the Hessian, such that a call costs a few LIMO calls.
+    """
+    def __init__(self, Pact: TDP = TDP(min=0, max=120), L: float = 0.017, N: int = 8, D: float = 0.05, H: float = 0.001, mu: float = 3e5,
+                 Lsh: float = 0.1,
+                 tol: float = 1e-10,
+                 maxiter: int = 20,
+                 cache: int = 256):
+        """
+        :param Lsh: relative seal length of the pouch array
+        :param tol: tolerance on the Newton residual
+        :param maxiter: maximum number of Newton iterations per call
+        :param cache: number of recent equilibria that are kept
+        """
+        super().__init__(Pact, L, N, D, H, mu)
+        from normalized_pouch import CylindricalPouchArray, PouchEquilibriumSolver
+
+        self.model = CylindricalPouchArray(Lsh=Lsh, N=N)
+        self.solver = PouchEquilibriumSolver(self.model)
+        self.tol = tol
+        self.maxiter = maxiter
+        self.cache_size = cache
+        self.cache = OrderedDict()
+        self.state = None # (vcn, pactn, (y, dy)) of the previous call, with y = (z, Pcn)
+        # bounds of the unknowns (z, Pcn), the cylinder pressure is free
+        bounds = [(low, np.inf if high is None else high) for low, high in self.solver.bounds] + [(-np.inf, np.inf)]
+        self.lower, self.upper = zip(*bounds)
+        self.newton_iterations = 0
+
+    def residual(self, y, vcn: float, pactn: float):
+        """
+        :param y: unknowns y = (z, Pcn)
+        :return: residual (dEn/dz, vch - vcn) and its Jacobian to y, as the blocks (d2En/dz2, d(dEn/dz)/dPcn, dvch/dz),
+            and d(dEn/dz)/dpactn
+        """
+        gradient, hessian, dpc, dp, volume, volume_diff = self.model.reduced_diff(y[0], y[1], y[2], y[3], pactn)
+        return (*gradient, volume - vcn), (hessian, dpc, volume_diff), dp
+
+    @staticmethod
+    def stable(jacobian):
+        """
+        Stability of the equilibrium under its cylinder pressure: the energy Hessian is positive semi-definite, i.e. all
+        leading principal minors of d2En/dz2 + 1e-8 I are positive.
+        This rejects, e.g., flat compressed arrays where the inflated pouches are in equilibrium.
+        """
+        (a, b, c), (_, e, f), (_, _, i) = jacobian[0]
+        a, e, i = a + 1e-8, e + 1e-8, i + 1e-8
+        return a > 0 and a * e - b * b > 0 and a * (e * i - f * f) - b * (b * i - c * f) + c * (b * f - c * e) > 0
+
+    @staticmethod
+    def solve(jacobian, *rhs):
+        """
+        Solve the bordered system [[d2En/dz2, d(dEn/dz)/dPcn], [dvch/dz, 0]] dy = rhs by the Schur complement of the
+        Hessian, with its inverse in closed form. Without actuation and load the pouch angle is free, then the
+        minimum-norm solution is taken.
+
+        :param jacobian: blocks of the Jacobian, see residual
+        :param rhs: right-hand sides of length 4
+        :return: dy of every right-hand side, tuples of length 4
+        """
+        ((a, b, c), (d, e, f), (g, h, i)), (p, q, r), (u, v, w) = jacobian
+        # the Hessian is symmetric, so are its cofactors
+        k00, k01, k02 = e * i - f * h, c * h - b * i, b * f - c * e
+        k11, k12, k22 = a * i - c * g, c * d - a * f, a * e - b * d
+        determinant = a * k00 + b * k01 + c * k02
+        if abs(determinant) > 1e-12 * max(abs(a), abs(e), abs(i), 1.0)**3:
+            # dz = H^-1 (rhs_z - dPcn column), dvch/dz dz = rhs_v
+            hb0, hb1, hb2 = k00 * p + k01 * q + k02 * r, k01 * p + k11 * q + k12 * r, k02 * p + k12 * q + k22 * r
+            schur = u * hb0 + v * hb1 + w * hb2
+            if schur != 0:
+                solutions = []
+                for r0, r1, r2, r3 in rhs:
+                    hu0 = k00 * r0 + k01 * r1 + k02 * r2
+                    hu1 = k01 * r0 + k11 * r1 + k12 * r2
+                    hu2 = k02 * r0 + k12 * r1 + k22 * r2
+                    dpc = (u * hu0 + v * hu1 + w * hu2 - r3 * determinant) / schur
+                    solutions.append(((hu0 - dpc * hb0) / determinant, (hu1 - dpc * hb1) / determinant,
+                                      (hu2 - dpc * hb2) / determinant, dpc))
+                return solutions
+        matrix = np.zeros((4, 4))
+        matrix[:3, :3] = jacobian[0]
+        matrix[:3, 3] = jacobian[1]
+        matrix[3, :3] = jacobian[2]
+        return [tuple(np.linalg.lstsq(matrix, r, rcond=None)[0]) for r in rhs]
+
+    def newton(self, y, vcn: float, pactn: float):
+        """
+        :return: solution y = (z, Pcn) and its derivatives (dy/dvcn, dy/dpactn) per unknown, or None if the iteration
+            did not converge
+        """
+        # the flat pouch theta = 0 is stationary by symmetry, start just off it to reach inflated states
+        y = (y[0], max(y[1], 1e-3), y[2], y[3])
+        r, jacobian, dp = self.residual(y, vcn, pactn)
+        error = max(map(abs, r))
+        for _ in range(self.maxiter + 1):
+            if error <= self.tol:
+                if not self.stable(jacobian):
+                    return None
+                # implicit function theorem: J dy/dvcn = e, J dy/dpactn = -dr/dpactn
+                dy_vcn, dy_pactn = self.solve(jacobian, (0.0, 0.0, 0.0, 1.0), (-dp[0], -dp[1], -dp[2], 0.0))
+                return y, tuple(zip(dy_vcn, dy_pactn))
+            dy, = self.solve(jacobian, tuple(-v for v in r))
+            scale = 1.0
+            for _ in range(20):
+                trial = tuple(min(max(v + scale * d, low), high)
+                              for v, d, low, high in zip(y, dy, self.lower, self.upper))
+                r_trial, jacobian_trial, dp_trial = self.residual(trial, vcn, pactn)
+                error_trial = max(map(abs, r_trial))
+                if error_trial < error:
+                    break
+                scale /= 2
+            y, r, jacobian, dp, error = trial, r_trial, jacobian_trial, dp_trial, error_trial
+            self.newton_iterations += 1
+        return None
+
+    def equilibrium(self, vcn: float, pactn: float):
+        """
+        :param vcn: normalized cylinder volume vcn = vc / NL^2D
+        :param pactn: normalized actuation pressure pactn = Pact L / muH
+        :return: equilibrium y = (z, Pcn) at prescribed cylinder volume, and (dy/dvcn, dy/dpactn) per unknown
+        """
+        vcn, pactn = float(vcn), float(pactn)
+        key = (round(vcn, 12), round(pactn, 12))
+        solution = self.cache.get(key)
+        if solution is not None:
+            self.cache.move_to_end(key)
+            return solution
+
+        if self.state is None:
+            # no previous solution: start from the unstretched, inflated pouches, unloaded equilibrium at any volume
+            y = (1.0, pi / 2, 1.0, 0.0)
+            self.state = (self.model.reduced_diff(*y, 0.0)[4], 0.0, (y, ((0.0, 0.0),) * 4))
+
+        # first-order predictor from the previous solution
+        vcn0, pactn0, (y0, dy0) = self.state
+        dv, dp = vcn - vcn0, pactn - pactn0
+        solution = self.newton(tuple(v + d[0] * dv + d[1] * dp for v, d in zip(y0, dy0)), vcn, pactn)
+        steps = 1
+        while solution is None and steps < 2**10:
+            # homotopy from the previous solution in increasingly many steps
+            steps *= 2
+            solution = (y0, dy0)
+            for a in np.linspace(0, 1, steps + 1)[1:]:
+                solution = self.newton(solution[0], (1 - a) * vcn0 + a * vcn, (1 - a) * pactn0 + a * pactn)
+                if solution is None:
+                    break
+        if solution is None:
+            raise RuntimeError(f'no pouch array equilibrium found at vcn = {vcn}, pactn = {pactn}')
+
+        self.state = (vcn, pactn, solution)
+        self.cache[key] = solution
+        if len(self.cache) > self.cache_size:
+            self.cache.popitem(last=False)
+        return solution
+
+    def fcn(self, vc, pact):
+        # normalized function
+        # Pch = Pc N L / mu H = f[vcn, pan]
+        if np.ndim(vc) == 0 and np.ndim(pact) == 0:
+            return self.equilibrium(vc, pact)[0][-1]
+        vc, pact = np.broadcast_arrays(vc, pact)
+        return np.array([self.equilibrium(v, p)[0][-1] for v, p in zip(vc.flat, pact.flat)]).reshape(vc.shape)
+
+    def fcn_diff(self, vc, pact):
+        """
+        dPcn/dvcn and dPcn/dpactn by the implicit function theorem on the equilibrium at prescribed volume
+        """
+        if np.ndim(vc) == 0 and np.ndim(pact) == 0:
+            return self.equilibrium(vc, pact)[1][-1]
+        vc, pact = np.broadcast_arrays(vc, pact)
+        dpc = np.array([self.equilibrium(v, p)[1][-1] for v, p in zip(vc.flat, pact.flat)])
+        return tuple(dpc.T.reshape((2,) + vc.shape))
+
+    def dfcndvc(self, vc, pact):
+        return self.fcn_diff(vc, pact)[0]
+
+    def dfcndpact(self, vc, pact):
+        return self.fcn_diff(vc, pact)[1]
+
+class ChebyshevTAH(LIMO):
+    """
+    Pressure actuated pouch array TAH with Pcn = f[vcn, pactn] tabulated as a 2-D Chebyshev series instead of the
+    fitted cubic of LIMO, see pouch_surrogates.ChebyshevSurrogate. The series is valid on its domain in (vcn, pactn),
+    onto which points outside it are clipped with a warning: there the series extrapolates and max_error does not hold.
+    """
+    def __init__(self, coefficients: np.ndarray, domain: np.ndarray,
+                 Pact: TDP = TDP(min=0, max=120), L: float = 0.017, N: int = 8, D: float = 0.05, H: float = 0.001, mu: float = 3e5,
+                 max_error: float = np.nan):
+        """
+        :param coefficients: Chebyshev coefficients c[i, j] of T_i(u) T_j(v), with u and v the mapped vcn and pactn
+        :param domain: ((vcn_min, vcn_max), (pactn_min, pactn_max))
+        :param max_error: maximum error of Pcn against held-out equilibria
+        """
+        super().__init__(Pact, L, N, D, H, mu)
+        self.coefficients = np.asarray(coefficients, dtype=float)
+        self.domain = np.asarray(domain, dtype=float)
+        self.coefficients_dvc = chebder(self.coefficients, axis=0)
+        self.coefficients_dpact = chebder(self.coefficients, axis=1)
+        self.max_error = max_error
+
+    def save(self, file):
+        """
+        Store the series and the dimensional parameters in a .npz file; the actuation pressure is not stored.
+        """
+        np.savez(file, coefficients=self.coefficients, domain=self.domain, max_error=self.max_error,
+                 L=self.L, N=self.N, D=self.D, H=self.H, mu=self.mu * self.mmhg2pa)
+
+    @classmethod
+    def load(cls, file, Pact: TDP = TDP(min=0, max=120)):
+        """
+        :param file: .npz file written by save
+        :param Pact: actuation pressure
+        """
+        with np.load(file) as data:
+            return cls(data['coefficients'], data['domain'], Pact, L=float(data['L']), N=int(data['N']),
+                       D=float(data['D']), H=float(data['H']), mu=float(data['mu']), max_error=float(data['max_error']))
+
+    def map(self, vc, pact):
+        """
+        :return: (vcn, pactn) clipped onto the domain and mapped from it onto [-1, 1], and the scale factors du/dvcn and
+            dv/dpactn
+        """
+        scale = 2 / (self.domain[:, 1] - self.domain[:, 0])
+        vc, pact = np.broadcast_arrays(vc, pact)
+        (vc_min, vc_max), (pact_min, pact_max) = self.domain
+        if vc.size and not (vc_min <= vc.min() and vc.max() <= vc_max
+                            and pact_min <= pact.min() and pact.max() <= pact_max):
+            warnings.warn(f'(vcn, pactn) outside the domain {self.domain.tolist()} of the Chebyshev series, where its '
+                          f'error is not certified, are clipped onto it', RuntimeWarning, stacklevel=3)
+            vc, pact = np.clip(vc, vc_min, vc_max), np.clip(pact, pact_min, pact_max)
+        return (scale[0] * (vc - self.domain[0, 0]) - 1, scale[1] * (pact - self.domain[1, 0]) - 1), scale
+
+    def fcn(self, vc, pact):
+        # normalized function
+        # Pch = Pc N L / mu H = f[vcn, pan]
+        (u, v), _ = self.map(vc, pact)
+        return chebval2d(u, v, self.coefficients)
+
+    def dfcndvc(self, vc, pact):
+        (u, v), scale = self.map(vc, pact)
+        return scale[0] * chebval2d(u, v, self.coefficients_dvc)
+
+    def dfcndpact(self, vc, pact):
+        (u, v), scale = self.map(vc, pact)
+        return scale[1] * chebval2d(u, v, self.coefficients_dpact)
+
+    def fcn_diff(self, vc, pact):
+        """
+        dPcn/dvcn and dPcn/dpactn, with the variables mapped once
+        """
+        (u, v), scale = self.map(vc, pact)
+        return scale[0] * chebval2d(u, v, self.coefficients_dvc), scale[1] * chebval2d(u, v, self.coefficients_dpact)
 
 if __name__ == '__main__':
+    from matplotlib import pyplot as plt
 
     limo = LIMO(TDP(min=0, max=120))
 
@@ -0,0 +1,341 @@
+"""
+Lazy container of simulation results.
+
+A Trajectory keeps the samples and the dense output interpolants of the solve_ivp calls of a simulation, one segment
+per call, e.g. between restarts at events. States are evaluated at arbitrary times from the interpolants, and derived
+signals are computed from the samples on first access and cached:
+
+    trajectory = system.trajectory(y0, 0, 6)
+    trajectory['Pv']                        # diagnostics of all samples, computed once
+    trajectory(np.linspace(0, 6, 1000))     # states at arbitrary times
+    trajectory.cycle(-1, period=1.0)['Qart'] # view of the last cycle, without copying
+
+Hybrid simulations record their transitions, e.g. the opening of a valve, in an event log of the time, component,
+transition and index of the first sample after the event. Beats are delimited by the activation period or by a
+transition of a component, such that the last beats, a given beat or all systolic phases are views as well:
+
+    trajectory.last(3, component='valve_out')
+    trajectory.phases('valve_out', 'open', 'close')
+
+Slices are views: they share the samples, interpolants and cached columns of the trajectory they are taken from, and
+their columns are slices of its columns.
+"""
+
+import numpy as np
+from utils import Records
+
+# event log: time, component and transition ids, and index of the first sample after the event
+EVENTS = np.dtype([('t', float), ('component', int), ('transition', int), ('index', int)])
+
+class Trajectory:
+    def __init__(self, solutions=(), states=(), diagnostics=None, period: float | None = None):
+        """
+        :param solutions: results of solve_ivp in order of time, one per segment, solved with dense_output=True to
+            evaluate the states between the samples
+        :param states: names of the states, in the order of y
+        :param diagnostics: function (t, Y) returning the records of derived signals, e.g. VAV.diagnostics
+        :param period: duration of a cycle, e.g. of the activation of a TAH
+        """
+        self.solutions = []
+        self.states = tuple(states)
+        self.diagnostics = diagnostics
+        self.period = period
+        self.derived = {}
+        self.components = []
+        self.transitions = []
+        self._events = []
+        self._samples = 0
+        self._cache = {}
+        self._base = None
+        self._start = 0
+        self._stop = None
+        for sol in solutions:
+            self.append(sol)
+
+    def append(self, sol):
+        """
+        Add the next segment, e.g. the solution after a restart at an event.
+
+        :param sol: result of solve_ivp starting at the end of the last segment
+        :return: self
+        """
+        if self._base is not None:
+            raise ValueError('segments cannot be appended to a slice of a trajectory')
+        self.solutions.append(sol)
+        self._samples += len(sol.t)
+        self._cache = {}
+        return self
+
+    def record(self, t: float, component: str, transition: str):
+        """
+        Log a transition at the end of the last segment, before the segment that follows it is appended.
+
+        :param t: time of the event
+        :param component: name of the component, e.g. 'valve_out'
+        :param transition: name of the transition, e.g. 'open'
+        :return: self
+        """
+        for names, name in ((self.components, component), (self.transitions, transition)):
+            if name not in names:
+                names.append(name)
+        self._events.append((t, self.components.index(component), self.transitions.index(transition),
+                             self._samples))
+        self._cache.pop('log', None)
+        return self
+
+    @property
+    def _root(self) -> 'Trajectory':
+        return self if self._base is None else self._base
+
+    def derive(self, name: str, function):
+        """
+        Define a derived column, computed on its first access.
+
+        :param name: name of the column
+        :param function: function of the trajectory returning the column, e.g. lambda trajectory: trajectory['Pv'] * 2
+        :return: self
+        """
+        base = self._root
+        base.derived[name] = function
+        base._cache.pop(name, None)
+        return self
+
+    @property
+    def t(self) -> np.ndarray:
+        """
+        Sample times, with the times of events repeated at the end and start of consecutive segments.
+        """
+        if self._base is not None:
+            return self._base.t[self._start:self._stop]
+        if 't' not in self._cache:
+            self._cache['t'] = np.concatenate([sol.t for sol in self.solutions]) if self.solutions else np.empty(0)
+        return self._cache['t']
+
+    @property
+    def y(self) -> np.ndarray:
+        """
+        States of the samples, of shape (nstates, n).
+        """
+        if self._base is not None:
+            return self._base.y[:, self._start:self._stop]
+        if 'y' not in self._cache:
+            self._cache['y'] = (np.concatenate([sol.y for sol in self.solutions], axis=1) if self.solutions
+                                else np.empty((len(self.states), 0)))
+        return self._cache['y']
+
+    @property
+    def events(self) -> list[float]:
+        """
+        Times at which one segment ends and the next one starts.
+        """
+        return [float(sol.t[-1]) for sol in self.solutions[:-1]]
+
+    @property
+    def columns(self) -> list[str]:
+        """
+        Names of the columns: time, states, derived columns and diagnostics.
+        """
+        base = self._root
+        names = ['t', *base.states, *base.derived]
+        if base.diagnostics is not None:
+            names += [name for name in base._diagnostics() if name not in names]
+        return names
+
+    @property
+    def log(self) -> np.ndarray:
+        """
+        Event log of the transitions, with dtype EVENTS and the sample indices relative to this trajectory.
+        """
+        root = self._root
+        if 'log' not in root._cache:
+            root._cache['log'] = np.array(root._events, dtype=EVENTS)
+        log = root._cache['log']
+        if self._base is None:
+            return log
+        log = log[(log['index'] >= self._start) & (log['index'] < self._start + len(self))]
+        log['index'] -= self._start
+        return log
+
+    def occurrences(self, component: str, transition: str | None = None) -> np.ndarray:
+        """
+        :param component: name of the component
+        :param transition: name of the transition, by default all transitions of the component
+        :return: entries of the event log of the component and transition
+        """
+        root, log = self._root, self.log
+        if component not in root.components or transition is not None and transition not in root.transitions:
+            return log[:0]
+        selected = log['component'] == root.components.index(component)
+        if transition is not None:
+            selected &= log['transition'] == root.transitions.index(transition)
+        return log[selected]
+
+    def _diagnostics(self) -> Records:
+        if 'diagnostics' not in self._cache:
+            self._cache['diagnostics'] = self.diagnostics(self.t, self.y)
+        return self._cache['diagnostics']
+
+    def _column(self, name: str) -> np.ndarray:
+        if name == 't':
+            return self.t
+        if name in self.states:
+            return self.y[self.states.index(name)]
+        if name in self.derived:
+            if name not in self._cache:
+                self._cache[name] = np.asarray(self.derived[name](self))
+            return self._cache[name]
+        if self.diagnostics is not None and name in self._diagnostics():
+            return self._diagnostics()[name]
+        raise KeyError(name)
+
+    def __getitem__(self, key):
+        """
+        :param key: name of a column, or slice of times, e.g. trajectory[2.0:3.0]
+        :return: column of the samples, or view of the samples in the time interval
+        """
+        if isinstance(key, slice):
+            return self.between(key.start, key.stop)
+        if self._base is not None:
+            return self._base._column(key)[..., self._start:self._stop]
+        return self._column(key)
+
+    def __len__(self) -> int:
+        return len(self.t)
+
+    def __call__(self, t) -> np.ndarray:
+        """
+        :param t: time or times
+        :return: states interpolated by the dense output of the segment holding t, of shape (nstates,) + shape of t
+        """
+        base = self._root
+        if any(sol.sol is None for sol in base.solutions):
+            raise ValueError('states between samples require solutions with dense_output=True')
+        t = np.asarray(t, dtype=float)
+        times = t.reshape(-1)
+        starts = np.array([sol.t[0] for sol in base.solutions])
+        segment = np.clip(np.searchsorted(starts, times, side='right') - 1, 0, len(starts) - 1)
+        y = np.empty((len(base.solutions[0].y), len(times)))
+        for k in np.unique(segment):
+            y[:, segment == k] = base.solutions[k].sol(times[segment == k])
+        return y.reshape((-1,) + t.shape)
+
+    def between(self, t0: float | None = None, t1: float | None = None) -> 'Trajectory':
+        """
+        :param t0: start time, by default the first sample
+        :param t1: end time, by default the last sample
+        :return: view of the samples with t0 <= t <= t1
+        """
+        t = self.t
+        start = 0 if t0 is None else int(np.searchsorted(t, t0, side='left'))
+        stop = len(t) if t1 is None else int(np.searchsorted(t, t1, side='right'))
+        return self.samples(start, stop)
+
+    def samples(self, start: int = 0, stop: int | None = None) -> 'Trajectory':
+        """
+        :param start: index of the first sample
+        :param stop: index after the last sample, by default the end
+        :return: view of the samples start:stop
+        """
+        root = self._root
+        stop = len(self) if stop is None else stop
+        view = Trajectory(states=root.states, diagnostics=root.diagnostics, period=root.period)
+        view.solutions = root.solutions
+        view._base = root
+        view._start = self._start + start
+        view._stop = self._start + stop
+        return view
+
+    def segments(self, start: int | None = None, stop: int | None = None) -> 'Trajectory':
+        """
+        :param start: index of the first segment, negative to count from the end
+        :param stop: index after the last segment, e.g. -1 for all but the last one
+        :return: view of the samples of the segments start:stop of the whole trajectory
+        """
+        offsets = np.cumsum([0] + [len(sol.t) for sol in self.solutions])
+        segments = range(len(self.solutions))[start:stop]
+        bounds = (offsets[segments.start], offsets[segments.stop]) if len(segments) else (0, 0)
+        return self._root.samples(*bounds)
+
+    def beats(self, period: float | None = None, component: str | None = None, transition: str = 'open') -> np.ndarray:
+        """
+        Indices of the first samples of the beats.
+
+        :param period: duration of a beat, by default the period of the trajectory, used if no component is given
+        :param component: name of the component whose transition starts a beat, e.g. 'valve_out'
+        :param transition: name of the transition that starts a beat
+        :return: sample indices relative to this trajectory
+        """
+        if component is not None:
+            return self.occurrences(component, transition)['index']
+        period = self.period if period is None else period
+        if period is None:
+            raise ValueError('beats require a period or a component')
+        t = self.t
+        times = np.arange(np.ceil(t[0] / period - 1e-12), np.floor(t[-1] / period + 1e-12) + 1) * period
+        return np.searchsorted(t, times, side='left')
+
+    def beat(self, k: int, **by) -> 'Trajectory':
+        """
+        :param k: index of the complete beat, negative to count from the end
+        :param by: period, or component and transition, of the beats
+        :return: view of the samples of the beat
+        """
+        beats = self.beats(**by)
+        k = range(len(beats) - 1)[k]
+        return self.samples(beats[k], beats[k + 1])
+
+    def last(self, n: int = 1, **by) -> 'Trajectory':
+        """
+        :param n: number of complete beats
+        :param by: period, or component and transition, of the beats
+        :return: view of the samples of the last n complete beats
+        """
+        beats = self.beats(**by)
+        if len(beats) <= n:
+            raise IndexError(f'{len(beats) - 1} complete beats')
+        return self.samples(beats[-n - 1], beats[-1])
+
+    def phases(self, component: str, start: str = 'open', stop: str = 'close') -> list['Trajectory']:
+        """
+        :param component: name of the component, e.g. 'valve_out'
+        :param start: transition that starts a phase
+        :param stop: transition that ends a phase
+        :return: views of the phases from every start transition to the next stop transition, e.g. the systolic
+            phases between the opening and closing of the outflow valve
+        """
+        log = self.occurrences(component)
+        root = self._root
+        if start not in root.transitions or stop not in root.transitions:
+            return []
+        phases = []
+        for i in np.flatnonzero(log['transition'] == root.transitions.index(start)):
+            ends = np.flatnonzero(log['transition'][i + 1:] == root.transitions.index(stop))
+            if len(ends):
+                phases.append(self.samples(log['index'][i], log['index'][i + 1 + ends[0]]))
+        return phases
+
+    def cycle(self, k: int, period: float | None = None) -> 'Trajectory':
+        """
+        :param k: index of the cycle k period <= t <= (k + 1) period, negative to count back from the last complete
+            cycle, e.g. -1 for the last one
+        :param period: duration of a cycle, by default the period of the trajectory
+        :return: view of the samples of the cycle
+        """
+        period = self.period if period is None else period
+        if period is None:
+            raise ValueError('the period of a cycle is unknown')
+        if k < 0:
+            k += int((self.t[-1] + 1e-12 * period) // period)
+        return self.between(k * period, (k + 1) * period)
+
+    def resample(self, t) -> 'Trajectory':
+        """
+        :param t: increasing times
+        :return: trajectory with the states interpolated at t as its samples, and the same segments and diagnostics
+        """
+        base = self._root
+        t = np.asarray(t, dtype=float)
+        resampled = Trajectory(states=base.states, diagnostics=base.diagnostics, period=base.period)
+        resampled.solutions = list(base.solutions)
+        resampled._cache.update(t=t, y=self(t))
+        return resampled
@@ -3,8 +3,6 @@ Utilitarian functionalities.
 """
 
 import numpy as np
-from matplotlib.collections import LineCollection
-from sympy import symbols
 from typing import Protocol, Any
 
 class Sigmoid:
@@ -63,6 +61,8 @@ class DoubleHill:
                             t ** self.rr + (self.period * self.alpha_diastole) ** self.rr) ** 2)
 
     def symbolic(self):
+        from sympy import symbols
+
         rc, rr, alc, ald, t, T = symbols('rc, rr, alc, ald, t, T', positive=True)
 
         tmp1 = (t / (alc * T)) ** rc
@@ -117,6 +117,42 @@ def quadratic_fit(x: np.ndarray, y: np.ndarray):
 
     return np.linalg.solve(A, b)
 
+class Records(dict):
+    """
+    Named signals of equal shape, stored as separate columns and accessed by name or attribute, e.g. records.Qart
+    """
+    def __getattr__(self, name: str) -> np.ndarray:
+        try:
+            return self[name]
+        except KeyError:
+            raise AttributeError(name) from None
+
+    def __dir__(self):
+        return [*super().__dir__(), *self]
+
+def records(**signals) -> Records:
+    """
+    Records of named signals, broadcast against each other without copying, e.g. records(Qvv=qvv, Qart=qart).Qart
+    """
+    return Records(zip(signals, np.broadcast_arrays(*[np.asarray(v, dtype=float) for v in signals.values()])))
+
+def samplewise(function, t, *args, stateful: bool = False):
+    """
+    Evaluate function(t, *args) on all samples at once, with the samples along the last axis of t and args.
+
+    Functions with components that change their state on evaluation, which declare stateful = True, e.g.
+    circuits.HystereticValve, are evaluated sample by sample instead, in order of t, such that the state follows the
+    trajectory.
+
+    :param stateful: evaluate sample by sample
+    :return: outputs of function, each of shape (number of samples,)
+    """
+    t = np.asarray(t, dtype=float)
+    if stateful:
+        return list(np.array([function(t[i], *[np.asarray(a)[..., i] for a in args]) for i in range(len(t))],
+                             dtype=float).T)
+    return np.broadcast_arrays(*function(t, *args), t)[:-1]
+
 def colored_line(x, y, c, ax, **lc_kwargs):
     """
     Plot a line with a color specified along the line by a third value.
@@ -145,6 +181,8 @@ def colored_line(x, y, c, ax, **lc_kwargs):
         The generated line collection representing the colored line.
     """
 
+    from matplotlib.collections import LineCollection
+
     # Default the capstyle to butt so that the line segments smoothly line up
     default_kwargs = {"capstyle": "butt"}
     default_kwargs.update(lc_kwargs)